@@ -89,8 +89,8 @@ void setup() {
   frameRate(60);
   
   // Initialize OSC
-  oscP5 = new OscP5(this, 12000);
-  supercollider = new NetAddress("127.0.0.1", 57120);
+  oscP5 = new OscP5(this, paceOscPort());
+  supercollider = new NetAddress("127.0.0.1", paceSuperColliderPort());
   
   // Load and setup shader
   gradientShader = loadShader("gradient.glsl");
@@ -115,6 +115,12 @@ void setup() {
   
   // Initialize debug system
   setupDebug();
+  
+  // Standby pool slots start hidden (see PaceSlot.pde)
+  paceSetup();
+
+  // Tells the controller the sketch is up (see readiness.py)
+  println("PACE_READY");
 }
 
 void createScanlineTexture() {
@@ -230,6 +236,9 @@ void draw() {
 }
 
 void oscEvent(OscMessage msg) {
+  if (paceEvent(msg)) {
+    return;
+  }
   if (msg.checkAddrPattern("/reich/volume")) {
     targetVolume = msg.get(0).floatValue();
     updateDebugValue("volume", volume);
@@ -90,8 +90,8 @@ abstract class Enemy {
   
   void die() {
     alive = false;
-    // Send OSC message for death sound
-    oscP5.send(new OscMessage("/" + type + "/death"), new NetAddress("127.0.0.1", 57120));
+    // Death sound, routed to SuperCollider by the controller (see PaceSlot.pde)
+    paceFeedback(new OscMessage("/" + type + "/death"));
   }
   
   boolean checkCollision(PVector point, float radius) {
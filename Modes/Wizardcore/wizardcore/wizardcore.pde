@@ -31,11 +31,17 @@ void setup() {
   
   // Initialize OSC
   try {
-    oscP5 = new OscP5(this, 12000);
-    println("OSC initialized on port 12000");
+    oscP5 = new OscP5(this, paceOscPort());
+    println("OSC initialized on port " + paceOscPort());
   } catch (Exception e) {
     println("Warning: Could not initialize OSC");
   }
+  
+  // Standby pool slots start hidden (see PaceSlot.pde)
+  paceSetup();
+
+  // Tells the controller the sketch is up (see readiness.py)
+  println("PACE_READY");
 }
 
 void loadGameAssets() {
@@ -57,6 +63,9 @@ void loadGameAssets() {
 }
 
 void oscEvent(OscMessage theOscMessage) {
+  if (paceEvent(theOscMessage)) {
+    return;
+  }
   gameState.handleOscMessage(theOscMessage);
 }
 
@@ -0,0 +1,64 @@
+// PaceSlot.pde
+// Standby pool support (see engine_pool.py in the controller).
+// When the pool starts this sketch in a slot it passes
+//   <oscPort> <supercolliderPort> standby
+// The sketch then listens on the slot's port, starts hidden and waits for
+// /pace/activate. Without arguments it uses the usual ports (12000, 57120).
+// Messages for the controller go to the port in the PACE_CONTROLLER_PORT
+// environment variable the controller sets (system.ports.controller), 57300 without it.
+
+int paceOscPort() {
+  if (args != null && args.length > 0) return int(args[0]);
+  return 12000;
+}
+
+int paceSuperColliderPort() {
+  if (args != null && args.length > 1) return int(args[1]);
+  return 57120;
+}
+
+int paceControllerPort() {
+  String port = System.getenv("PACE_CONTROLLER_PORT");
+  if (port != null) return int(port);
+  return 57300;
+}
+
+// Call at the end of setup()
+void paceSetup() {
+  if (args != null && args.length > 2 && args[2].equals("standby")) {
+    paceDeactivate();
+  }
+}
+
+// Call first in oscEvent(); returns true if the message was a pool or probe message
+boolean paceEvent(OscMessage msg) {
+  if (msg.checkAddrPattern("/pace/activate")) {
+    surface.setVisible(true);
+    loop();
+    return true;
+  }
+  if (msg.checkAddrPattern("/pace/deactivate")) {
+    paceDeactivate();
+    return true;
+  }
+  if (msg.checkAddrPattern("/pace/ping")) {
+    // Latency probe (latency_probe.py): answer on the controller port with the same arguments
+    OscMessage pong = new OscMessage("/pace/pong");
+    pong.add(msg.get(0).stringValue());
+    pong.add(msg.get(1).floatValue());
+    paceFeedback(pong);
+    return true;
+  }
+  return false;
+}
+
+// Send a message to the controller, which forwards it to the engines as
+// the mode's controls.feedback in config.yml says
+void paceFeedback(OscMessage msg) {
+  oscP5.send(msg, new NetAddress("127.0.0.1", paceControllerPort()));
+}
+
+void paceDeactivate() {
+  noLoop();
+  surface.setVisible(false);
+}
@@ -1,4 +1,6 @@
 import processing.sound.*;
+import oscP5.*;
+import netP5.*;
 
 // Audio analysis components
 FFT fft;
@@ -33,6 +35,9 @@ float attackValue = 0.4;
 float releaseValue = 0.7;
 float currentAmp = 0.5;
 
+// Only used for the standby pool messages (see PaceSlot.pde)
+OscP5 oscP5;
+
 // Performance tracking
 int frameCounter = 0;
 float avgFrameRate = 60;
@@ -69,6 +74,12 @@ void setup() {
     println("Will continue with visualization only");
   }
   
+  try {
+    oscP5 = new OscP5(this, paceOscPort());
+  } catch (Exception e) {
+    println("Warning: Could not initialize OSC");
+  }
+
   // Set font
   textFont(createFont("Arial", 14));
   
@@ -77,6 +88,12 @@ void setup() {
   println("  F: Toggle frequency markers");
   println("  L: Toggle logarithmic/linear scale");
   println("  S: Toggle spectral flux visualization");
+  
+  // Standby pool slots start hidden (see PaceSlot.pde)
+  paceSetup();
+
+  // Tells the controller the sketch is up (see readiness.py)
+  println("PACE_READY");
 }
 
 void draw() {
@@ -382,6 +399,10 @@ void keyPressed() {
   }
 }
 
+void oscEvent(OscMessage msg) {
+  paceEvent(msg);
+}
+
 // Clean up resources when closing
 void dispose() {
   if (audio != null) {
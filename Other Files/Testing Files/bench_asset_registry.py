@@ -0,0 +1,100 @@
+# Asset registry check and benchmark
+# Compares the old per-call directory walks (find_sketches plus a config loop
+# per lookup) with lookups in the AssetRegistry index, then copies the mode
+# tree to a temp folder and checks that the polling watcher picks up a new
+# script, a renamed sketch and a new mode folder without a full rescan.
+#
+# Usage: python bench_asset_registry.py [--lookups 1000]
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from asset_registry import AssetRegistry
+
+def walk_lookup(root: str, config: dict, mode_name: str):
+    # What the managers did before: list every mode folder, then build the path
+    sketches = []
+    for mode_folder in os.listdir(root):
+        mode_path = os.path.join(root, mode_folder)
+        if os.path.isdir(mode_path):
+            for item in os.listdir(mode_path):
+                item_path = os.path.join(mode_path, item)
+                if os.path.isdir(item_path) and any(f.endswith('.pde') for f in os.listdir(item_path)):
+                    sketches.append(item)
+    script = os.path.join(root, mode_name, config['modes'][mode_name]['supercollider']['script'])
+    return sketches, os.path.exists(script)
+
+def wait_for(check, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if check():
+            return time.perf_counter() - start
+        time.sleep(0.02)
+    return -1
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the mode asset registry")
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    modes = list(config['modes'].keys())
+    root = os.path.join(REPO_ROOT, "Modes")
+
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        walk_lookup(root, config, modes[i % len(modes)])
+    walked = (time.perf_counter() - start) / args.lookups
+
+    start = time.perf_counter()
+    registry = AssetRegistry(config)
+    scan = time.perf_counter() - start
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        assets = registry.mode(modes[i % len(modes)])
+        registry.sketch_names()
+    indexed = (time.perf_counter() - start) / args.lookups
+    print(f"directory walk: {walked * 1e6:8.1f} us per lookup")
+    print(f"registry:       {indexed * 1e6:8.1f} us per lookup (one scan {scan * 1000:.1f} ms)")
+    for mode_name in modes:
+        assets = registry.mode(mode_name)
+        print(f"  {mode_name:<14} sketch {'ok' if assets.sketch_dir else 'MISSING'}, "
+              f"script {'ok' if assets.script else 'MISSING'}, {len(assets.data_files)} data files")
+
+    # Watcher on a copy of the tree
+    work_dir = tempfile.mkdtemp(prefix="pace-assets-")
+    copy = os.path.join(work_dir, "Modes")
+    shutil.copytree(root, copy, symlinks=True, ignore=shutil.ignore_patterns("output"))
+    watched = AssetRegistry(config, copy)
+    watched.watch(0.05)
+    mode_name = modes[0]
+    assets = watched.mode(mode_name)
+
+    os.rename(assets.script, assets.script + ".bak")
+    took = wait_for(lambda: watched.script_path(mode_name) is None, 2)
+    print(f"removed script noticed:  {'%.2f s' % took if took >= 0 else 'NO'}")
+    os.rename(assets.script + ".bak", assets.script)
+    took = wait_for(lambda: watched.script_path(mode_name) == assets.script, 2)
+    print(f"restored script noticed: {'%.2f s' % took if took >= 0 else 'NO'}")
+
+    folder = assets.folder
+    os.rename(folder, folder + "-old")
+    took = wait_for(lambda: watched.mode(mode_name).folder is None, 2)
+    print(f"moved mode folder noticed: {'%.2f s' % took if took >= 0 else 'NO'}")
+    os.rename(folder + "-old", os.path.join(copy, mode_name.upper()))
+    took = wait_for(lambda: watched.mode(mode_name).script is not None, 2)
+    print(f"renamed mode folder indexed: {'%.2f s' % took if took >= 0 else 'NO'}")
+    watched.stop()
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Asyncio controller input-to-OSC benchmark
+# Writes Teensy text lines into a pipe that is read through the same
+# SerialProtocol the asyncio controller uses with pyserial-asyncio, and
+# measures how long each button press takes to arrive as OSC on a local UDP
+# port. Compares the controller's path (ControllerCore dispatching straight
+# into a shared DatagramTransport) with the pattern of the old
+# AsyncOSCControlHub (queue polled every 1 ms, every send through
+# run_in_executor). Linux/macOS only (pipe transport).
+#
+# Usage: python bench_async_controller.py [--events 2000] [--rate 1000]
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from controller_core import ControllerCore
+from pythonosc import udp_client
+from serial_reader import SerialProtocol
+from teensy_protocol import TextDecoder
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+class Receiver(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.arrivals = []
+
+    def datagram_received(self, data, addr):
+        self.arrivals.append(time.perf_counter())
+
+async def feed(write_fd: int, events: int, rate: float, sent: list):
+    line = b"btn0\n"
+    for _ in range(events):
+        sent.append(time.perf_counter())
+        os.write(write_fd, line)
+        await asyncio.sleep(1 / rate)
+
+async def run_variant(config: dict, args, legacy: bool):
+    loop = asyncio.get_running_loop()
+    receiver_transport, receiver = await loop.create_datagram_endpoint(Receiver, local_addr=("127.0.0.1", 0))
+    port = receiver_transport.get_extra_info("sockname")[1]
+    config['system']['ports']['processing'] = port
+    config['system']['ports']['supercollider'] = port
+
+    transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, family=socket.AF_INET)
+    core = BenchCore(config, transport)
+    routes = core.routing_table[0]
+
+    if legacy:
+        queue = asyncio.Queue()
+        client = udp_client.SimpleUDPClient("127.0.0.1", port)
+        on_event = lambda timestamp, event: queue.put_nowait(event)
+
+        async def consume():
+            while True:
+                await asyncio.sleep(0.001)
+                while not queue.empty():
+                    queue.get_nowait()
+                    for packet, command, params, target in routes:
+                        await loop.run_in_executor(None, client.send_message, command, params)
+        consumer = asyncio.ensure_future(consume())
+    else:
+        on_event = lambda timestamp, event: core.dispatch_event(*event)
+        consumer = None
+
+    read_fd, write_fd = os.pipe()
+    pipe = os.fdopen(read_fd, "rb", buffering=0)
+    pipe_transport, _ = await loop.connect_read_pipe(lambda: SerialProtocol(TextDecoder(), on_event), pipe)
+
+    sent = []
+    start = time.perf_counter()
+    await feed(write_fd, args.events, args.rate, sent)
+    expected = args.events * len(routes)
+    deadline = time.perf_counter() + 5
+    while len(receiver.arrivals) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    if consumer:
+        consumer.cancel()
+    pipe_transport.close()
+    os.close(write_fd)
+    transport.close()
+    receiver_transport.close()
+
+    # Latency of the last message of each event
+    last = receiver.arrivals[len(routes) - 1::len(routes)]
+    latencies = sorted((arrival - sent_at) * 1e6 for sent_at, arrival in zip(sent, last))
+    return {
+        'received': len(receiver.arrivals),
+        'expected': expected,
+        'median_us': statistics.median(latencies),
+        'p99_us': latencies[int(len(latencies) * 0.99) - 1],
+        'elapsed': elapsed,
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial-to-OSC latency on the asyncio controller path")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=1000, help="Button events per second")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['defaults']['initial_mode'] = "Wizardcore"
+    config['system']['osc_batching'] = {'enabled': False}
+
+    for label, legacy in (("executor per send", True), ("datagram transport", False)):
+        result = await run_variant(config, args, legacy)
+        print(f"{label:>18}: {result['received']}/{result['expected']} messages, "
+              f"median {result['median_us']:7.1f} us, p99 {result['p99_us']:7.1f} us, "
+              f"{result['elapsed']:.2f} s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# Audio feature extraction benchmark (audio_features.py, needs numpy)
+# Analyses a WAV file (or a synthetic stand-in for the Reich recording:
+# pulsing chords over a drone) pinned to one core, and reports the
+# real-time factor (seconds of audio analysed per second) of the batched
+# whole-file analysis, of the streaming analyzer fed in sound card sized
+# blocks, and of analysing frame by frame with one FFT each. Then times
+# loading the cached track against analysing again, the cost of a lookup
+# per publish, and checks that streaming and whole-file features agree.
+#
+# Usage: python bench_audio_features.py [--wav FILE] [--seconds 60] [--block 256]
+
+import argparse
+import os
+
+# One core: pin the process and keep any BLAS/FFT threads to one
+for variable in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+    os.environ[variable] = "1"
+if hasattr(os, "sched_setaffinity"):
+    os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
+
+import shutil
+import sys
+import tempfile
+import time
+
+import bench_common  # Puts the controller folder on sys.path
+
+from audio_features import (AnalysisSettings, StreamingAnalyzer, compute_track, load_track, read_wav,
+                            _Spectrum, numpy)
+
+def synthetic(seconds: float, sample_rate: int):
+    """Pulsing chords (about 4.5 per second) over a quiet drone, as one mono signal."""
+    t = numpy.arange(int(seconds * sample_rate)) / sample_rate
+    pulse_period = int(sample_rate / 4.5)
+    envelope = numpy.exp(-(numpy.arange(len(t)) % pulse_period) / (0.02 * sample_rate))
+    chord = sum(numpy.sin(2 * numpy.pi * f * t) for f in (523.25, 659.25, 783.99)) / 3
+    drone = 0.1 * numpy.sin(2 * numpy.pi * 110 * t) + 0.01 * numpy.random.default_rng(0).standard_normal(len(t))
+    return (0.5 * envelope * chord + drone).astype(numpy.float32)
+
+def frame_by_frame(samples, sample_rate: int, settings: AnalysisSettings) -> int:
+    """One FFT per frame, the way a per-hop loop would do it."""
+    spectrum = _Spectrum(sample_rate, settings)
+    frame, hop = settings.frame_size, settings.hop_size
+    padded = numpy.concatenate((numpy.zeros(frame - hop, dtype=numpy.float32), samples * settings.gain))
+    count = 0
+    for start in range(0, len(padded) - frame + 1, hop):
+        spectrum.features(padded[None, start:start + frame])
+        count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time factor of the audio feature extraction on one core")
+    parser.add_argument("--wav", help="PCM WAV file to analyse instead of the synthetic signal")
+    parser.add_argument("--seconds", type=float, default=60, help="Length of the synthetic signal")
+    parser.add_argument("--block", type=int, default=256, help="Samples per block for the streaming analyzer")
+    args = parser.parse_args()
+    if numpy is None:
+        print("Needs numpy (pip install numpy)")
+        sys.exit(1)
+
+    settings = AnalysisSettings({'gain': 1.5})
+    if args.wav:
+        samples, sample_rate = read_wav(args.wav)
+    else:
+        sample_rate = 44100
+        samples = synthetic(args.seconds, sample_rate)
+    duration = len(samples) / sample_rate
+    print(f"{duration:.1f} s of audio at {sample_rate} Hz, frame {settings.frame_size}, hop {settings.hop_size}, "
+          f"one core, numpy {numpy.__version__}")
+
+    start = time.perf_counter()
+    track = compute_track(samples, sample_rate, settings)
+    batched = time.perf_counter() - start
+    print(f"{'whole file, batched':>24}: {batched:6.3f} s, {duration / batched:7.1f}x real time "
+          f"({track.frames} frames, {int(track.onset.sum())} onsets)")
+
+    analyzer = StreamingAnalyzer(sample_rate, settings)
+    start = time.perf_counter()
+    for i in range(0, len(samples), args.block):
+        analyzer.push(samples[i:i + args.block])
+    streaming = time.perf_counter() - start
+    print(f"{f'streaming, {args.block} blocks':>24}: {streaming:6.3f} s, {duration / streaming:7.1f}x real time "
+          f"({analyzer.frames} frames, {analyzer.onset_count} onsets)")
+
+    start = time.perf_counter()
+    frames = frame_by_frame(samples, sample_rate, settings)
+    single = time.perf_counter() - start
+    print(f"{'frame by frame':>24}: {single:6.3f} s, {duration / single:7.1f}x real time ({frames} frames)")
+
+    same = (analyzer.frames == track.frames and analyzer.onset_count == int(track.onset.sum())
+            and numpy.allclose(analyzer.latest, track.at(track.frames - 1), rtol=1e-4, atol=1e-6))
+    print(f"  {'ok  ' if same else 'FAIL'} streaming matches the whole-file analysis")
+
+    workdir = tempfile.mkdtemp(prefix="pace-features-")
+    try:
+        if not args.wav:
+            import wave
+            path = os.path.join(workdir, "synthetic.wav")
+            with wave.open(path, "wb") as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(sample_rate)
+                wav.writeframes((numpy.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+        else:
+            path = args.wav
+        settings.cache_dir = os.path.join(workdir, "cache")
+        start = time.perf_counter()
+        load_track(path, settings)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        cached = load_track(path, settings)
+        hit = time.perf_counter() - start
+        print(f"{'load, cache miss':>24}: {first * 1000:8.2f} ms (read, analyse, save)")
+        print(f"{'load, cache hit':>24}: {hit * 1000:8.2f} ms")
+
+        lookups = 100000
+        start = time.perf_counter()
+        for i in range(lookups):
+            frame = cached.frame_at(i / 30)
+            cached.at(frame)
+            cached.onsets_between(frame - 3, frame)
+        print(f"{'lookup per publish':>24}: {(time.perf_counter() - start) / lookups * 1e6:8.2f} us")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not same:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
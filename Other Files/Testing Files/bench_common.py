@@ -0,0 +1,21 @@
+# Shared setup for the benchmark and check scripts in this folder
+# Importing it puts the controller folder on sys.path, so the scripts can
+# import the controller modules directly, and gives them one way to report
+# a check.
+
+import os
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+def check(name: str, ok: bool) -> bool:
+    """Print one check result and return it, so a script can collect them and fail at the end."""
+    print(f"  {'ok  ' if ok else 'FAIL'} {name}")
+    return ok
+
+def require(name: str, ok: bool):
+    """Like check, but stops the script at the first failure."""
+    if not check(name, ok):
+        raise AssertionError(name)
@@ -0,0 +1,122 @@
+# Config loading benchmark (config_loader.py)
+# Times loading config.yml the way the controller does at startup: a cold
+# YAML parse and validation, a hit on the sidecar cache, and a hit after the
+# file was touched but not changed (content hash). Checks that validation
+# catches the mistakes it should, and times a hot reload of a mode's
+# controls, from saving the file to the new routing table being in place.
+#
+# Usage: python bench_config_load.py [--runs 20] [--config ../../config.yml]
+
+import argparse
+import copy
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import yaml
+
+from bench_common import REPO_ROOT, check
+
+from config_loader import read_config, validate_config, cache_path, ConfigWatcher
+from controller_core import ControllerCore
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+def best_of(runs: int, func) -> float:
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def time_loading(path: str, runs: int):
+    print("loading")
+    sidecar = cache_path(path)
+
+    def cold():
+        if os.path.exists(sidecar):
+            os.remove(sidecar)
+        read_config(path)
+
+    def touched():
+        os.utime(path)
+        read_config(path)
+
+    results = [("parse + validate", best_of(runs, lambda: read_config(path, use_cache=False))),
+               ("parse + validate + write cache", best_of(runs, cold))]
+    read_config(path)
+    results.append(("cache hit (mtime)", best_of(runs, lambda: read_config(path))))
+    results.append(("cache hit (touched, hash)", best_of(runs, touched)))
+    for name, seconds in results:
+        print(f"  {name:>30}: {seconds * 1000:8.3f} ms")
+    return check("cached config equals the parsed one", read_config(path) == read_config(path, use_cache=False))
+
+def check_validation(config: dict):
+    print("validation")
+    ok = check("config is valid", validate_config(config) == [])
+    broken = copy.deepcopy(config)
+    # The main-menu block as it used to be: btn3 next to an empty buttons:
+    broken['modes']['main-menu']['controls'] = {'buttons': None, 'btn3': {'type': 'system'}}
+    problems = validate_config(broken)
+    ok &= check("empty buttons: with btn3 beside it is caught", len(problems) == 2 and "btn3" in problems[1])
+    broken = copy.deepcopy(config)
+    mode = next(iter(broken['modes'].values()))
+    mode.setdefault('controls', {}).setdefault('pots', {})['pot1'] = {'target': 'processing', 'command': 'potControl'}
+    ok &= check("command without a leading / is caught", any("command" in p for p in validate_config(broken)))
+    return ok
+
+def time_reload(config: dict, workdir: str):
+    print("hot reload")
+    path = os.path.join(workdir, "config.yml")
+    config = copy.deepcopy(config)
+    config['system']['devices'] = []
+    config['system']['osc_batching'] = {'enabled': False}
+    config['system']['defaults']['initial_mode'] = "bench"
+    config['modes']['bench'] = {'controls': {'buttons': {'btn1': {'actions': [
+        {'target': 'supercollider', 'command': '/bench/a', 'params': []}]}}}}
+    with open(path, "w") as file:
+        yaml.safe_dump(config, file)
+    core = BenchCore(read_config(path))
+    watcher = ConfigWatcher(path, core.reload_controls, interval=0.01)
+    watcher.start()
+
+    time.sleep(0.05)
+    config['modes']['bench']['controls']['buttons']['btn1']['actions'][0]['command'] = "/bench/b"
+    text = yaml.safe_dump(config)
+    saved = time.perf_counter()
+    with open(path, "w") as file:
+        file.write(text)
+    while core.routing_table[0][0][1] != "/bench/b" and time.perf_counter() - saved < 2:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - saved
+    watcher.stop()
+    return check(f"new routing in place {elapsed * 1000:.1f} ms after saving (10 ms poll, settles for one)",
+                 core.routing_table[0][0][1] == "/bench/b")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time config parsing, caching and hot reload")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config.yml"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    workdir = tempfile.mkdtemp(prefix="pace-config-")
+    try:
+        # Work on a copy so the real file and its cache are left alone
+        path = os.path.join(workdir, "config.yml")
+        shutil.copy(args.config, path)
+        config = read_config(path, use_cache=False)
+        ok = all([time_loading(path, args.runs), check_validation(config), time_reload(config, workdir)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
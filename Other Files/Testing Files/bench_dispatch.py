@@ -0,0 +1,131 @@
+# Control routing microbenchmark: nested config lookups vs the compiled routing table
+# Runs a synthetic event stream through both paths against a null OSC client,
+# so only the routing cost is measured. Console prints are left out of both.
+#
+# Usage: python bench_dispatch.py [--events 200000] [--mode Wizardcore]
+
+import argparse
+import os
+import random
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from control_routing import compile_controls, INPUT_NAMES, MATRIX_OFFSET, POT_OFFSET, NUM_POTS
+
+class NullClient:
+    """Stands in for SimpleUDPClient / OSCTarget and just counts messages."""
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, address, value):
+        self.sent += 1
+
+    def packet(self, command, params=(), with_value=False):
+        return NullPacket(self)
+
+class NullPacket:
+    def __init__(self, client):
+        self.client = client
+
+    def send(self, value=None):
+        self.client.sent += 1
+
+def synthetic_events(count: int):
+    """Mostly pot moves with some direct and matrix button presses, as (input_id, raw_value)."""
+    events = []
+    for _ in range(count):
+        roll = random.random()
+        if roll < 0.8:
+            events.append((POT_OFFSET + random.randrange(NUM_POTS), random.randrange(4096)))
+        elif roll < 0.9:
+            events.append((random.choice([0, 1, 3, 4, 5, 6]), 0))
+        else:
+            events.append((MATRIX_OFFSET + random.randrange(16), 0))
+    return events
+
+def legacy_dispatch(mode_config, clients, events):
+    """The per-event lookups MainController used before the routing table."""
+    for input_id, raw_value in events:
+        name = INPUT_NAMES[input_id]
+        if input_id >= POT_OFFSET:
+            pots = mode_config.get('controls', {}).get('pots', {})
+            if not pots:
+                continue
+            pot_config = pots.get(name)
+            if not pot_config or 'command' not in pot_config or 'target' not in pot_config:
+                continue
+            mapped_value = (raw_value - 0) * (1.0 - 0) / (4095 - 0) + 0
+            params = pot_config.get('params', [])
+            message = params + [mapped_value]
+            target = pot_config['target']
+            if target in clients:
+                clients[target].send_message(pot_config['command'], message)
+        else:
+            buttons = mode_config.get('controls', {}).get('buttons', {})
+            if not buttons:
+                continue
+            btn_config = buttons.get(name)
+            if not btn_config or 'actions' not in btn_config:
+                continue
+            for action in btn_config['actions']:
+                target = action.get('target')
+                command = action.get('command')
+                if not target or not command:
+                    continue
+                params = action.get('params', [])
+                if target in clients:
+                    clients[target].send_message(command, params)
+
+def compiled_dispatch(table, events):
+    """The MainController hot path: one table index plus a send."""
+    for input_id, raw_value in events:
+        routes = table[input_id]
+        if routes is None:
+            continue
+        if input_id >= POT_OFFSET:
+            mapped_value = (raw_value - 0) * (1.0 - 0) / (4095 - 0) + 0
+            for packet, command, params, target in routes:
+                packet.send(mapped_value)
+        else:
+            for packet, command, params, target in routes:
+                packet.send()
+
+def measure(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark control routing")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--mode", default="Wizardcore")
+    args = parser.parse_args()
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    mode_config = config['modes'][args.mode]
+
+    events = synthetic_events(args.events)
+
+    legacy_clients = {'supercollider': NullClient(), 'processing': NullClient()}
+    compiled_clients = {'supercollider': NullClient(), 'processing': NullClient()}
+    table = compile_controls(args.mode, mode_config, compiled_clients)
+
+    legacy_time = measure(legacy_dispatch, mode_config, legacy_clients, events)
+    compiled_time = measure(compiled_dispatch, table, events)
+
+    legacy_sent = sum(c.sent for c in legacy_clients.values())
+    compiled_sent = sum(c.sent for c in compiled_clients.values())
+    if legacy_sent != compiled_sent:
+        print(f"Warning: paths sent different message counts ({legacy_sent} vs {compiled_sent})")
+
+    print(f"Mode {args.mode}, {len(events)} events, {compiled_sent} messages")
+    print(f"  nested lookups: {len(events) / legacy_time:12,.0f} events/s")
+    print(f"  routing table:  {len(events) / compiled_time:12,.0f} events/s  "
+          f"({legacy_time / compiled_time:.2f}x)")
+
+if __name__ == "__main__":
+    main()
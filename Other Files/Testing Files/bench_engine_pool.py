@@ -0,0 +1,123 @@
+# Engine pool benchmark with fake engines
+# Puts stand-in `processing-java` and `sclang` executables first on PATH and
+# runs the real EnginePool against them (Linux/macOS only). The fakes take a
+# configurable startup time, then report ready the same way the real engines
+# do and print the /pace/activate and /pace/deactivate messages they receive.
+# Cycles through the modes like repeated btn3 presses and compares the switch
+# times with and without the pool.
+#
+# Usage: python bench_engine_pool.py [--startup 1.0] [--switches 6] [--gap 2] [--max-modes 2]
+
+import argparse
+import logging
+import os
+import stat
+import sys
+import tempfile
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from engine_pool import EnginePool
+from mode_switcher import ModeSwitchOrchestrator
+from osc_listener import ControllerListener
+from processing_manager import ProcessingManager
+from readiness import ReadinessTracker
+from supercollider_manager import SuperColliderManager
+
+FAKE_ENGINE = '''#!{python}
+import os, sys, threading, time
+from pythonosc import dispatcher, osc_server, udp_client
+
+startup = float(os.environ.get("FAKE_STARTUP", "1"))
+name = os.path.basename(sys.argv[0])
+if name == "sclang":
+    # sclang <script> <langPort> <serverPort> <processingPort> <name>
+    args = sys.argv[2:]
+    port = int(args[0]) if args else 57120
+    ready_name = args[3] if len(args) > 3 else "supercollider"
+else:
+    # processing-java --force --sketch=... --output=... --run <oscPort> <scPort> standby
+    args = sys.argv[sys.argv.index("--run") + 1:]
+    port = int(args[0]) if args else 12000
+
+def show(address, *values):
+    print(f"{{name}}:{{port}} {{address}}", flush=True)
+
+mapping = dispatcher.Dispatcher()
+mapping.map("/pace/*", show)
+server = osc_server.BlockingOSCUDPServer(("127.0.0.1", port), mapping)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+time.sleep(startup)
+if name == "sclang":
+    controller = int(os.environ.get("PACE_CONTROLLER_PORT", "57300"))
+    udp_client.SimpleUDPClient("127.0.0.1", controller).send_message("/ready", ready_name)
+else:
+    print("PACE_READY", flush=True)
+while True:
+    time.sleep(1)
+'''
+
+def install_fakes(bin_dir: str):
+    for name in ("processing-java", "sclang"):
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as file:
+            file.write(FAKE_ENGINE.format(python=sys.executable))
+        os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+def cycle(orchestrator, config, switches: int, gap: float, label: str):
+    modes = list(config['modes'].keys())
+    times = []
+    for i in range(switches + 1):
+        mode_name = modes[i % len(modes)]
+        switch = orchestrator.switch(mode_name, config['modes'][mode_name])
+        switch.done.result()
+        times.append(switch.elapsed)
+        print(f"{label:>10}: -> {mode_name:<14} {switch.elapsed:5.2f} s")
+        time.sleep(gap)  # A performer does not press btn3 back to back
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine pool with fake engines")
+    parser.add_argument("--startup", type=float, default=1.0, help="Fake engine startup time (s)")
+    parser.add_argument("--switches", type=int, default=6, help="Mode switches after the cold start")
+    parser.add_argument("--gap", type=float, default=2.0, help="Seconds between switches")
+    parser.add_argument("--max-modes", type=int, default=2, help="engine_pool.max_modes")
+    parser.add_argument("--preload", default="next", help="engine_pool.preload")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+
+    work_dir = tempfile.mkdtemp(prefix="pace-pool-")
+    install_fakes(work_dir)
+    os.environ["FAKE_STARTUP"] = str(args.startup)
+
+    readiness = ReadinessTracker()
+    listener = ControllerListener(config['system']['ports'].get('controller', 57300))
+    readiness.attach(listener.dispatcher)
+    listener.start()
+
+    processing = ProcessingManager(config, readiness)
+    supercollider = SuperColliderManager(config, readiness)
+    orchestrator = ModeSwitchOrchestrator(processing, supercollider)
+    restart = cycle(orchestrator, config, args.switches, args.gap, "restart")
+    orchestrator.shutdown()
+    processing.cleanup()
+    supercollider.cleanup()
+
+    settings = {'enabled': True, 'max_modes': args.max_modes, 'preload': args.preload}
+    pool = EnginePool(config, settings, readiness)
+    pooled = cycle(pool, config, args.switches, args.gap, "pool")
+    summary = pool.summary()
+    pool.shutdown()
+    listener.stop()
+
+    print(f"restart: mean switch {sum(restart[1:]) / args.switches:5.2f} s")
+    print(f"   pool: mean switch {sum(pooled[1:]) / args.switches:5.2f} s ({summary})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Latency stats benchmark (system.latency_stats)
+# Checks the histogram percentiles of latency_stats.py against exact ones
+# computed from the same samples, measures the cost of one record(), and
+# compares event dispatch throughput with the stats off (the plain
+# dispatch_event loop) and on (the timed dispatcher and OSC sends).
+#
+# Usage: python bench_latency_stats.py [--samples 200000] [--events 20000] [--repeat 5]
+
+import argparse
+import logging
+import os
+import random
+import socket
+import sys
+import time
+import yaml
+
+from bench_common import REPO_ROOT, check
+
+from controller_core import ControllerCore
+from latency_stats import LatencyHistogram, summarize, bucket_index, bucket_value, NUM_BUCKETS
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+def exact_percentile(ordered, pct):
+    return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+def check_accuracy(samples: int, seed: int):
+    print("histogram accuracy")
+    ok = check("bucket_value is the top of its bucket",
+               all(bucket_index(bucket_value(i)) == i and bucket_index(bucket_value(i) + 1) == i + 1
+                   for i in range(NUM_BUCKETS - 1)))
+    rng = random.Random(seed)
+    # Mostly fast events with a slow tail, like serial reads behind a busy main loop
+    values = [rng.lognormvariate(5, 1) if rng.random() < 0.98 else rng.uniform(2000, 50000) for _ in range(samples)]
+    histogram = LatencyHistogram()
+    for us in values:
+        histogram.record(us / 1e6)
+    ordered = sorted(int(us) for us in values)
+    summary = summarize([histogram])
+    for name, pct in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999)):
+        exact = exact_percentile(ordered, pct)
+        error = (summary[name] - exact) / exact
+        ok &= check(f"{name} {summary[name]:6d} us vs exact {exact:6d} us ({error * 100:+.1f}%)", abs(error) <= 0.0625)
+    ok &= check(f"count {summary['count']} and max {summary['max']} us exact",
+                summary['count'] == samples and summary['max'] == ordered[-1])
+    return ok
+
+def measure_record(samples: int):
+    histogram = LatencyHistogram()
+    record = histogram.record
+    values = [random.random() * 0.01 for _ in range(samples)]
+    start = time.perf_counter()
+    for seconds in values:
+        record(seconds)
+    elapsed = time.perf_counter() - start
+    print(f"record(): {elapsed / samples * 1e9:.0f} ns per call")
+
+def bench_config(udp_port: int, stats: bool) -> dict:
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['ports']['supercollider'] = udp_port
+    config['system']['ports']['processing'] = udp_port
+    config['system']['osc_batching'] = {'enabled': False}
+    config['system']['devices'] = []
+    config['system']['latency_stats'] = {'enabled': stats, 'summary_seconds': 0, 'http_port': 0}
+    config['system']['defaults']['initial_mode'] = "bench"
+    route = lambda name: {'target': 'supercollider', 'command': f"/bench/{name}", 'params': []}
+    config['modes'] = {'bench': {'controls': {
+        'buttons': {'btn1': {'actions': [route("btn1")]}},
+        'pots': {'pot1': route("pot1")},
+    }}}
+    return config
+
+def run_dispatch(events, udp_port: int, stats: bool) -> float:
+    """Seconds to dispatch the events the way main-control.py's run loop does."""
+    core = BenchCore(bench_config(udp_port, stats))
+    core.compile_mode()
+    timed_dispatch = core.stats.event_dispatcher(core.dispatch_event) if core.stats else None
+    dispatch_event = core.dispatch_event
+    start = time.perf_counter()
+    for item in events:
+        timestamp, event = item
+        if timed_dispatch is not None:
+            timed_dispatch(timestamp, event)
+        else:
+            dispatch_event(*event)
+    return time.perf_counter() - start
+
+def compare_dispatch(count: int, repeat: int):
+    print("dispatch throughput")
+    # Bound but never read, so no receiver thread competes with the loop
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    port = sink.getsockname()[1]
+    # Button presses and pot moves big enough to pass the pot filter
+    events = [(time.perf_counter(), (0, 0, 0) if i % 2 else (2, 0, (i * 37) % 4096)) for i in range(count)]
+    results = {}
+    for stats in (False, True):
+        best = min(run_dispatch(events, port, stats) for _ in range(repeat))
+        results[stats] = best
+        print(f"  stats {'on ' if stats else 'off'}: {count / best:>10,.0f} events/s ({best / count * 1e6:.2f} us/event)")
+    sink.close()
+    print(f"  overhead with stats on: {(results[True] - results[False]) / count * 1e6:+.2f} us/event")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the latency histograms and measure their overhead")
+    parser.add_argument("--samples", type=int, default=200000, help="Samples for the accuracy check")
+    parser.add_argument("--events", type=int, default=20000, help="Events per dispatch run")
+    parser.add_argument("--repeat", type=int, default=5, help="Dispatch runs per setting, the best counts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    ok = check_accuracy(args.samples, args.seed)
+    measure_record(args.samples)
+    compare_dispatch(args.events, args.repeat)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Mode switch benchmark with fake engines
+# The fake managers sleep for the same fixed waits as the real ones
+# (Processing: 0.5 s terminate + 1 s launch wait, SuperCollider: 2 s boot wait)
+# plus a configurable "real" startup time. Compares the old sequential switch
+# with ModeSwitchOrchestrator and shows how much input the main loop consumed
+# while the switch was running.
+#
+# Usage: python bench_mode_switch.py [--startup 0.3] [--input-rate 1000]
+
+import argparse
+import logging
+import threading
+import time
+
+import bench_common  # Puts the controller folder on sys.path
+
+from mode_switcher import ModeSwitchOrchestrator
+
+class FakeProcessing:
+    def __init__(self, startup: float):
+        self.startup = startup
+
+    def start_sketch(self, sketch_name: str) -> bool:
+        time.sleep(0.5)   # terminate + wait
+        time.sleep(self.startup)
+        time.sleep(1)     # fixed launch wait
+        return True
+
+class FakeSuperCollider:
+    def __init__(self, startup: float):
+        self.startup = startup
+        self.current_mode = None
+
+    def set_current_mode(self, mode_name):
+        self.current_mode = mode_name
+
+    def start_supercollider(self) -> bool:
+        time.sleep(self.startup)
+        time.sleep(2)     # fixed boot wait
+        return True
+
+def consume_input(stop: threading.Event, rate: float, counter: list):
+    """Stands in for the main loop taking events off the serial queue."""
+    interval = 1.0 / rate
+    while not stop.is_set():
+        counter[0] += 1
+        time.sleep(interval)
+
+def sequential_switch(processing, supercollider, mode_config):
+    """The old switch_to_next_mode: both engines in a row on the main loop."""
+    processing.start_sketch(mode_config['processing']['sketch'])
+    supercollider.set_current_mode("bench")
+    supercollider.start_supercollider()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark mode switching with fake engines")
+    parser.add_argument("--startup", type=float, default=0.3, help="Extra fake startup time per engine (s)")
+    parser.add_argument("--input-rate", type=float, default=1000, help="Input events per second")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    mode_config = {'processing': {'sketch': "bench_sketch"}}
+    processing = FakeProcessing(args.startup)
+    supercollider = FakeSuperCollider(args.startup)
+
+    # Old path: the main loop is blocked, so no input is consumed at all
+    start = time.perf_counter()
+    sequential_switch(processing, supercollider, mode_config)
+    sequential_time = time.perf_counter() - start
+    print(f"sequential:   switch-to-ready {sequential_time:5.2f} s, main loop blocked, 0 events consumed")
+
+    # New path: engines restart on the orchestrator while the main loop keeps going
+    orchestrator = ModeSwitchOrchestrator(processing, supercollider)
+    counter = [0]
+    stop = threading.Event()
+    consumer = threading.Thread(target=consume_input, args=(stop, args.input_rate, counter), daemon=True)
+    consumer.start()
+    switch = orchestrator.switch("bench", mode_config)
+    results = switch.done.result()
+    stop.set()
+    consumer.join()
+    orchestrator.shutdown()
+    print(f"orchestrated: switch-to-ready {switch.elapsed:5.2f} s, {counter[0]} events consumed meanwhile, "
+          f"results {results}")
+
+if __name__ == "__main__":
+    main()
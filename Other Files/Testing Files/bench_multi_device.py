@@ -0,0 +1,232 @@
+# Multi-controller input benchmark over pseudo-terminals (Linux/macOS only)
+# Runs three controllers from system.devices through the real input path
+# (InputDevice reader threads -> shared InputQueue -> ControllerCore ->
+# OSC on a local UDP port): "main" presses btn1 at a steady rate, "slow"
+# dribbles its lines a few bytes at a time with long stalls mid-line and
+# "flood" streams pot values in bursts (5000 lines/s by default, well past
+# what a Teensy sends). Checks that device/input names route to the right
+# OSC address, that each device's events arrive in order and that flood's
+# pots do not push out main's.
+# Then compares main's press-to-OSC latency with one reader thread per
+# device against one thread reading every port in turn.
+#
+# Usage: python bench_multi_device.py [--presses 500] [--rate 200] [--flood 5000]
+
+import argparse
+import logging
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import serial
+import yaml
+from pythonosc.osc_message import OscMessage
+
+from bench_common import REPO_ROOT, check
+
+from controller_core import ControllerCore
+from input_devices import find_ports
+from serial_reader import InputQueue
+from teensy_protocol import TextDecoder
+
+DEVICES = ("main", "slow", "flood")
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+def route(address):
+    return {'target': 'supercollider', 'command': address, 'params': []}
+
+def bench_config(ports, udp_port):
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['ports']['supercollider'] = udp_port
+    config['system']['ports']['processing'] = udp_port
+    config['system']['osc_batching'] = {'enabled': False}
+    config['system']['devices'] = [{'id': name, 'port': port} for name, port in zip(DEVICES, ports)]
+    config['system']['defaults']['initial_mode'] = "bench"
+    config['modes'] = {'bench': {'controls': {
+        'buttons': {
+            'btn1': {'actions': [route("/main/btn1")]},
+            'slow/btn1': {'actions': [route("/slow/btn1")]},
+            'slow/mbtn2': {'actions': [route("/slow/mbtn2")]},
+        },
+        'pots': {
+            'pot1': route("/main/pot1"),
+            'flood/pot1': route("/flood/pot1"),
+        },
+    }}}
+    return config
+
+class Receiver:
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.messages = []  # (arrival, address, args)
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                data = self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            message = OscMessage(data)
+            self.messages.append((time.perf_counter(), message.address, message.params))
+
+    def addresses(self, address):
+        return [item for item in self.messages if item[1] == address]
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+def write_main(fd, presses, rate, written, stop, flood):
+    for i in range(presses):
+        written.append(time.perf_counter())
+        os.write(fd, b"btn0\n")
+        # Main's own pot moves, in order
+        os.write(fd, f"pot1:{i % 4096}\n".encode())
+        time.sleep(1 / rate)
+
+def write_slow(fd, presses, rate, written, stop, flood):
+    # Every line split in two, with a stall of 20 main presses in the middle
+    lines = [b"btn0\n", b"mbtn_1\n"]
+    i = 0
+    while not stop.is_set():
+        line = lines[i % 2]
+        os.write(fd, line[:3])
+        stop.wait(20 / rate)
+        os.write(fd, line[3:])
+        i += 1
+
+def write_flood(fd, presses, rate, written, stop, flood):
+    # Bursts of 50 lines, like a pot sweep flushed in one USB packet
+    value = 0
+    while not stop.is_set():
+        chunk = b"".join(f"pot1:{(value + n) % 4096}\n".encode() for n in range(50))
+        value += 50
+        try:
+            os.write(fd, chunk)
+        except OSError:
+            return
+        stop.wait(50 / flood)
+
+def round_robin_reader(devices, event_queue, stop):
+    """One thread reading every port in turn, the way a single loop would."""
+    decoders = [TextDecoder() for _ in devices]
+    while not stop.is_set():
+        for device, decoder in zip(devices, decoders):
+            try:
+                data = device.serial.read(device.serial.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError):
+                return
+            timestamp = time.perf_counter()
+            for event in decoder.feed(data):
+                event_queue.put((timestamp, event + (device.index,) if device.index else event))
+
+def run(args, threaded: bool):
+    ptys = [os.openpty() for _ in DEVICES]
+    receiver = Receiver()
+    config = bench_config([os.ttyname(slave) for _, slave in ptys], receiver.port)
+    core = BenchCore(config)
+    event_queue = InputQueue(maxsize=config['system']['defaults'].get('input_queue_size', 256))
+
+    devices = find_ports(core.devices)
+    stop = threading.Event()
+    if threaded:
+        for device in devices:
+            device.open(event_queue)
+    else:
+        for device in devices:
+            device.serial = serial.Serial(device.port, device.baud_rate, timeout=1)
+        threading.Thread(target=round_robin_reader, args=(devices, event_queue, stop), daemon=True).start()
+
+    def consume():
+        while not stop.is_set() or not event_queue.empty():
+            try:
+                _, event = event_queue.get(timeout=0.1)
+            except Exception:
+                continue
+            core.dispatch_event(*event)
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+
+    written = []
+    writers = [threading.Thread(target=target, daemon=True,
+                                args=(master, args.presses, args.rate, written, stop, args.flood))
+               for target, (master, _) in zip((write_main, write_slow, write_flood), ptys)]
+    for writer in writers[1:]:
+        writer.start()
+    writers[0].start()
+    writers[0].join()
+    deadline = time.perf_counter() + 5
+    while len(receiver.addresses("/main/btn1")) < args.presses and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    stop.set()
+    consumer.join(timeout=2)
+
+    for device in devices:
+        device.close()
+    for master, slave in ptys:
+        os.close(master)
+        os.close(slave)
+    receiver.close()
+
+    arrivals = [item[0] for item in receiver.addresses("/main/btn1")]
+    latencies = sorted((arrival - sent) * 1000 for sent, arrival in zip(written, arrivals))
+    return receiver, arrivals, latencies, event_queue
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark several controllers on pseudo-terminals")
+    parser.add_argument("--presses", type=int, default=500, help="btn1 presses on the main device")
+    parser.add_argument("--rate", type=float, default=200, help="Main device presses per second")
+    parser.add_argument("--flood", type=float, default=5000, help="Flood device pot lines per second")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    if not hasattr(os, "openpty"):
+        print("This benchmark needs pseudo-terminal support (Linux or macOS)")
+        return
+
+    print(f"{len(DEVICES)} devices, {args.presses} presses on main at {args.rate:.0f}/s")
+    receiver, arrivals, latencies, event_queue = run(args, threaded=True)
+    main_pots = [params[0] for _, _, params in receiver.addresses("/main/pot1")]
+    flood_pots = [params[0] for _, _, params in receiver.addresses("/flood/pot1")]
+    slow = receiver.addresses("/slow/btn1") + receiver.addresses("/slow/mbtn2")
+    ok = all([
+        check("every main press routed to /main/btn1", len(arrivals) == args.presses),
+        check("slow device's half-written lines routed to slow/btn1 and slow/mbtn2",
+              bool(receiver.addresses("/slow/btn1")) and bool(receiver.addresses("/slow/mbtn2"))),
+        check("nothing routed from unconfigured inputs",
+              {item[1] for item in receiver.messages} <= {"/main/btn1", "/main/pot1", "/slow/btn1",
+                                                          "/slow/mbtn2", "/flood/pot1"}),
+        check("main pots all delivered in order despite the flood",
+              len(main_pots) == args.presses and main_pots == sorted(main_pots)),
+        check("flood pots in order (oldest dropped when behind)",
+              all(b > a or a - b > 0.5 for a, b in zip(flood_pots, flood_pots[1:]))),
+    ])
+    print(f"  {len(flood_pots)} flood pot values sent, {event_queue.dropped} dropped, {len(slow)} slow presses")
+
+    print("main btn1 press -> OSC latency")
+    for label, values in (("reader per device", latencies),
+                          ("one reader for all", run(args, threaded=False)[2])):
+        if not values:
+            print(f"  {label:>18}: nothing delivered")
+            continue
+        print(f"  {label:>18}: {len(values)}/{args.presses} delivered, median {statistics.median(values):7.2f} ms, "
+              f"p99 {values[int(len(values) * 0.99) - 1]:7.2f} ms, max {values[-1]:7.2f} ms")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
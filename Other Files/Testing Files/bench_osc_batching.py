@@ -0,0 +1,160 @@
+# OSC bundle batching check and benchmark
+# Plays a matrix-button storm plus pot moves through the Wizardcore routing
+# table with and without OSCBatcher, then counts the datagrams that arrive at
+# stand-in Processing / SuperCollider sockets. Bundles are parsed back with
+# python-osc to check that no message is lost or altered. Then fails one
+# target's send mid-flush and checks that the other targets are still sent
+# and every target keeps batching afterwards.
+#
+# Usage: python bench_osc_batching.py [--events 20000] [--tick-ms 5]
+
+import argparse
+import logging
+import os
+import random
+import socket
+import sys
+import time
+import yaml
+from pythonosc.osc_bundle import OscBundle
+from pythonosc.osc_message import OscMessage
+
+from bench_common import REPO_ROOT, check
+
+from osc_packets import OSCTarget, OSCBatcher
+from control_routing import compile_controls, MATRIX_OFFSET, POT_OFFSET
+
+def make_sink():
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sink.bind(("127.0.0.1", 0))
+    sink.setblocking(False)
+    return sink
+
+def drain(sink):
+    """Read everything waiting on a sink. Returns (datagrams, messages)."""
+    datagrams, messages = 0, []
+    while True:
+        try:
+            data = sink.recv(65536)
+        except BlockingIOError:
+            return datagrams, messages
+        datagrams += 1
+        if OscBundle.dgram_is_bundle(data):
+            messages.extend(content for content in OscBundle(data) if isinstance(content, OscMessage))
+        else:
+            messages.append(OscMessage(data))
+
+def run(mode_config, events, tick):
+    sinks = {'supercollider': make_sink(), 'processing': make_sink()}
+    batcher = OSCBatcher(tick) if tick else None
+    clients = {name: OSCTarget("127.0.0.1", sink.getsockname()[1], batcher) for name, sink in sinks.items()}
+    table = compile_controls("Wizardcore", mode_config, clients)
+
+    datagrams, messages = 0, []
+    start = time.perf_counter()
+    for i, (input_id, value) in enumerate(events):
+        routes = table[input_id]
+        if routes is not None:
+            for packet, _, _, _ in routes:
+                packet.send(value if input_id >= POT_OFFSET else None)
+        if batcher:
+            batcher.poll(time.perf_counter())
+        if i % 200 == 0:
+            # Keep the sink buffers from overflowing
+            for sink in sinks.values():
+                d, m = drain(sink)
+                datagrams += d
+                messages.extend(m)
+    if batcher:
+        batcher.flush()
+    elapsed = time.perf_counter() - start
+    time.sleep(0.1)
+    for sink in sinks.values():
+        d, m = drain(sink)
+        datagrams += d
+        messages.extend(m)
+        sink.close()
+    return elapsed, datagrams, messages
+
+class FailingTransport:
+    """Forwards to a real socket, except for the next ``failures`` sends, which raise."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.failures = 0
+
+    def sendto(self, data, address):
+        if self.failures:
+            self.failures -= 1
+            raise BlockingIOError("send buffer full")
+        self.sock.sendto(data, address)
+
+def failed_flush() -> bool:
+    """One target's bundle fails to send: the tick's other bundles still go out, later ticks are unaffected."""
+    sinks = [make_sink(), make_sink()]
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    transport = FailingTransport(sender)
+    batcher = OSCBatcher(0.001)
+    targets = [OSCTarget("127.0.0.1", sink.getsockname()[1], batcher, transport) for sink in sinks]
+    packets = [target.packet("/value", with_value=True) for target in targets]
+
+    transport.failures = 1
+    for packet in packets:
+        packet.send(1.0)
+    try:
+        batcher.flush()
+        raised = False
+    except Exception:
+        raised = True
+    for packet in packets:
+        packet.send(2.0)
+    batcher.flush()
+    time.sleep(0.05)
+    received = [[m.params[0] for m in drain(sink)[1]] for sink in sinks]
+    for sink in sinks:
+        sink.close()
+    sender.close()
+
+    ok = check("failed send is logged, not raised", not raised)
+    ok &= check("other target still sent that tick", received[1] == [1.0, 2.0])
+    ok &= check("failed target batches again next tick", received[0] == [2.0])
+    ok &= check("no target left with a stale queue", not any(t._pending for t in targets))
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OSC bundle batching")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--tick-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    mode_config = config['modes']['Wizardcore']
+
+    events = []
+    for _ in range(args.events):
+        if random.random() < 0.7:
+            events.append((random.choice([0, 1, 3, 4, 5, 6, MATRIX_OFFSET, MATRIX_OFFSET + 1]), None))
+        else:
+            events.append((POT_OFFSET + random.randrange(3), random.randrange(4096) / 4095))
+
+    plain = run(mode_config, events, 0)
+    batched = run(mode_config, events, args.tick_ms / 1000)
+
+    plain_msgs = sorted((m.address, tuple(m.params)) for m in plain[2])
+    batched_msgs = sorted((m.address, tuple(m.params)) for m in batched[2])
+    if plain_msgs != batched_msgs:
+        raise AssertionError(f"Message mismatch: {len(plain_msgs)} plain vs {len(batched_msgs)} batched")
+
+    print(f"{args.events} events, {len(plain_msgs)} OSC messages")
+    print(f"  unbatched:        {plain[1]:7d} datagrams  {plain[0] * 1000:8.1f} ms")
+    print(f"  {args.tick_ms:g} ms bundles:   {batched[1]:7d} datagrams  {batched[0] * 1000:8.1f} ms")
+
+    print("failed send during a flush (one error is logged)")
+    logging.basicConfig(level=logging.ERROR)
+    if not failed_flush():
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
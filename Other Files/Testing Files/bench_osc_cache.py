@@ -0,0 +1,92 @@
+# OSC packet cache check and benchmark
+# 1. Verifies that every cached packet in config.yml is byte-for-byte identical
+#    to what python-osc's SimpleUDPClient would have sent for the same value.
+# 2. Times SimpleUDPClient.send_message against OSCPacket.send on the pot path.
+#
+# Usage: python bench_osc_cache.py [--sends 100000]
+
+import argparse
+import os
+import random
+import socket
+import time
+import yaml
+from pythonosc import udp_client
+
+from bench_common import REPO_ROOT
+
+from osc_packets import OSCTarget, encode_message
+from control_routing import compile_controls, POT_OFFSET
+
+def check_config_routes(config):
+    """Compare every compiled route against python-osc output. Returns the number of checks."""
+    target = OSCTarget("127.0.0.1", 9)
+    clients = {'supercollider': target, 'processing': target}
+    checks = 0
+    for mode_name, mode_config in config['modes'].items():
+        table = compile_controls(mode_name, mode_config, clients)
+        for input_id, routes in enumerate(table):
+            if routes is None:
+                continue
+            for packet, command, params, _ in routes:
+                if input_id < POT_OFFSET:
+                    samples = [None]
+                else:
+                    samples = [0.0, 1.0, 0.5, 1 / 3] + [random.randrange(4096) / 4095 for _ in range(200)]
+                for value in samples:
+                    if value is None:
+                        expected = encode_message(command, params)
+                    else:
+                        # What the old handle_pot_control sent: params + [mapped_value]
+                        expected = encode_message(command, params + [value])
+                        packet.send(value)
+                    if bytes(packet.data) != expected:
+                        raise AssertionError(f"{mode_name} {command} {params} {value}: "
+                                             f"{bytes(packet.data)!r} != {expected!r}")
+                    checks += 1
+    target.close()
+    return checks
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the OSC packet cache")
+    parser.add_argument("--sends", type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+
+    # Sink socket so the datagrams have somewhere to go
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    port = sink.getsockname()[1]
+
+    checks = check_config_routes(config)
+    print(f"Byte-for-byte check passed for {checks} packets")
+
+    values = [random.randrange(4096) / 4095 for _ in range(args.sends)]
+
+    client = udp_client.SimpleUDPClient("127.0.0.1", port)
+    start = time.perf_counter()
+    for value in values:
+        try:
+            client.send_message("/potControl", [1, value])
+        except BlockingIOError:
+            pass
+    python_osc_time = time.perf_counter() - start
+
+    packet = OSCTarget("127.0.0.1", port).packet("/potControl", [1], with_value=True)
+    start = time.perf_counter()
+    for value in values:
+        try:
+            packet.send(value)
+        except BlockingIOError:
+            pass
+    cached_time = time.perf_counter() - start
+
+    print(f"{args.sends} pot sends to localhost")
+    print(f"  SimpleUDPClient: {args.sends / python_osc_time:10,.0f} msgs/s")
+    print(f"  OSCPacket:       {args.sends / cached_time:10,.0f} msgs/s  ({python_osc_time / cached_time:.2f}x)")
+    sink.close()
+
+if __name__ == "__main__":
+    main()
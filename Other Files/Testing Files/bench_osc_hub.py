@@ -0,0 +1,157 @@
+# Engine feedback routing benchmark (controls.feedback)
+# A peer process plays the engines: it sends feedback messages to the
+# controller port and counts what the controller forwards back to it. In
+# between runs the controller's real path, as in main-control.py: the
+# ControllerListener thread, the InputQueue, and a main loop thread that
+# dispatches through the routing table (and its feedback filters) to OSC.
+# Reports messages per second on localhost and where messages were lost,
+# per kind of feedback route.
+#
+# Usage: python bench_osc_hub.py [--count 20000] [--rate 0] [--receive-buffer 0] [--controller-port 57390] [--engine-port 57920]
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import threading
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from controller_core import ControllerCore
+from osc_listener import ControllerListener
+from osc_packets import encode_message
+from serial_reader import InputQueue
+
+# name -> (incoming arguments, feedback config); forwarded messages per incoming one
+CASES = {
+    'trigger': ([], {'target': 'supercollider', 'command': '/hub/out'}),
+    'float': ([0.5], {'target': 'supercollider', 'command': '/hub/out'}),
+    'int + float': ([3, 0.5], {'target': 'processing', 'command': '/hub/out', 'params': ["spectrum"]}),
+    'float fan-out x3': ([0.5], {'actions': [{'target': 'supercollider', 'command': '/hub/a'},
+                                             {'target': 'processing', 'command': '/hub/b'},
+                                             {'target': 'processing', 'command': '/hub/c', 'params': [1]}]}),
+    'float, 60/s': ([0.5], {'target': 'supercollider', 'command': '/hub/out', 'filter': {'max_rate': 60}}),
+}
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+def run_peer(args):
+    """Engine side: send ``count`` feedback messages, then count forwarded ones until it goes quiet."""
+    incoming = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    incoming.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    incoming.bind(("127.0.0.1", args.engine_port))
+    incoming.settimeout(1.0)
+    received = []
+
+    def receive():
+        while True:
+            try:
+                incoming.recv(4096)
+            except socket.timeout:
+                return
+            received.append(time.perf_counter())
+    receiver = threading.Thread(target=receive)
+
+    outgoing = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    data = encode_message("/hub/in", json.loads(args.peer))
+    address = ("127.0.0.1", args.controller_port)
+    interval = 1 / args.rate if args.rate else 0
+    receiver.start()
+    start = time.perf_counter()
+    for i in range(args.count):
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        outgoing.sendto(data, address)
+    sent_in = time.perf_counter() - start
+    receiver.join()
+    print(json.dumps({'sent': args.count, 'send_seconds': sent_in, 'received': len(received),
+                      'receive_seconds': received[-1] - start if received else 0}))
+
+def bench_config(args, feedback) -> dict:
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['ports'].update(processing=args.engine_port, supercollider=args.engine_port,
+                                     controller=args.controller_port)
+    config['system']['osc_batching'] = {'enabled': False}
+    config['system']['devices'] = []
+    config['system']['defaults']['initial_mode'] = "bench"
+    config['modes'] = {'bench': {'controls': {'feedback': {'/hub/in': feedback}}}}
+    return config
+
+def run_case(args, incoming_args, feedback) -> dict:
+    core = BenchCore(bench_config(args, feedback))
+    event_queue = InputQueue(maxsize=core.config['system']['defaults'].get('input_queue_size', 256))
+    listener = ControllerListener(args.controller_port, receive_buffer=args.receive_buffer)
+    listener.dispatcher.set_default_handler(
+        core.feedback_handler(lambda event: event_queue.put((time.perf_counter(), event)))
+    )
+    listener.start()
+
+    dispatched = [0]
+    running = True
+    def main_loop():
+        while running:
+            next_due = core.service_timers()
+            timeout = 0.1 if next_due is None else max(0.0, next_due - time.perf_counter())
+            try:
+                _, event = event_queue.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            core.dispatch_event(*event)
+            dispatched[0] += 1
+    loop = threading.Thread(target=main_loop, daemon=True)
+    loop.start()
+
+    peer = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--peer", json.dumps(incoming_args), "--count", str(args.count),
+         "--rate", str(args.rate), "--controller-port", str(args.controller_port),
+         "--engine-port", str(args.engine_port)],
+        capture_output=True, text=True, timeout=120
+    )
+    running = False
+    loop.join()
+    listener.stop()
+    for client in core.osc_clients.values():
+        client.close()
+    result = json.loads(peer.stdout)
+    result.update(dispatched=dispatched[0], dropped_in_queue=event_queue.dropped)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Messages per second through the controller's feedback routing")
+    parser.add_argument("--count", type=int, default=20000, help="Feedback messages per case")
+    parser.add_argument("--rate", type=float, default=0, help="Messages per second the engine sends, 0 for flat out")
+    parser.add_argument("--controller-port", type=int, default=57390)
+    parser.add_argument("--engine-port", type=int, default=57920)
+    parser.add_argument("--receive-buffer", type=int, default=0,
+                        help="Listener receive buffer in bytes (system.defaults.listener_buffer), 0 for the OS default")
+    parser.add_argument("--peer", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.peer is not None:
+        run_peer(args)
+        return
+    logging.basicConfig(level=logging.ERROR)
+
+    print(f"{args.count} feedback messages per case, {'flat out' if not args.rate else f'{args.rate:g}/s'}")
+    for name, (incoming_args, feedback) in CASES.items():
+        r = run_case(args, incoming_args, feedback)
+        routes = len(feedback.get('actions', [feedback]))
+        rate_in = r['dispatched'] / r['receive_seconds'] if r['receive_seconds'] else 0
+        rate_out = r['received'] / r['receive_seconds'] if r['receive_seconds'] else 0
+        print(f"{name:>17}: {r['sent']} sent in {r['send_seconds']:.2f} s, {r['dispatched']} routed "
+              f"({r['sent'] - r['dispatched'] - r['dropped_in_queue']} lost on UDP, {r['dropped_in_queue']} "
+              f"dropped in queue), {r['received']} forwarded (x{routes} routes): "
+              f"{rate_in:,.0f} msg/s in, {rate_out:,.0f} msg/s out")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# OSC round-trip benchmark with the latency probe (system.latency_probe)
+# Starts osc_echo_server.py in its own process as a stand-in for Processing
+# and SuperCollider, then runs the controller core with its probe pinging
+# both engines while a pot sweep is played into parse_teensy_data in real
+# time, the way main-control.py's run loop services input and timers.
+# Each case changes the batching or pot rate limiting settings; reports the
+# round-trip distribution and packet loss per engine and case.
+#
+# Usage: python bench_osc_rtt.py [--seconds 5] [--pot-rate 1000] [--interval-ms 10] [--delay-ms 0] [--loss 0]
+
+import argparse
+import logging
+import math
+import os
+import subprocess
+import sys
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from controller_core import ControllerCore
+from input_replay import pot_sweep, controller_sink
+from osc_listener import ControllerListener
+
+ECHO_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "osc_echo_server.py")
+
+# name -> (osc_batching, pot max_rate), batching None is off
+CASES = {
+    'direct': (None, 0),
+    'rate 60/s': (None, 60),
+    'batch 5 ms': (5, 0),
+    'batch 16.7 ms': (16.7, 0),
+    'batch 5 ms, 60/s': (5, 60),
+}
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+def bench_config(args, batching, max_rate) -> dict:
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['ports'].update(processing=args.processing_port, supercollider=args.supercollider_port,
+                                     controller=args.controller_port)
+    config['system']['osc_batching'] = {'enabled': batching is not None, 'tick_ms': batching or 5}
+    config['system']['devices'] = []
+    config['system']['latency_probe'] = {'enabled': True, 'interval_ms': args.interval_ms,
+                                         'timeout_ms': args.timeout_ms, 'summary_seconds': 0}
+    config['system']['defaults']['initial_mode'] = "bench"
+    # Two pots to Processing, one to SuperCollider
+    pots = {f"pot{n}": {'target': 'processing', 'command': '/potControl', 'params': [n - 1]} for n in (1, 2)}
+    pots['pot3'] = {'target': 'supercollider', 'command': '/pot3', 'params': []}
+    controls = {'pots': pots, 'pot_filter': {'deadband': 0, 'smoothing': 'none', 'max_rate': max_rate}}
+    config['modes'] = {'bench': {'controls': controls}}
+    return config
+
+def run_case(args, batching, max_rate, load: bool) -> dict:
+    core = BenchCore(bench_config(args, batching, max_rate))
+    listener = ControllerListener(args.controller_port)
+    core.probe.attach(listener.dispatcher)
+    listener.start()
+
+    stream = pot_sweep(args.pot_rate, args.seconds) if load else []
+    sink = controller_sink(core)
+    start = time.perf_counter()
+    end = start + args.seconds
+    i = 0
+    while True:
+        now = time.perf_counter()
+        while i < len(stream) and start + stream[i][0] <= now:
+            sink(stream[i][1])
+            i += 1
+        if now >= end:
+            break
+        next_due = core.service_timers()
+        wake = min(next_due or math.inf, start + stream[i][0] if i < len(stream) else end)
+        delay = wake - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    # Let the last pings come back, then count the rest as lost
+    deadline = time.perf_counter() + args.timeout_ms / 1000
+    while time.perf_counter() < deadline:
+        if core.batcher:
+            core.batcher.flush()
+        time.sleep(0.01)
+    core.probe.expire(time.perf_counter())
+    result = core.probe.snapshot()
+    listener.stop()
+    for client in core.osc_clients.values():
+        client.close()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip times to stand-in engines under pot load")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of each case")
+    parser.add_argument("--pot-rate", type=float, default=1000, help="Pot readings per second, all pots together")
+    parser.add_argument("--interval-ms", type=float, default=10, help="Ping interval per engine")
+    parser.add_argument("--timeout-ms", type=float, default=500, help="Pings without a pong within this are lost")
+    parser.add_argument("--delay-ms", type=float, default=0, help="Echo server delay before each pong")
+    parser.add_argument("--loss", type=float, default=0, help="Fraction of pings the echo server ignores")
+    parser.add_argument("--processing-port", type=int, default=12900)
+    parser.add_argument("--supercollider-port", type=int, default=57920)
+    parser.add_argument("--controller-port", type=int, default=57390)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    echo = subprocess.Popen(
+        [sys.executable, ECHO_SERVER, "--ports", str(args.processing_port), str(args.supercollider_port),
+         "--controller", str(args.controller_port), "--delay-ms", str(args.delay_ms), "--loss", str(args.loss)],
+        stdout=subprocess.PIPE, text=True
+    )
+    try:
+        print(echo.stdout.readline().strip())
+        print(f"{args.pot_rate:g} pot readings/s for {args.seconds:g} s per case, ping every {args.interval_ms:g} ms")
+        runs = [("idle", None, 0, False)] + [(name, batching, max_rate, True)
+                                              for name, (batching, max_rate) in CASES.items()]
+        for name, batching, max_rate, load in runs:
+            result = run_case(args, batching, max_rate, load)
+            for engine, s in result.items():
+                rtt = s['rtt_us']
+                line = f"{name:>17} {engine:>13}: {s['received']:5d}/{s['sent']:<5d} pongs, {s['loss_percent']:5.1f}% lost"
+                if rtt:
+                    line += (f", RTT p50 {rtt['p50'] / 1000:6.2f} ms  p90 {rtt['p90'] / 1000:6.2f} ms  "
+                             f"p99 {rtt['p99'] / 1000:6.2f} ms  max {rtt['max'] / 1000:6.2f} ms")
+                print(line)
+    finally:
+        echo.terminate()
+        out, _ = echo.communicate(timeout=5)
+        print(out.strip())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Pot mapping curve benchmark (pot_curves.py)
+# Compares mapping a raw pot reading by computing the curve on every call
+# (the old linear map_value, and what exp and scale curves would cost done
+# the same way) with the lookup tables the controller now builds per mode,
+# checks the float32 tables against the exact curves, times building them,
+# and times the batch API on a recording-sized list (and numpy array, if
+# numpy is installed).
+#
+# Usage: python bench_pot_curves.py [--samples 200000]
+
+import argparse
+import math
+import random
+import time
+
+import bench_common  # Puts the controller folder on sys.path
+
+import pot_curves
+from pot_curves import build_curve, map_samples, POT_STEPS
+
+MINOR_HZ = [440.0 * 2 ** ((note - 69) / 12) for note in range(48, 73) if (note - 9) % 12 in (0, 2, 3, 5, 7, 8, 10)]
+
+# name -> (curve settings, the same curve computed per call)
+CASES = {
+    'linear 0-1': ({}, lambda v: (v - 0) * (1.0 - 0) / (4095 - 0) + 0),
+    'exp 20-20000 Hz': ({'type': 'exp', 'min': 20, 'max': 20000}, lambda v: 20 * 1000 ** (v / 4095)),
+    'log, shape 9': ({'type': 'log'}, lambda v: math.log1p(9 * v / 4095) / math.log1p(9)),
+    'A minor, Hz': ({'type': 'scale', 'low': 48, 'high': 72, 'scale': 'minor', 'root': 9, 'output': 'hz'},
+                    lambda v: MINOR_HZ[min(int(v / 4095 * len(MINOR_HZ)), len(MINOR_HZ) - 1)]),
+}
+
+def per_call(func, samples) -> float:
+    start = time.perf_counter()
+    for value in samples:
+        func(value)
+    return (time.perf_counter() - start) / len(samples)
+
+def lookup(table):
+    # What ControllerCore.handle_pot_control does
+    def mapped(raw_value):
+        if 0 <= raw_value < POT_STEPS:
+            return table[raw_value]
+        return table[0 if raw_value < 0 else POT_STEPS - 1]
+    return mapped
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call curve math against precomputed lookup tables")
+    parser.add_argument("--samples", type=int, default=200000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    samples = [rng.randrange(POT_STEPS) for _ in range(args.samples)]
+    print(f"{args.samples} raw pot readings")
+    for name, (settings, exact) in CASES.items():
+        pot_curves._tables.clear()
+        start = time.perf_counter()
+        table = build_curve(settings)
+        built = time.perf_counter() - start
+        error = max(abs(table[v] - exact(v)) / max(abs(exact(v)), 1e-9) for v in range(POT_STEPS))
+        computed = per_call(exact, samples)
+        looked_up = per_call(lookup(table), samples)
+        print(f"{name:>16}: computed {computed * 1e9:6.1f} ns, table {looked_up * 1e9:6.1f} ns per reading, "
+              f"table built in {built * 1000:5.2f} ms, max relative error {error:.1e}")
+
+    table = build_curve(CASES['exp 20-20000 Hz'][0])
+    exact = CASES['exp 20-20000 Hz'][1]
+    start = time.perf_counter()
+    [exact(v) for v in samples]
+    computed = time.perf_counter() - start
+    start = time.perf_counter()
+    map_samples(table, samples)
+    batched = time.perf_counter() - start
+    print(f"batch exp, list: computed {computed * 1000:.1f} ms, map_samples {batched * 1000:.1f} ms")
+    if pot_curves.numpy is not None:
+        array = pot_curves.numpy.array(samples)
+        start = time.perf_counter()
+        map_samples(table, array)
+        print(f"batch exp, numpy: map_samples {(time.perf_counter() - start) * 1000:.2f} ms")
+    else:
+        print("numpy not installed, skipping the numpy batch")
+
+if __name__ == "__main__":
+    main()
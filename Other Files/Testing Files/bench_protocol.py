@@ -0,0 +1,69 @@
+# Teensy protocol throughput benchmark: text lines vs binary frames
+# Encodes the same synthetic event stream in both formats, feeds it to the
+# decoders in serial-sized chunks and reports events decoded per second.
+# Also checks that both decoders return exactly the events that were encoded.
+#
+# Usage: python bench_protocol.py [--events 200000] [--chunk 64]
+
+import argparse
+import logging
+import random
+import time
+
+import bench_common  # Puts the controller folder on sys.path
+
+from teensy_protocol import (TextDecoder, BinaryDecoder, encode_text_event, encode_binary_event,
+                             EVENT_BUTTON, EVENT_MATRIX, EVENT_POT, FRAME_SIZE)
+
+def synthetic_events(count: int):
+    events = []
+    for _ in range(count):
+        roll = random.random()
+        if roll < 0.8:
+            events.append((EVENT_POT, random.randrange(3), random.randrange(4096)))
+        elif roll < 0.9:
+            events.append((EVENT_BUTTON, random.randrange(7), 0))
+        else:
+            events.append((EVENT_MATRIX, random.randrange(16), 0))
+    return events
+
+def decode_all(decoder, stream: bytes, chunk: int):
+    events = []
+    start = time.perf_counter()
+    for pos in range(0, len(stream), chunk):
+        events.extend(decoder.feed(stream[pos:pos + chunk]))
+    return events, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Teensy protocol decoders")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--chunk", type=int, default=64, help="Bytes per simulated serial read")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    events = synthetic_events(args.events)
+    text_stream = b"".join(encode_text_event(*event) for event in events)
+    binary_stream = b"".join(encode_binary_event(*event) for event in events)
+
+    text_events, text_time = decode_all(TextDecoder(), text_stream, args.chunk)
+    binary_decoder = BinaryDecoder()
+    binary_events, binary_time = decode_all(binary_decoder, binary_stream, args.chunk)
+
+    if text_events != events or binary_events != events:
+        raise AssertionError("Decoded events do not match the encoded stream")
+
+    # A corrupted byte must only cost the frame it lands in
+    frames = 1000
+    corrupted = bytearray(binary_stream[:frames * FRAME_SIZE])
+    corrupted[FRAME_SIZE * 500 + 3] ^= 0xFF
+    recovered = BinaryDecoder().feed(bytes(corrupted))
+    if len(recovered) != frames - 1:
+        raise AssertionError(f"Resync failed: {len(recovered)} frames recovered")
+
+    print(f"{args.events} events in {args.chunk}-byte chunks")
+    print(f"  text:   {len(text_stream):9d} bytes  {args.events / text_time:12,.0f} events/s")
+    print(f"  binary: {len(binary_stream):9d} bytes  {args.events / binary_time:12,.0f} events/s  "
+          f"({text_time / binary_time:.2f}x)")
+
+if __name__ == "__main__":
+    main()
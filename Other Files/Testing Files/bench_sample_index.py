@@ -0,0 +1,158 @@
+# Sample library index benchmark (sample_index.py)
+# Writes a synthetic library laid out like the Iowa samples (Piano.ff AIFF
+# files named with flats, stereo Marimba and Flute AIFF, a few WAVs) of
+# decaying tones with silence before them, then times indexing it from
+# scratch with one worker and with one per core, an update with nothing
+# changed, and an update after touching and deleting a few files. Checks
+# the notes, MIDI numbers, start times and (with numpy) measured pitches
+# against what was written, and compares what G.A.S. loads with the
+# index (the preset's 48-87 range) against loading every file.
+#
+# Usage: python bench_sample_index.py [--notes 88] [--seconds 2] [--workers 0]
+
+import argparse
+import math
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+from bench_common import check
+
+import sample_index
+from sample_index import load_index, update_index
+
+FLATS = ["C", "Db", "D", "Eb", "E", "F", "Gb", "G", "Ab", "A", "Bb", "B"]
+SAMPLE_RATE = 44100
+LEAD_SILENCE = 0.25
+DETUNE_CENTS = 7  # Every sample is written this sharp of its note
+
+def extended(value: float) -> bytes:
+    """80-bit IEEE extended float for the AIFF COMM chunk."""
+    exponent = int(math.floor(math.log2(value)))
+    mantissa = int(value * 2 ** (63 - exponent))
+    return struct.pack('>HQ', exponent + 16383, mantissa)
+
+def tone(midi: int, seconds: float, channels: int) -> bytes:
+    """16-bit little-endian frames: silence, then a decaying tone with a few partials."""
+    frequency = 440.0 * 2 ** ((midi - 69 + DETUNE_CENTS / 100) / 12)
+    lead = int(LEAD_SILENCE * SAMPLE_RATE)
+    frames = bytearray()
+    for i in range(int(seconds * SAMPLE_RATE)):
+        if i < lead:
+            value = 0
+        else:
+            t = (i - lead) / SAMPLE_RATE
+            value = int(16000 * math.exp(-2 * t) * (math.sin(2 * math.pi * frequency * t)
+                                                    + 0.4 * math.sin(4 * math.pi * frequency * t)))
+        frames += struct.pack('<h', value) * channels
+    return bytes(frames)
+
+def write_aiff(path: str, frames: bytes, channels: int):
+    data = bytearray(frames)
+    data[0::2], data[1::2] = frames[1::2], frames[0::2]  # Big-endian samples
+    count = len(frames) // (2 * channels)
+    comm = struct.pack('>hIh', channels, count, 16) + extended(SAMPLE_RATE)
+    ssnd = struct.pack('>II', 0, 0) + bytes(data)
+    body = b'AIFF' + b'COMM' + struct.pack('>I', len(comm)) + comm + b'SSND' + struct.pack('>I', len(ssnd)) + ssnd
+    with open(path, "wb") as file:
+        file.write(b'FORM' + struct.pack('>I', len(body)) + body)
+
+def write_wav(path: str, frames: bytes, channels: int):
+    import wave
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(frames)
+
+def build_library(root: str, notes: int, seconds: float) -> dict:
+    """Write the library and return the MIDI note of every file by relative path."""
+    layout = [  # (folder, name pattern, first MIDI note, channels, format)
+        ("Piano/Piano.ff", "Piano.ff.{note}.aiff", 21, 1, write_aiff),
+        ("Marimba/Marimba.cord.ff.stereo", "Marimba.cord.ff.{note}.stereo.aiff", 36, 2, write_aiff),
+        ("Flute/Flute.vib.ff.stereo", "Flute.vib.ff.{note}.stereo.wav", 59, 2, write_wav),
+    ]
+    expected = {}
+    tones = {}
+    for folder, pattern, first, channels, writer in layout:
+        os.makedirs(os.path.join(root, folder))
+        count = notes if folder.startswith("Piano") else max(1, notes // 2)
+        for midi in range(first, min(first + count, 109)):
+            name = pattern.format(note=f"{FLATS[midi % 12]}{midi // 12 - 1}")
+            if (midi, channels) not in tones:
+                tones[midi, channels] = tone(midi, seconds, channels)
+            writer(os.path.join(root, folder, name), tones[midi, channels], channels)
+            expected[f"{folder}/{name}"] = midi
+    return expected
+
+def timed(label: str, **kwargs) -> dict:
+    counts = update_index(**kwargs)
+    print(f"{label:>28}: {counts['seconds']:7.3f} s ({counts['new']} new, {counts['changed']} changed, "
+          f"{counts['removed']} removed, {counts['unchanged']} unchanged)")
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description="Full and incremental indexing of a synthetic sample library")
+    parser.add_argument("--notes", type=int, default=88, help="Piano notes (marimba and flute get half)")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Length of each sample")
+    parser.add_argument("--workers", type=int, default=0, help="Processes for the parallel run (0: one per core)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pace-samples-")
+    ok = True
+    try:
+        start = time.perf_counter()
+        expected = build_library(workdir, args.notes, args.seconds)
+        size = sum(os.path.getsize(os.path.join(workdir, path)) for path in expected)
+        print(f"{len(expected)} samples, {size / 2 ** 20:.1f} MiB written in {time.perf_counter() - start:.1f} s, "
+              f"{os.cpu_count()} cores, " + ("numpy " + sample_index.numpy.__version__ if sample_index.numpy
+                                              else "no numpy (no pitch measurement)"))
+        index_path = os.path.join(workdir, sample_index.INDEX_NAME)
+
+        serial = timed("full scan, 1 worker", root=workdir, workers=1)
+        workers = args.workers or os.cpu_count() or 1
+        parallel = timed(f"full scan, {workers} workers", root=workdir, workers=workers, force=True)
+        print(f"{'speedup':>28}: {serial['seconds'] / parallel['seconds']:7.2f}x")
+        unchanged = timed("update, nothing changed", root=workdir, workers=workers)
+
+        changed = sorted(expected)[:5]
+        for path in changed[:3]:
+            os.utime(os.path.join(workdir, path))
+        for path in changed[3:]:
+            os.remove(os.path.join(workdir, path))
+            del expected[path]
+        touched = timed("update, 3 touched 2 deleted", root=workdir, workers=workers)
+
+        index = load_index(index_path)
+        ok &= check("every file indexed once", sorted(index) == sorted(expected))
+        ok &= check("nothing analysed when unchanged", unchanged['unchanged'] == len(expected) + 2
+                    and unchanged['new'] + unchanged['changed'] == 0)
+        ok &= check("only touched and deleted files handled", touched['changed'] == 3 and touched['removed'] == 2)
+        ok &= check("MIDI notes from the flat note names", all(index[path].get('midi') == midi
+                                                                for path, midi in expected.items()))
+        ok &= check("instrument and articulation from the folders",
+                    {(r['instrument'], r['articulation']) for r in index.values()}
+                    == {('piano', 'ff'), ('marimba', 'cord'), ('flute', 'vib')})
+        ok &= check("start after the lead silence", all(abs(r['start'] - LEAD_SILENCE) < 0.01 for r in index.values()))
+        ok &= check("channels and duration", all(r['channels'] == (1 if r['instrument'] == 'piano' else 2)
+                                                 and abs(r['duration'] - args.seconds) < 0.001 for r in index.values()))
+        if sample_index.numpy is not None:
+            off = [abs(r['cents'] - DETUNE_CENTS) for r in index.values()]
+            print(f"{'pitch error':>28}: max {max(off):.1f} cents, mean {sum(off) / len(off):.2f} cents")
+            ok &= check(f"measured pitch within 3 cents of +{DETUNE_CENTS}", max(off) < 3)
+
+        # What main.scd loads: three articulations, with the index only the preset's notes
+        needed = [r for r in index.values() if 48 <= r['midi'] <= 87]
+        print(f"{'G.A.S. buffers, all files':>28}: {len(index)} ({sum(r['size'] for r in index.values()) / 2 ** 20:.1f} MiB)")
+        print(f"{'G.A.S. buffers, with index':>28}: {len(needed)} ({sum(r['size'] for r in needed) / 2 ** 20:.1f} MiB)")
+        print(f"{'index file':>28}: {os.path.getsize(index_path) / 1024:.1f} KiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Resident SuperCollider host benchmark against fake_sc_host.py
+# Puts an `sclang` wrapper around fake_sc_host.py first on PATH (Linux/macOS
+# only) and cycles through the modes with the real SuperColliderManager,
+# once restarting sclang for every mode and once with the resident host.
+# Then kills the host to check that the next load starts a fresh one.
+#
+# Usage: python bench_sc_host.py [--boot 1.5] [--load 0.05] [--switches 6] [--controller-port 57310]
+
+import argparse
+import logging
+import os
+import stat
+import sys
+import tempfile
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from osc_listener import ControllerListener
+from readiness import ReadinessTracker
+from supercollider_manager import SuperColliderManager
+
+FAKE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_sc_host.py")
+
+def install_fake(bin_dir: str):
+    path = os.path.join(bin_dir, "sclang")
+    with open(path, "w") as file:
+        file.write(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE}" "$@"\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+def cycle(manager, modes, switches: int, label: str):
+    times = []
+    for i in range(switches + 1):
+        manager.set_current_mode(modes[i % len(modes)])
+        start = time.perf_counter()
+        ok = manager.start_supercollider()
+        times.append(time.perf_counter() - start)
+        print(f"{label:>9}: -> {modes[i % len(modes)]:<14} {times[-1]:5.2f} s {'ok' if ok else 'FAILED'}")
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the resident SuperCollider host")
+    parser.add_argument("--boot", type=float, default=1.5, help="Fake server boot time (s)")
+    parser.add_argument("--load", type=float, default=0.05, help="Fake mode script load time (s)")
+    parser.add_argument("--switches", type=int, default=6, help="Mode switches after the first start")
+    parser.add_argument("--controller-port", type=int, help="Listen for /ready here instead of system.ports.controller")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    modes = list(config['modes'].keys())
+    if args.controller_port:
+        config['system']['ports']['controller'] = args.controller_port
+
+    work_dir = tempfile.mkdtemp(prefix="pace-host-")
+    install_fake(work_dir)
+    os.environ["FAKE_SC_BOOT"] = str(args.boot)
+    os.environ["FAKE_SC_LOAD"] = str(args.load)
+
+    readiness = ReadinessTracker()
+    listener = ControllerListener(config['system']['ports'].get('controller', 57300))
+    readiness.attach(listener.dispatcher)
+    listener.start()
+
+    config['system']['defaults']['supercollider_host'] = False
+    restarting = SuperColliderManager(config, readiness)
+    restart = cycle(restarting, modes, args.switches, "restart")
+    restarting.cleanup()
+
+    config['system']['defaults']['supercollider_host'] = True
+    resident = SuperColliderManager(config, readiness)
+    hosted = cycle(resident, modes, args.switches, "resident")
+
+    # A crashed host is replaced on the next load
+    resident.sclang_process.kill()
+    resident.sclang_process.wait()
+    start = time.perf_counter()
+    ok = resident.start_supercollider()
+    print(f"after host crash: reload {time.perf_counter() - start:5.2f} s {'ok' if ok else 'FAILED'}")
+    resident.cleanup()
+    listener.stop()
+
+    print(f"restart:  mean switch {sum(restart[1:]) / args.switches * 1000:7.1f} ms")
+    print(f"resident: mean switch {sum(hosted[1:]) / args.switches * 1000:7.1f} ms "
+          f"(first start {hosted[0]:.2f} s incl. host boot)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# Serial framing and input queue checks plus throughput benchmark
+# Checks that LineFramer/TextDecoder return the same events however the
+# stream is chunked: lines split at every byte position, many lines merged
+# into one chunk, CRLF endings and an overlong garbage line. Checks that the
+# InputQueue drops only the oldest pot events when full, never a button
+# press, and keeps arrival order. Then measures framer throughput per chunk
+# size and queue put/get throughput against queue.Queue.
+#
+# Usage: python bench_serial_framing.py [--events 200000]
+
+import argparse
+import logging
+import queue
+import random
+import time
+
+from bench_common import require
+
+from serial_reader import InputQueue
+from teensy_protocol import LineFramer, TextDecoder, encode_text_event, EVENT_BUTTON, EVENT_MATRIX, EVENT_POT
+
+def synthetic_events(count: int):
+    events = []
+    for _ in range(count):
+        roll = random.random()
+        if roll < 0.8:
+            events.append((EVENT_POT, random.randrange(3), random.randrange(4096)))
+        elif roll < 0.9:
+            events.append((EVENT_BUTTON, random.randrange(7), 0))
+        else:
+            events.append((EVENT_MATRIX, random.randrange(16), 0))
+    return events
+
+def feed_chunks(decoder, stream: bytes, sizes):
+    events = []
+    pos = 0
+    for size in sizes:
+        events.extend(decoder.feed(stream[pos:pos + size]))
+        pos += size
+    events.extend(decoder.feed(stream[pos:]))
+    return events
+
+def check_framing():
+    print("framing")
+    events = synthetic_events(200)
+    stream = b"".join(encode_text_event(*event) for event in events)
+
+    # Every split position of a two-line stream
+    pair = b"pot1:2048\nbtn3\n"
+    require("line split at every byte", all(
+        feed_chunks(TextDecoder(), pair, [cut]) == [(EVENT_POT, 0, 2048), (EVENT_BUTTON, 3, 0)]
+        for cut in range(len(pair) + 1)
+    ))
+    require("one byte per chunk", feed_chunks(TextDecoder(), stream, [1] * len(stream)) == events)
+    require("whole stream in one chunk", TextDecoder().feed(stream) == events)
+    sizes = [random.randint(1, 40) for _ in range(len(stream) // 10)]
+    require("random chunk sizes", feed_chunks(TextDecoder(), stream, sizes) == events)
+    require("CRLF endings and blank lines", TextDecoder().feed(b"btn1\r\n\r\n\nmbtn_4\r\n") ==
+          [(EVENT_BUTTON, 1, 0), (EVENT_MATRIX, 4, 0)])
+    require("partial line kept until its newline", TextDecoder().feed(b"pot2:1") == [])
+
+    framer = LineFramer(max_line=16)
+    frames = framer.feed(b"x" * 40) + framer.feed(b"y" * 40 + b"\nbtn2\n")
+    require("overlong line discarded, stream recovers", frames == [b"btn2"] and framer.overflows == 1)
+
+def check_queue():
+    print("input queue")
+    q = InputQueue(maxsize=4)
+    items = []
+    for i in range(10):
+        items.append((i, (EVENT_POT, 0, i)))
+        if i % 3 == 0:
+            items.append((i, (EVENT_BUTTON, i % 7, 0)))
+    for item in items:
+        q.put_nowait(item)
+    out = []
+    while not q.empty():
+        out.append(q.get_nowait())
+    pots = [item for item in out if item[1][0] == EVENT_POT]
+    presses = [item for item in out if item[1][0] != EVENT_POT]
+    require("no button press dropped", presses == [item for item in items if item[1][0] != EVENT_POT])
+    require("newest pot values kept", [item[0] for item in pots] == [6, 7, 8, 9] and q.dropped == 6)
+    require("arrival order kept", out == [item for item in items if item in out])
+    q.put((0.0, None))
+    require("wake-up item passes through", q.get(timeout=0.1) == (0.0, None))
+    try:
+        q.get(timeout=0.01)
+        require("get times out when empty", False)
+    except queue.Empty:
+        require("get times out when empty", True)
+
+def bench(events: int):
+    stream = b"".join(encode_text_event(*event) for event in synthetic_events(events))
+    print(f"framer throughput, {events} lines")
+    for chunk in (1, 16, 64, 1024):
+        framer = LineFramer()
+        start = time.perf_counter()
+        count = 0
+        for pos in range(0, len(stream), chunk):
+            count += len(framer.feed(stream[pos:pos + chunk]))
+        elapsed = time.perf_counter() - start
+        print(f"  {chunk:5d}-byte chunks: {count / elapsed:12,.0f} lines/s")
+
+    print(f"queue throughput, {events} items")
+    items = [(0.0, event) for event in synthetic_events(events)]
+    for label, q in (("queue.Queue", queue.Queue(maxsize=events)), ("InputQueue", InputQueue(maxsize=events))):
+        start = time.perf_counter()
+        for item in items:
+            q.put_nowait(item)
+        for _ in items:
+            q.get_nowait()
+        elapsed = time.perf_counter() - start
+        print(f"  {label:>11}: {events / elapsed:12,.0f} put+get/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark serial framing and the input queue")
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    check_framing()
+    check_queue()
+    bench(args.events)
+
+if __name__ == "__main__":
+    main()
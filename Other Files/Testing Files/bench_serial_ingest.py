@@ -0,0 +1,141 @@
+# Serial ingest benchmark: old 1 ms busy-poll loop vs the SerialReader thread
+# Replays a Teensy line stream through a pseudo-terminal (Linux/macOS only) and
+# reports CPU usage plus p50/p99 latency from the line being written to the
+# OSC message leaving the controller.
+#
+# Usage: python bench_serial_ingest.py [--stream recorded.txt] [--rate 500] [--seconds 5]
+# A recorded stream is a text file of "<seconds> <line>" pairs, one per line.
+
+import argparse
+import os
+import queue
+import random
+import threading
+import time
+import serial
+from pythonosc import udp_client
+
+import bench_common  # Puts the controller folder on sys.path
+
+from serial_reader import SerialReader
+from teensy_protocol import TextDecoder
+
+def load_stream(path):
+    """Load a recorded stream as a list of (offset_seconds, line) pairs."""
+    stream = []
+    with open(path, "r") as file:
+        for raw in file:
+            raw = raw.strip()
+            if not raw:
+                continue
+            offset, line = raw.split(" ", 1)
+            stream.append((float(offset), line))
+    return stream
+
+def synthetic_stream(rate: float, seconds: float):
+    """Pot sweeps with the occasional button press, roughly like a live Teensy."""
+    stream = []
+    interval = 1.0 / rate
+    pot_values = [0, 0, 0]
+    for i in range(int(rate * seconds)):
+        if random.random() < 0.05:
+            line = random.choice([f"btn{random.randint(0, 6)}", f"mbtn_{random.randint(0, 15)}"])
+        else:
+            pot = random.randint(0, 2)
+            pot_values[pot] = (pot_values[pot] + random.randint(1, 40)) % 4096
+            line = f"pot{pot + 1}:{pot_values[pot]}"
+        stream.append((i * interval, line))
+    return stream
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def legacy_loop(ser, handle, stop):
+    """The original MainController.run loop."""
+    while not stop.is_set():
+        if ser.in_waiting:
+            line = ser.readline().decode().strip()
+            handle(line)
+        time.sleep(0.001)
+
+def reader_loop(ser, handle, stop):
+    """The SerialReader + bounded queue loop now used by MainController.run."""
+    event_queue = queue.Queue(maxsize=256)
+    reader = SerialReader(ser, event_queue, TextDecoder())
+    reader.start()
+    while not stop.is_set():
+        try:
+            _, event = event_queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        handle(event)
+    reader.stop()
+
+def run_path(name, loop, stream, idle_seconds):
+    master, slave = os.openpty()
+    ser = serial.Serial(os.ttyname(slave), 115200, timeout=1)
+    client = udp_client.SimpleUDPClient("127.0.0.1", 57199)  # Nothing needs to listen here
+
+    sent_at = []
+    def handle(item):
+        client.send_message("/bench", str(item))
+        sent_at.append(time.perf_counter())
+
+    stop = threading.Event()
+    worker = threading.Thread(target=loop, args=(ser, handle, stop), daemon=True)
+    worker.start()
+
+    # Idle phase: no input at all, only the loop's own overhead
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    time.sleep(idle_seconds)
+    idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    # Replay phase
+    written_at = []
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for offset, line in stream:
+        delay = wall_start + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        written_at.append(time.perf_counter())
+        os.write(master, (line + "\n").encode())
+
+    deadline = time.perf_counter() + 2
+    while len(sent_at) < len(stream) and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    load_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+    stop.set()
+    worker.join(timeout=2)
+    ser.close()
+    os.close(master)
+    os.close(slave)
+
+    latencies = [(s - w) * 1000 for w, s in zip(written_at, sent_at)]
+    print(f"{name:>12}: idle CPU {idle_cpu * 100:5.1f}%  load CPU {load_cpu * 100:5.1f}%  "
+          f"p50 {percentile(latencies, 50):6.3f} ms  p99 {percentile(latencies, 99):6.3f} ms  "
+          f"({len(sent_at)}/{len(stream)} delivered)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial ingest paths")
+    parser.add_argument("--stream", help="Recorded stream file of '<seconds> <line>' pairs")
+    parser.add_argument("--rate", type=float, default=500, help="Lines per second for the synthetic stream")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of the synthetic stream")
+    parser.add_argument("--idle", type=float, default=2, help="Seconds to measure idle CPU")
+    args = parser.parse_args()
+
+    if not hasattr(os, "openpty"):
+        print("This benchmark needs pseudo-terminal support (Linux or macOS)")
+        return
+
+    stream = load_stream(args.stream) if args.stream else synthetic_stream(args.rate, args.seconds)
+    print(f"Replaying {len(stream)} lines over {stream[-1][0]:.1f} s")
+    run_path("busy-poll", legacy_loop, stream, args.idle)
+    run_path("reader", reader_loop, stream, args.idle)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+# Serial reconnect benchmark over pseudo-terminals (Linux/macOS only)
+# Plays a Teensy on a pty behind a stable symlink (like /dev/serial/by-id)
+# and "unplugs" it by closing the pty, then "replugs" it as a new pty behind
+# the same link after a given outage. The controller's real input path
+# (InputDevice reader thread -> InputQueue -> ControllerCore -> OSC on a
+# local UDP port) has to notice the loss and reopen the port with backoff
+# while the main loop keeps running. Reports, per outage length, how long
+# after the replug input flows again and the total time without input.
+# Also checks VID:PID port matching, and that a device missing at startup
+# is picked up once it appears.
+#
+# Usage: python bench_serial_reconnect.py [--outages 0.2 1 3] [--delay 0.1] [--max-delay 2]
+
+import argparse
+import logging
+import os
+import queue
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import yaml
+from serial.tools.list_ports_common import ListPortInfo
+
+from bench_common import REPO_ROOT, check
+
+from controller_core import ControllerCore
+from input_devices import find_ports, match_usb_port
+from serial_reader import InputQueue
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+class FakeTeensy:
+    """A pty behind a fixed symlink that can be unplugged and plugged back in."""
+
+    def __init__(self, link: str):
+        self.link = link
+        self.master = None
+        self.slave = None
+
+    def plug(self):
+        self.master, self.slave = os.openpty()
+        os.symlink(os.ttyname(self.slave), self.link)
+
+    def unplug(self):
+        os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+        self.master = None
+
+    def press(self) -> bool:
+        if self.master is None:
+            return False
+        try:
+            os.write(self.master, b"btn0\n")
+            return True
+        except OSError:
+            return False
+
+class Receiver:
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.arrivals = []
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            self.arrivals.append(time.perf_counter())
+
+    def wait_for(self, count: int, timeout: float) -> bool:
+        deadline = time.perf_counter() + timeout
+        while len(self.arrivals) < count and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        return len(self.arrivals) >= count
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+class Controller:
+    """ControllerCore with one reconnecting device, its reader thread and a main loop thread."""
+
+    def __init__(self, link: str, args):
+        self.receiver = Receiver()
+        with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+            config = yaml.safe_load(file)
+        config['system']['ports']['teensy'] = link
+        config['system']['ports']['supercollider'] = self.receiver.port
+        config['system']['ports']['processing'] = self.receiver.port
+        config['system']['osc_batching'] = {'enabled': False}
+        config['system']['defaults'].update(
+            initial_mode="bench", reconnect=True, reconnect_delay=args.delay, reconnect_max_delay=args.max_delay
+        )
+        config['modes'] = {'bench': {'controls': {'buttons': {
+            'btn1': {'actions': [{'target': 'supercollider', 'command': '/bench/btn1', 'params': []}]},
+        }}}}
+        self.core = BenchCore(config)
+        self.queue = InputQueue()
+        self.devices = find_ports(self.core.devices)
+        for device in self.devices:
+            device.open(self.queue)
+        self.device = self.core.devices[0]
+        self.running = True
+        self.loop = threading.Thread(target=self._run, daemon=True)
+        self.loop.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                _, event = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            self.core.dispatch_event(*event)
+
+    def close(self):
+        self.running = False
+        self.loop.join()
+        for device in self.devices:
+            device.close()
+        self.receiver.close()
+
+def check_usb_matching():
+    print("usb id matching")
+    ports = []
+    for device, vid, pid, serial_number in (("/dev/ttyS0", None, None, None),
+                                            ("/dev/ttyACM0", 0x2341, 0x0043, "A1"),
+                                            ("/dev/ttyACM1", 0x16C0, 0x0483, "1234560"),
+                                            ("/dev/ttyACM2", 0x16C0, 0x0483, "7654320")):
+        port = ListPortInfo(device, skip_link_detection=True)
+        port.vid, port.pid, port.serial_number = vid, pid, serial_number
+        ports.append(port)
+    return all([
+        check("VID:PID finds the first Teensy", match_usb_port("16C0:0483", ports) == "/dev/ttyACM1"),
+        check("serial number picks one of two Teensies", match_usb_port("16c0:0483:7654320", ports) == "/dev/ttyACM2"),
+        check("no match", match_usb_port("16C0:0486", ports) is None),
+    ])
+
+def check_hot_plug(workdir: str, args):
+    print("hot plug")
+    link = os.path.join(workdir, "late-teensy")
+    teensy = FakeTeensy(link)
+    controller = Controller(link, args)
+    time.sleep(0.5)
+    teensy.plug()
+    plugged = time.perf_counter()
+    delivered = False
+    while time.perf_counter() - plugged < 5 and not delivered:
+        teensy.press()
+        delivered = controller.receiver.wait_for(1, 0.02)
+    elapsed = time.perf_counter() - plugged
+    controller.close()
+    teensy.unplug()
+    return check(f"device missing at startup picked up {elapsed * 1000:.0f} ms after it appeared", delivered)
+
+def run_outages(workdir: str, args):
+    print(f"outages, backoff {args.delay:g} s doubling to {args.max_delay:g} s")
+    link = os.path.join(workdir, "teensy")
+    teensy = FakeTeensy(link)
+    teensy.plug()
+    controller = Controller(link, args)
+    ok = True
+    delivered = 0
+    for outage in args.outages:
+        # Input flows before the outage
+        teensy.press()
+        delivered += 1
+        ok &= controller.receiver.wait_for(delivered, 2)
+
+        teensy.unplug()
+        time.sleep(outage)
+        teensy.plug()
+        plugged = time.perf_counter()
+        reconnects = controller.device.reconnects
+
+        # Press until input comes through again
+        while time.perf_counter() - plugged < args.max_delay + 5:
+            if controller.device.reconnects > reconnects and teensy.press():
+                delivered += 1
+                if controller.receiver.wait_for(delivered, 0.5):
+                    break
+                delivered = len(controller.receiver.arrivals)
+            time.sleep(0.001)
+        back = time.perf_counter() - plugged
+        ok &= controller.device.reconnects == reconnects + 1 and controller.loop.is_alive()
+        print(f"  {outage:5.2f} s outage: input back {back * 1000:7.1f} ms after replug, "
+              f"{controller.device.downtime:6.2f} s without input so far")
+    ok &= check("main loop kept running, one reconnect per outage",
+                controller.loop.is_alive() and controller.device.reconnects == len(args.outages))
+    controller.close()
+    teensy.unplug()
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark serial reconnects on pseudo-terminals")
+    parser.add_argument("--outages", type=float, nargs="+", default=[0.2, 1.0, 3.0], help="Outage lengths in seconds")
+    parser.add_argument("--delay", type=float, default=0.1, help="First reconnect delay (reconnect_delay)")
+    parser.add_argument("--max-delay", type=float, default=2.0, help="Longest reconnect delay (reconnect_max_delay)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    if not hasattr(os, "openpty"):
+        print("This benchmark needs pseudo-terminal support (Linux or macOS)")
+        return
+
+    workdir = tempfile.mkdtemp(prefix="pace-reconnect-")
+    try:
+        ok = all([check_usb_matching(), check_hot_plug(workdir, args), run_outages(workdir, args)])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Sketch build cache benchmark: processing-java --run vs a prebuilt export
+# Puts fake `processing-java` and `java` executables first on PATH (Linux/macOS
+# only). The fake processing-java takes --compile seconds for --run and
+# --export, --export writes lib/<sketch>.jar like a real application export;
+# the fake java only takes --jvm seconds. Each sketch is launched through the
+# real ProcessingManager, first uncached, then from the cache. Finally one
+# .pde file is touched to check that the cached build goes stale.
+#
+# Usage: python bench_sketch_cache.py [--compile 4] [--jvm 0.6] [--runs 3]
+
+import argparse
+import logging
+import os
+import stat
+import sys
+import tempfile
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from asset_registry import AssetRegistry
+from processing_manager import ProcessingManager
+from readiness import ReadinessTracker, READY_LINE
+
+FAKE_PROCESSING = f'''#!{sys.executable}
+import os, sys, time
+args = dict(a.split("=", 1) if "=" in a else (a, "") for a in sys.argv[1:])
+sketch = os.path.basename(args["--sketch"].rstrip("/"))
+time.sleep({{compile}})
+if "--export" in args:
+    lib = os.path.join(args["--output"], "lib")
+    os.makedirs(os.path.join(args["--output"], "data"), exist_ok=True)
+    os.makedirs(lib, exist_ok=True)
+    open(os.path.join(lib, sketch + ".jar"), "w").close()
+    print("Finished.", flush=True)
+    sys.exit(0)
+print("{READY_LINE}", flush=True)
+time.sleep(60)
+'''
+
+FAKE_JAVA = f'''#!{sys.executable}
+import time
+time.sleep({{jvm}})
+print("{READY_LINE}", flush=True)
+time.sleep(60)
+'''
+
+def install(bin_dir: str, name: str, source: str):
+    path = os.path.join(bin_dir, name)
+    with open(path, "w") as file:
+        file.write(source)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+def timed_start(manager, sketch_name: str) -> float:
+    start = time.perf_counter()
+    ok = manager.start_sketch(sketch_name)
+    elapsed = time.perf_counter() - start
+    manager.stop_sketch()
+    if not ok:
+        raise SystemExit(f"{sketch_name} failed to start")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Processing sketch build cache")
+    parser.add_argument("--compile", type=float, default=4.0, help="Fake processing-java compile time (s)")
+    parser.add_argument("--jvm", type=float, default=0.6, help="Fake JVM startup time (s)")
+    parser.add_argument("--runs", type=int, default=3, help="Launches per sketch and variant")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    modes = list(config['modes'].keys())
+
+    work_dir = tempfile.mkdtemp(prefix="pace-sketch-cache-")
+    bin_dir = os.path.join(work_dir, "bin")
+    os.mkdir(bin_dir)
+    install(bin_dir, "processing-java", FAKE_PROCESSING.format(compile=args.compile))
+    install(bin_dir, "java", FAKE_JAVA.format(jvm=args.jvm))
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ["PATH"]
+
+    # Copies of the sketches, the last check edits one
+    folders = {name.lower(): name for name in os.listdir(os.path.join(REPO_ROOT, "Modes"))}
+    sketches = []
+    for mode_name in modes:
+        sketch_name = (config['modes'][mode_name].get('processing') or {}).get('sketch')
+        if not sketch_name:
+            continue
+        source = os.path.join(REPO_ROOT, "Modes", folders[mode_name.lower()], sketch_name)
+        target = os.path.join(work_dir, "modes", mode_name, sketch_name)
+        os.makedirs(target)
+        for name in os.listdir(source):
+            if name.endswith(".pde"):
+                with open(os.path.join(source, name), "rb") as src, open(os.path.join(target, name), "wb") as dst:
+                    dst.write(src.read())
+        sketches.append(sketch_name)
+    assets = AssetRegistry(config, os.path.join(work_dir, "modes"))
+
+    config['system']['defaults']['engine_timeout'] = args.compile + 5
+    config['system']['sketch_cache'] = {'enabled': False}
+    uncached = ProcessingManager(config, ReadinessTracker(), assets)
+    config['system']['sketch_cache'] = {'enabled': True, 'dir': os.path.join(work_dir, "cache")}
+    cached = ProcessingManager(config, ReadinessTracker(), assets)
+
+    totals = {'compiled': [], 'cached': []}
+    for sketch_name in sketches:
+        for _ in range(args.runs):
+            totals['compiled'].append(timed_start(uncached, sketch_name))
+        start = time.perf_counter()
+        cached.cache.build(sketch_name, cached.find_sketch_path(sketch_name))
+        print(f"{sketch_name:<14} prebuilt in {time.perf_counter() - start:5.2f} s")
+        for _ in range(args.runs):
+            totals['cached'].append(timed_start(cached, sketch_name))
+        print(f"{sketch_name:<14} compiled {sum(totals['compiled'][-args.runs:]) / args.runs:5.2f} s   "
+              f"cached {sum(totals['cached'][-args.runs:]) / args.runs:5.2f} s")
+
+    # Editing a source file invalidates the build and falls back to compiling
+    sketch_name = sketches[0]
+    sketch_path = cached.find_sketch_path(sketch_name)
+    with open(os.path.join(sketch_path, sketch_name + ".pde"), "a") as file:
+        file.write("\n// edited\n")
+    stale = cached.cache.lookup(sketch_name, sketch_path) is None
+    print(f"edit of {sketch_name}.pde invalidates the cached build: {'yes' if stale else 'NO'}")
+
+    compiled = sum(totals['compiled']) / len(totals['compiled'])
+    hit = sum(totals['cached']) / len(totals['cached'])
+    print(f"mean start: compiled {compiled:.2f} s, cached {hit:.2f} s ({compiled / hit:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Engine startup benchmark: readiness handshake vs fixed sleeps
+# Launches stub engine processes through the real ProcessingManager and
+# SuperColliderManager launch paths. The stubs take a random startup time and
+# then signal readiness the same way the real engines do: the SuperCollider
+# stub sends /ready to the controller port, the Processing stub prints
+# PACE_READY. A third run uses a stub that never becomes ready to show the
+# timeout and retry path.
+#
+# Usage: python bench_startup.py [--runs 5] [--port 57399]
+
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from osc_listener import ControllerListener
+from readiness import ReadinessTracker, READY_LINE
+from processing_manager import ProcessingManager
+from supercollider_manager import SuperColliderManager
+
+def sc_stub(port: int, delay: float):
+    code = ("import time; from pythonosc import udp_client; "
+            f"time.sleep({delay}); "
+            f"udp_client.SimpleUDPClient('127.0.0.1', {port}).send_message('/ready', 'supercollider'); "
+            "time.sleep(30)")
+    return [sys.executable, "-c", code]
+
+def processing_stub(delay: float):
+    code = f"import time; time.sleep({delay}); print('{READY_LINE}', flush=True); time.sleep(30)"
+    return [sys.executable, "-c", code]
+
+def timed(func):
+    start = time.perf_counter()
+    ok = func()
+    return time.perf_counter() - start, ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark engine startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=57399, help="Controller port for the stubs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['defaults']['engine_timeout'] = 2
+    config['system']['defaults']['engine_retries'] = 1
+
+    readiness = ReadinessTracker()
+    listener = ControllerListener(args.port)
+    readiness.attach(listener.dispatcher)
+    listener.start()
+
+    for label, tracker in (("fixed sleeps", None), ("handshake", readiness)):
+        processing = ProcessingManager(config, tracker)
+        supercollider = SuperColliderManager(config, tracker)
+        p_times, s_times = [], []
+        for _ in range(args.runs):
+            delay = random.uniform(0.1, 0.6)
+            elapsed, ok = timed(lambda: processing.launch(processing_stub(delay)))
+            p_times.append(elapsed - delay)
+            processing.stop_sketch()
+            elapsed, ok = timed(lambda: supercollider.launch(sc_stub(args.port, delay), REPO_ROOT))
+            s_times.append(elapsed - delay)
+            supercollider.sclang_process.kill()
+        print(f"{label:>13}: time past actual readiness  processing {sum(p_times) / len(p_times):5.2f} s  "
+              f"supercollider {sum(s_times) / len(s_times):5.2f} s")
+
+    # A stub that never reports ready: expect a timeout, then one retry
+    processing = ProcessingManager(config, readiness)
+    never_ready = [sys.executable, "-c", "import time; time.sleep(30)"]
+    start = time.perf_counter()
+    ok = any(processing.launch(never_ready) for _ in range(1 + processing.startup_retries))
+    print(f"  never ready: gave up after {time.perf_counter() - start:.2f} s "
+          f"({1 + processing.startup_retries} attempts x {processing.startup_timeout} s timeout), ok={ok}")
+    processing.stop_sketch()
+    listener.stop()
+
+if __name__ == "__main__":
+    main()
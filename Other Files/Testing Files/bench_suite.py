@@ -0,0 +1,235 @@
+# Input pipeline benchmark suite
+# Runs synthetic streams from input_replay.py (pot sweeps, button storms and
+# a mix of both) and any recordings given on the command line through the
+# controller's routing pipeline, without hardware:
+#   throughput  stream played as fast as possible into parse_teensy_data
+#   latency     stream played at --speed into a pty, through the real reader
+#               thread, InputQueue and dispatch, to OSC arriving on a local
+#               UDP port (Linux/macOS only)
+# Results are saved as JSON; --compare prints the change against an
+# earlier results file.
+#
+# Usage: python bench_suite.py [recording.pacerec ...] [--seconds 5] [--speed 1]
+#                              [--output results.json] [--compare baseline.json]
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import queue
+import socket
+import subprocess
+import threading
+import time
+import yaml
+
+from bench_common import REPO_ROOT
+
+from control_routing import INPUT_NAMES
+from controller_core import ControllerCore
+from input_devices import InputDevice
+from input_replay import (load_recording, pot_sweep, button_storm, merge, play, controller_sink,
+                          fd_sink, count_events)
+from serial_reader import InputQueue
+
+class BenchCore(ControllerCore):
+    def start_mode_switch(self, mode_name: str):
+        raise RuntimeError("No mode switches in this benchmark")
+
+class Receiver:
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.arrivals = []
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            try:
+                self.sock.recv(4096)
+            except socket.timeout:
+                continue
+            self.arrivals.append(time.perf_counter())
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.sock.close()
+
+def bench_config(udp_port: int) -> dict:
+    """The controller config with one mode that routes every input (but the mode switch) once."""
+    with open(os.path.join(REPO_ROOT, "config.yml"), "r") as file:
+        config = yaml.safe_load(file)
+    config['system']['ports']['supercollider'] = udp_port
+    config['system']['ports']['processing'] = udp_port
+    config['system']['osc_batching'] = {'enabled': False}
+    config['system']['devices'] = []
+    config['system']['defaults']['initial_mode'] = "bench"
+    route = lambda name: {'target': 'supercollider', 'command': f"/bench/{name}", 'params': []}
+    buttons = {name: {'actions': [route(name)]} for name in INPUT_NAMES if "btn" in name and name != "btn3"}
+    pots = {name: route(name) for name in INPUT_NAMES if name.startswith("pot")}
+    config['modes'] = {'bench': {'controls': {'buttons': buttons, 'pots': pots}}}
+    return config
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run_throughput(stream, protocol, repeat):
+    """Best of ``repeat`` runs of the stream at full speed through parse_teensy_data."""
+    events = sum(count_events(stream, protocol))
+    best = None
+    # Bound but never read, so no receiver thread competes with the dispatch loop
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    for _ in range(repeat):
+        core = BenchCore(bench_config(sink.getsockname()[1]))
+        elapsed = play(stream, controller_sink(core, protocol), speed=0)
+        best = elapsed if best is None else min(best, elapsed)
+    sink.close()
+    return {'events': events, 'seconds': round(best, 4), 'events_per_s': round(events / best)}
+
+def run_latency(stream, protocol, speed):
+    """Play the stream into a pty read by the controller's reader thread and time each chunk to OSC."""
+    per_chunk = count_events(stream, protocol)
+    expected = sum(per_chunk)
+    receiver = Receiver()
+    config = bench_config(receiver.port)
+    config['system']['defaults']['protocol'] = protocol
+    core = BenchCore(config)
+    event_queue = InputQueue(maxsize=config['system']['defaults'].get('input_queue_size', 256))
+
+    master, slave = os.openpty()
+    device = InputDevice('bench', 0, os.ttyname(slave), 115200, protocol, reconnect=False)
+    device.open(event_queue)
+
+    running = True
+    def main_loop():
+        while running:
+            try:
+                _, event = event_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            core.dispatch_event(*event)
+    loop = threading.Thread(target=main_loop, daemon=True)
+    loop.start()
+
+    written = [0.0] * len(stream)
+    def on_write(i, timestamp):
+        written[i] = timestamp
+    cpu_start = time.process_time()
+    elapsed = play(stream, fd_sink(master), speed, on_write=on_write)
+    deadline = time.perf_counter() + 2
+    while len(receiver.arrivals) < expected and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    cpu = time.process_time() - cpu_start
+
+    running = False
+    loop.join()
+    device.close()
+    os.close(master)
+    os.close(slave)
+    receiver.close()
+
+    # One OSC message per event: a chunk is through when its last event's message arrives
+    latencies = []
+    arrived = 0
+    for sent, count in zip(written, per_chunk):
+        arrived += count
+        if count and arrived <= len(receiver.arrivals):
+            latencies.append((receiver.arrivals[arrived - 1] - sent) * 1000)
+    latencies.sort()
+    return {
+        'events': expected,
+        'delivered': len(receiver.arrivals),
+        'dropped_pots': event_queue.dropped,
+        'p50_ms': round(percentile(latencies, 50), 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99), 3) if latencies else None,
+        'max_ms': round(latencies[-1], 3) if latencies else None,
+        'cpu_percent': round(cpu / elapsed * 100, 1),
+    }
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r") as file:
+        baseline = json.load(file)
+    print(f"compared with {baseline_path} ({baseline['meta'].get('commit')})")
+    for stream, metrics in results['streams'].items():
+        old_metrics = baseline['streams'].get(stream)
+        if not old_metrics:
+            continue
+        for group, values in metrics.items():
+            for key, value in values.items():
+                old = (old_metrics.get(group) or {}).get(key)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old or old == value:
+                    continue
+                print(f"  {stream:>14} {group:>10} {key:>12}: {old:>12} -> {value:>12} ({(value - old) / old * 100:+6.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput and latency benchmark suite for the input pipeline")
+    parser.add_argument("recordings", nargs="*", help="Recordings (.pacerec or '<seconds> <line>' text) to include")
+    parser.add_argument("--seconds", type=float, default=5, help="Length of the synthetic streams")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed for the latency runs")
+    parser.add_argument("--repeat", type=int, default=5, help="Throughput runs per stream, the best counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_suite_results.json")
+    parser.add_argument("--compare", help="Earlier results file to compare against")
+    parser.add_argument("--no-latency", action="store_true", help="Skip the real-time pty runs")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    streams = {
+        'pot-sweep': ("text", pot_sweep(1000, args.seconds)),
+        'button-storm': ("text", button_storm(400, args.seconds, burst=8, seed=args.seed)),
+        'mixed': ("text", merge(pot_sweep(300, args.seconds), button_storm(20, args.seconds, burst=2, seed=args.seed))),
+        'mixed-binary': ("binary", merge(pot_sweep(300, args.seconds, protocol="binary"),
+                                         button_storm(20, args.seconds, burst=2, seed=args.seed, protocol="binary"))),
+    }
+    for path in args.recordings:
+        streams[os.path.basename(path)] = load_recording(path)
+    latency = not args.no_latency and hasattr(os, "openpty")
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.datetime.now().isoformat(timespec="seconds"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seconds': args.seconds,
+            'speed': args.speed,
+        },
+        'streams': {},
+    }
+    for name, (protocol, stream) in streams.items():
+        entry = {'throughput': run_throughput(stream, protocol, args.repeat)}
+        line = f"{name:>14}: {entry['throughput']['events_per_s']:>10,} events/s"
+        if latency:
+            entry['latency'] = run_latency(stream, protocol, args.speed)
+            lat = entry['latency']
+            line += (f"  {lat['delivered']}/{lat['events']} delivered, p50 {lat['p50_ms']} ms, "
+                     f"p99 {lat['p99_ms']} ms, max {lat['max_ms']} ms, CPU {lat['cpu_percent']}%")
+        print(line)
+        results['streams'][name] = entry
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+    print(f"Saved {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
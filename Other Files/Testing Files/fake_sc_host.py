@@ -0,0 +1,73 @@
+# Stand-in for sclang that speaks the same OSC protocol as the real engines
+# Run it in place of sclang: `fake_sc_host.py <script> [args...]`.
+# With Modes/pace-host.scd as the script it acts as the resident host
+# (/pace/load, /pace/unload, /pace/quit, see pace-host.scd); with any other
+# script it acts like a mode script started on its own and just reports ready.
+# Boot and load times are simulated, set them with FAKE_SC_BOOT and
+# FAKE_SC_LOAD (seconds). Everything the fake does is printed to stdout.
+
+import os
+import sys
+import time
+from pythonosc import dispatcher, osc_server, udp_client
+
+BOOT_TIME = float(os.environ.get("FAKE_SC_BOOT", "1.5"))  # scsynth boot + SynthDef compile
+LOAD_TIME = float(os.environ.get("FAKE_SC_LOAD", "0.05"))  # Running a mode script on a booted server
+PORT = int(os.environ.get("FAKE_SC_PORT", "57120"))
+CONTROLLER_PORT = int(os.environ.get("PACE_CONTROLLER_PORT", "57300"))  # Set by the managers, like for sclang
+
+controller = udp_client.SimpleUDPClient("127.0.0.1", CONTROLLER_PORT)
+
+def say(text):
+    print(f"[fake sclang] {text}", flush=True)
+
+def run_host():
+    state = {'mode': None}
+
+    def unload():
+        if state['mode'] is not None:
+            say(f"unload {state['mode']}")
+            state['mode'] = None
+
+    def on_load(address, mode, path):
+        unload()
+        state['mode'] = mode
+        say(f"load {mode} from {path}")
+        time.sleep(LOAD_TIME)
+        controller.send_message("/ready", "supercollider")
+
+    def on_unload(address, *args):
+        unload()
+
+    def on_quit(address, *args):
+        unload()
+        say("quit")
+        os._exit(0)
+
+    mapping = dispatcher.Dispatcher()
+    mapping.map("/pace/load", on_load)
+    mapping.map("/pace/unload", on_unload)
+    mapping.map("/pace/quit", on_quit)
+    server = osc_server.BlockingOSCUDPServer(("127.0.0.1", PORT), mapping)
+    time.sleep(BOOT_TIME)
+    say("host ready")
+    controller.send_message("/ready", "supercollider-host")
+    server.serve_forever()
+
+def run_script(script, args):
+    # Pool slots pass <langPort> <serverPort> <processingPort> <name> (see pace-slot.scd)
+    name = args[3] if len(args) >= 4 else "supercollider"
+    time.sleep(BOOT_TIME + LOAD_TIME)
+    say(f"ran {os.path.basename(script)} as {name}")
+    controller.send_message("/ready", name)
+    while True:
+        time.sleep(1)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: fake_sc_host.py <script> [args...]")
+        sys.exit(1)
+    if os.path.basename(sys.argv[1]) == "pace-host.scd":
+        run_host()
+    else:
+        run_script(sys.argv[1], sys.argv[2:])
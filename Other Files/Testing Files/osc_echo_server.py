@@ -0,0 +1,71 @@
+# Stand-in for both engines that answers the controller's latency probe
+# Listens where Processing (12000) and SuperCollider (57120) would, answers
+# every /pace/ping with /pace/pong and the same arguments on the controller
+# port like PaceSlot.pde and pace-slot.scd do, and counts everything else
+# (pot and button traffic, bundles unpacked) as the engines would receive it.
+# --delay-ms and --loss simulate a slow or lossy engine. Prints the counts
+# per port on Ctrl+C (or SIGTERM).
+#
+# Usage: python osc_echo_server.py [--ports 12000 57120] [--controller 57300] [--delay-ms 0] [--loss 0]
+
+import argparse
+import random
+import signal
+import sys
+import threading
+import time
+from pythonosc import dispatcher, osc_server, udp_client
+
+def serve(port: int, controller: udp_client.SimpleUDPClient, args, counts: dict):
+    rng = random.Random(port)
+    lock = threading.Lock()
+
+    def on_ping(address, *ping_args):
+        counts['pings'] += 1
+        if args.loss and rng.random() < args.loss:
+            return
+        if args.delay_ms:
+            time.sleep(args.delay_ms / 1000)
+        with lock:
+            controller.send_message("/pace/pong", list(ping_args))
+        counts['pongs'] += 1
+
+    def on_other(address, *other_args):
+        counts['messages'] += 1
+
+    mapping = dispatcher.Dispatcher()
+    mapping.map("/pace/ping", on_ping)
+    mapping.set_default_handler(on_other)
+    server = osc_server.BlockingOSCUDPServer(("127.0.0.1", port), mapping)
+    threading.Thread(target=server.serve_forever, name=f"echo-{port}", daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer /pace/ping like the engines do and count their traffic")
+    parser.add_argument("--ports", type=int, nargs="+", default=[12000, 57120], help="Engine ports to listen on")
+    parser.add_argument("--controller", type=int, default=57300, help="Controller port the pongs go to")
+    parser.add_argument("--delay-ms", type=float, default=0, help="Extra delay before each pong")
+    parser.add_argument("--loss", type=float, default=0, help="Fraction of pings left unanswered")
+    args = parser.parse_args()
+
+    controller = udp_client.SimpleUDPClient("127.0.0.1", args.controller)
+    counts = {port: {'pings': 0, 'pongs': 0, 'messages': 0} for port in args.ports}
+    servers = [serve(port, controller, args, counts[port]) for port in args.ports]
+    print(f"Echoing /pace/ping on {', '.join(map(str, args.ports))} to {args.controller}", flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        while not stop.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        pass
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+    for port, count in counts.items():
+        print(f"{port}: {count['pings']} pings, {count['pongs']} pongs, {count['messages']} other messages")
+    sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
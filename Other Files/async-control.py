@@ -6,8 +6,11 @@ import serial.tools.list_ports   # ' '  '
 import subprocess
 import os
 import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from teensy_protocol import LineFramer
 import random
 import time
+from collections import deque
 from typing import Optional
 
 class ProcessingManager:
@@ -222,10 +225,49 @@ class SuperColliderManager:
                 self.sclang_process.kill()
                 print("SuperCollider process force killed")
 
+# Lines the hub acts on; anything else (the "." separators, readings) may be dropped
+PRESSES = {"dbtn", "pbtn1", "pbtn3", "pbtn4"}
+
+class MessageQueue:
+    """Arduino lines for process_messages, with the same policy as InputQueue (serial_reader.py)
+
+    Presses are never dropped. Other lines wait in a lane of at most
+    ``maxsize``, which drops its oldest line for a new one. ``get`` returns
+    lines from both in arrival order.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self._presses = deque()
+        self._others = deque()
+        self.maxsize = max(1, maxsize)
+        self._next = 0  # Arrival number, orders the lanes
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def put_nowait(self, message: str):
+        entry = (self._next, message)
+        self._next += 1
+        if message in PRESSES:
+            self._presses.append(entry)
+        else:
+            if len(self._others) >= self.maxsize:
+                self._others.popleft()
+                self.dropped += 1
+            self._others.append(entry)
+        self._ready.set()
+
+    async def get(self) -> str:
+        while not (self._presses or self._others):
+            self._ready.clear()
+            await self._ready.wait()
+        if not self._others or (self._presses and self._presses[0][0] < self._others[0][0]):
+            return self._presses.popleft()[1]
+        return self._others.popleft()[1]
+
 class ArduinoManager:
     def __init__(self):
         self.arduino = None
-        self.message_queue = asyncio.Queue()
+        self.message_queue = MessageQueue()
 
     def find_arduino_port(self) -> Optional[str]:
         ports = serial.tools.list_ports.comports()
@@ -266,9 +308,11 @@ class ArduinoManager:
             return False
 
 class ArduinoProtocol(asyncio.Protocol):
-    def __init__(self, message_queue: asyncio.Queue):
+    def __init__(self, message_queue: MessageQueue):
         self.message_queue = message_queue
         self.transport = None
+        # A chunk can hold several lines or part of one
+        self.framer = LineFramer()
 
     def connection_made(self, transport):
         self.transport = transport
@@ -276,9 +320,9 @@ class ArduinoProtocol(asyncio.Protocol):
     def data_received(self, data):
         """Handle incoming Arduino data"""
         try:
-            message = data.decode().strip()
-            if message:
-                asyncio.create_task(self.message_queue.put(message))
+            for frame in self.framer.feed(data):
+                # Never blocks; only non-press lines can be dropped
+                self.message_queue.put_nowait(frame.decode(errors="replace"))
         except Exception as e:
             print(f"Error receiving data: {e}")
 
@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_EXTENSIONS = ('.wav', '.aif', '.aiff', '.flac', '.ogg')
+
+class ModeAssets:
+    """Resolved files of one mode. Paths are absolute, None when missing."""
+
+    def __init__(self, mode_name: str, folder: Optional[str] = None):
+        self.mode_name = mode_name
+        self.folder = folder
+        self.sketch_dir: Optional[str] = None
+        self.script: Optional[str] = None
+        self.data_files: List[str] = []  # The sketch's data/ folder and samples next to the script
+
+    def __repr__(self):
+        return f"ModeAssets({self.mode_name}, sketch={self.sketch_dir}, script={self.script})"
+
+def _match(folder: str, name: str, want_dir: bool) -> Optional[str]:
+    """Entry of a folder whose name matches case-insensitively (exact case wins)."""
+    found = None
+    try:
+        entries = os.listdir(folder)
+    except OSError:
+        return None
+    for entry in entries:
+        path = os.path.join(folder, entry)
+        if entry.lower() != name.lower() or os.path.isdir(path) != want_dir:
+            continue
+        if entry == name:
+            return path
+        found = found or path
+    return found
+
+class AssetRegistry:
+    """Index of every mode's sketch folder, .scd entry point and data files.
+
+    The mode tree (Modes/ next to this file by default) is scanned once and
+    folder names are matched case-insensitively, so the mode "main-menu"
+    finds Modes/MAIN-MENU on any platform. Both engine managers look their
+    files up here. With ``watch`` on, a polling thread rescans only the mode
+    folders whose contents changed.
+    """
+
+    def __init__(self, config: dict, root: Optional[str] = None):
+        self.config = config
+        settings = config['system'].get('assets') or {}
+        root = root or settings.get('dir', "Modes")
+        self.root = root if os.path.isabs(root) else os.path.join(REPO_DIR, root)
+        self.modes: Dict[str, ModeAssets] = {}
+        self.sketches: Dict[str, str] = {}  # Sketch name -> folder, for every sketch in the tree
+        self._stamps: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+
+        self.scan()
+        if settings.get('watch'):
+            self.watch(settings.get('poll_seconds', 1.0))
+
+    def scan(self):
+        """Rebuild the whole index."""
+        if not os.path.isdir(self.root):
+            log.error(f"Mode folder {self.root} not found")
+        modes = {mode_name: self._scan_mode(mode_name) for mode_name in self.config['modes']}
+        with self._lock:
+            self.modes = modes
+            self._stamps = {mode_name: self._stamp(assets) for mode_name, assets in modes.items()}
+            self._stamps[''] = self._stamp_dirs([self.root])
+            self.sketches = self._scan_sketches()
+        for assets in modes.values():
+            if assets.folder is None:
+                log.warning(f"No folder for mode {assets.mode_name} in {self.root}")
+        log.debug(f"Indexed {len(modes)} modes and {len(self.sketches)} sketches in {self.root}")
+
+    def _scan_mode(self, mode_name: str) -> ModeAssets:
+        mode_config = self.config['modes'][mode_name]
+        assets = ModeAssets(mode_name, _match(self.root, mode_name, True))
+        if assets.folder is None:
+            return assets
+
+        sketch_name = (mode_config.get('processing') or {}).get('sketch')
+        if sketch_name:
+            sketch_dir = _match(assets.folder, sketch_name, True)
+            if sketch_dir and any(name.endswith('.pde') for name in os.listdir(sketch_dir)):
+                assets.sketch_dir = sketch_dir
+                data_dir = _match(sketch_dir, "data", True)
+                if data_dir:
+                    for root, dirs, names in os.walk(data_dir):
+                        dirs.sort()
+                        assets.data_files.extend(os.path.join(root, name) for name in sorted(names))
+
+        script_name = (mode_config.get('supercollider') or {}).get('script')
+        if script_name:
+            if not script_name.endswith('.scd'):
+                script_name += '.scd'
+            assets.script = _match(assets.folder, script_name, False)
+
+        assets.data_files.extend(
+            os.path.join(assets.folder, name) for name in sorted(os.listdir(assets.folder))
+            if name.lower().endswith(SAMPLE_EXTENSIONS)
+        )
+        return assets
+
+    def _scan_sketches(self) -> Dict[str, str]:
+        sketches = {}
+        if not os.path.isdir(self.root):
+            return sketches
+        for mode_folder in sorted(os.listdir(self.root)):
+            mode_path = os.path.join(self.root, mode_folder)
+            if not os.path.isdir(mode_path):
+                continue
+            for item in sorted(os.listdir(mode_path)):
+                item_path = os.path.join(mode_path, item)
+                if os.path.isdir(item_path) and any(name.endswith('.pde') for name in os.listdir(item_path)):
+                    sketches.setdefault(item, item_path)
+        return sketches
+
+    # Lookups
+
+    def mode(self, mode_name: str) -> Optional[ModeAssets]:
+        with self._lock:
+            return self.modes.get(mode_name)
+
+    def script_path(self, mode_name: str) -> Optional[str]:
+        assets = self.mode(mode_name)
+        return assets.script if assets else None
+
+    def sketch_path(self, sketch_name: str) -> Optional[str]:
+        """Folder of a sketch used by a mode, else of any sketch with that name."""
+        with self._lock:
+            for assets in self.modes.values():
+                if assets.sketch_dir and os.path.basename(assets.sketch_dir).lower() == sketch_name.lower():
+                    return assets.sketch_dir
+            return self.sketches.get(sketch_name)
+
+    def sketch_names(self) -> List[str]:
+        with self._lock:
+            return list(self.sketches)
+
+    # Watching
+
+    @staticmethod
+    def _stamp_dirs(folders: List[Optional[str]]) -> Dict[str, int]:
+        # A folder's mtime changes when entries are added, removed or renamed
+        stamp = {}
+        for folder in folders:
+            if folder:
+                try:
+                    stamp[folder] = os.stat(folder).st_mtime_ns
+                except OSError:
+                    stamp[folder] = 0
+        return stamp
+
+    def _stamp(self, assets: ModeAssets) -> Dict[str, int]:
+        folders = [assets.folder, assets.sketch_dir]
+        if assets.sketch_dir:
+            folders.append(_match(assets.sketch_dir, "data", True))
+        return self._stamp_dirs(folders)
+
+    def refresh(self) -> List[str]:
+        """Rescan the modes whose folders changed since the last scan. Returns their names."""
+        root_changed = self._stamp_dirs([self.root]) != self._stamps.get('')
+        changed = []
+        for mode_name in self.config['modes']:
+            old = self._stamps.get(mode_name, {})
+            # A new or renamed mode folder only shows up in the root's mtime
+            if root_changed or not old or self._stamp_dirs(list(old)) != old:
+                assets = self._scan_mode(mode_name)
+                with self._lock:
+                    previous = self.modes.get(mode_name)
+                    self.modes[mode_name] = assets
+                    self._stamps[mode_name] = self._stamp(assets)
+                if previous is None or vars(previous) != vars(assets):
+                    changed.append(mode_name)
+        if root_changed or changed:
+            sketches = self._scan_sketches()
+            with self._lock:
+                self._stamps[''] = self._stamp_dirs([self.root])
+                self.sketches = sketches
+        for mode_name in changed:
+            log.info(f"Mode assets changed: {self.modes[mode_name]}")
+        return changed
+
+    def watch(self, interval: float = 1.0):
+        """Poll the mode tree in the background and refresh changed modes."""
+        if self._watcher:
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="asset-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                log.error(f"Error refreshing mode assets: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._watcher:
+            self._watcher.join(timeout=2)
+            self._watcher = None
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import socket
+import time
+from processing_manager import ProcessingManager
+from supercollider_manager import SuperColliderManager
+from serial_reader import SerialProtocol
+from teensy_protocol import make_decoder
+from log_setup import setup_logging
+from osc_listener import ControllerListener
+from readiness import ReadinessTracker
+from asset_registry import AssetRegistry
+from async_engines import AsyncModeSwitchOrchestrator
+from input_devices import find_ports
+from config_loader import ConfigWatcher
+from sample_index import refresh_index
+from controller_core import ControllerCore, load_config, CONFIG_PATH
+
+try:
+    import serial_asyncio
+except ImportError:
+    serial_asyncio = None
+
+log = logging.getLogger("controller")
+
+class AsyncController(ControllerCore):
+    """Controller that runs everything on one asyncio event loop.
+
+    Same config-driven routing as MainController (both build on
+    ControllerCore), but serial input arrives through a pyserial-asyncio
+    transport, OSC goes out through one shared DatagramTransport, engine
+    feedback is served on the loop and the engines are asyncio
+    subprocesses. Events are dispatched as soon as the serial transport
+    delivers them; pot filter and bundle deadlines are loop timers.
+
+    The engine pool (system.engine_pool) is thread based and only available
+    in main-control.py.
+    """
+
+    def __init__(self, config: dict, transport: asyncio.DatagramTransport, log_listener):
+        self.log_listener = log_listener
+        super().__init__(config, transport)
+        self.loop = asyncio.get_running_loop()
+        self.transport = transport
+        self.serial_transports = []
+        self.serial_protocols = []
+        self.supervisors = []
+        self.stop_requested = asyncio.Event()
+        # With latency stats on, events go through a timed dispatch
+        self.timed_dispatch = self.stats.event_dispatcher(self.dispatch_event) if self.stats else None
+        self._timer = None
+        self._timer_due = None
+        self.config_watcher = None
+
+        # Engines report back on the controller port once they are ready
+        self.readiness = ReadinessTracker()
+        self.listener = ControllerListener(self.settings.system.ports.controller,
+                                           receive_buffer=self.settings.system.defaults.listener_buffer)
+        self.readiness.attach(self.listener.dispatcher)
+        if self.probe:
+            self.probe.attach(self.listener.dispatcher)
+        # The listener serves on the loop, so engine feedback is dispatched right away
+        self.listener.dispatcher.set_default_handler(
+            self.feedback_handler(lambda event: self.on_event(time.perf_counter(), event))
+        )
+
+        # Sketch folders and scripts of every mode, shared by all engine managers
+        self.assets = AssetRegistry(self.config)
+
+        if (self.config['system'].get('engine_pool') or {}).get('enabled'):
+            log.warning("The engine pool is not available in the asyncio controller, engines restart per mode")
+
+        # The managers only build commands here, the processes run on the loop
+        log.info("Initializing Processing...")
+        self.processing = ProcessingManager(self.config, self.readiness, self.assets)
+
+        log.info("Initializing SuperCollider...")
+        self.supercollider = SuperColliderManager(self.config, self.readiness, self.assets)
+
+        self.orchestrator = AsyncModeSwitchOrchestrator(self.processing, self.supercollider, self.readiness)
+
+    async def setup(self):
+        await self.listener.start_async()
+        await self.connect_serial()
+        if self.stats:
+            self.stats.start()
+
+        # Index new or changed samples before SuperCollider reads the index, off the loop
+        index_settings = self.config['system'].get('sample_index') or {}
+        if index_settings.get('enabled'):
+            await self.loop.run_in_executor(None, refresh_index, index_settings)
+
+        # Cold start both engines at once and wait until they report ready
+        startup = self.orchestrator.switch(self.current_mode, self.mode_config)
+        results = await asyncio.wrap_future(startup.done)
+        log.info(f"Engines started in {startup.elapsed:.2f} s: "
+                 + ", ".join(f"{engine} {'ready' if ok else 'FAILED'}" for engine, ok in results.items()))
+        if self.probe:
+            self.schedule_timers()  # Start pinging without waiting for input
+
+        # Edited controls are applied on the loop
+        reload_settings = self.config['system'].get('config_reload') or {}
+        if reload_settings.get('enabled'):
+            self.config_watcher = ConfigWatcher(
+                CONFIG_PATH, lambda config: self.loop.call_soon_threadsafe(self.config_changed, config),
+                reload_settings.get('poll_seconds', 1.0)
+            )
+            self.config_watcher.start()
+
+    def config_changed(self, config: dict):
+        self.reload_controls(config)
+        self.schedule_timers()
+
+    async def connect_serial(self):
+        """Open every controller's port as an asyncio transport, or run without hardware input.
+
+        Devices with ``reconnect`` on are handed to a supervisor task that
+        reopens them whenever they go away (see input_devices.py).
+        """
+        if serial_asyncio is None:
+            log.error("pyserial-asyncio is not installed (pip install pyserial-asyncio)")
+            log.warning("Will run without hardware input.")
+            return
+        for device in find_ports(self.devices):
+            connection = None
+            try:
+                log.info(f"Connecting to {device.device_id} on {device.port} at {device.baud_rate} baud...")
+                connection = await self.open_device(device, device.port)
+                log.info(f"Successfully connected to {device.device_id} ({device.protocol} protocol)")
+            except Exception as e:
+                if not device.reconnect:
+                    log.error(f"Error connecting to {device.device_id}: {e}")
+                else:
+                    log.warning(f"Could not open {device.device_id} ({e}), waiting for it to be plugged in...")
+            if device.reconnect:
+                self.supervisors.append(asyncio.ensure_future(self.supervise(device, connection)))
+            elif connection:
+                self.serial_transports.append(connection[0])
+                self.serial_protocols.append(connection[1])
+        if self.devices and not (self.serial_transports or self.supervisors):
+            log.warning("Will run without hardware input.")
+
+    async def open_device(self, device, port: str):
+        transport, protocol = await serial_asyncio.create_serial_connection(
+            self.loop,
+            lambda: SerialProtocol(make_decoder(device.protocol), self.on_event, device.index, device.start_recording(),
+                                   self.stats.histogram('decode') if self.stats else None),
+            port, baudrate=device.baud_rate
+        )
+        # Teensy USB serial does not reset on open, just drop any partial line
+        transport.serial.reset_input_buffer()
+        return transport, protocol
+
+    async def supervise(self, device, connection):
+        """Keep a device connected: wait for its port to close, then reopen it with backoff."""
+        while True:
+            if connection is not None:
+                transport, protocol = connection
+                self.serial_transports.append(transport)
+                await protocol.closed
+                self.serial_transports.remove(transport)
+                log.warning(f"Lost {device.device_id}, reconnecting...")
+
+            lost = time.perf_counter()
+            connection = None
+            attempts = 0
+            for delay in device.retry_delays():
+                await asyncio.sleep(delay)
+                attempts += 1
+                # Listing ports can take a while on Windows, keep it off the loop
+                port = await self.loop.run_in_executor(None, device.resolve_port)
+                if port is None:
+                    continue
+                try:
+                    connection = await self.open_device(device, port)
+                except Exception as e:
+                    log.debug(f"Reconnect to {device.device_id} on {port} failed: {e}")
+                    continue
+                device.reconnected(port, attempts, lost)
+                break
+
+    def on_event(self, timestamp: float, event):
+        """Called by the serial protocol for every decoded input event, and for engine feedback."""
+        try:
+            if self.timed_dispatch is None:
+                self.dispatch_event(*event)
+            else:
+                self.timed_dispatch(timestamp, event)
+        except Exception as e:
+            log.exception(f"Error processing event {event}: {e}")
+        self.schedule_timers()
+
+    def start_mode_switch(self, mode_name: str):
+        switch = self.orchestrator.switch(mode_name, self.config['modes'][mode_name])
+        switch.done.add_done_callback(lambda _: self.loop.call_soon_threadsafe(self._switch_done))
+        return switch
+
+    def _switch_done(self):
+        if self.mode_switch is not None and self.mode_switch.done.done():
+            self.finish_mode_switch()
+        self.schedule_timers()
+
+    def schedule_timers(self):
+        """Run due pot values and bundles now and arm one loop timer for the next deadline."""
+        try:
+            next_due = self.service_timers()
+        except Exception as e:
+            # Keep the timer armed, whatever is still queued is retried then
+            log.exception(f"Error servicing timers: {e}")
+            next_due = time.perf_counter() + 0.5
+        if next_due is None or (self._timer is not None and self._timer_due <= next_due):
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer_due = next_due
+        self._timer = self.loop.call_later(max(0.0, next_due - time.perf_counter()), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self.schedule_timers()
+
+    async def run(self):
+        """Set up, then serve until a stop is requested (or every port has gone away without reconnect)."""
+        try:
+            await self.setup()
+            log.info("Setup complete! Running controller...")
+            waits = [asyncio.ensure_future(self.stop_requested.wait())]
+            if self.serial_protocols and not self.supervisors:
+                waits.append(asyncio.gather(*(protocol.closed for protocol in self.serial_protocols)))
+            done, pending = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+            for future in pending:
+                future.cancel()
+        except asyncio.CancelledError:
+            log.info("Shutting down...")
+        except Exception as e:
+            log.exception(f"Unexpected error: {e}")
+        finally:
+            self.running = False
+            await self.cleanup()
+
+    def stop(self):
+        self.stop_requested.set()
+
+    async def cleanup(self):
+        """Clean up all resources."""
+        log.info("Cleaning up...")
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.flush_output()
+
+        # Let a running mode switch finish before stopping the engines
+        await self.orchestrator.close()
+
+        if self.stats:
+            self.stats.stop()
+        if self.config_watcher:
+            self.config_watcher.stop()
+        self.listener.stop()
+        self.assets.stop()
+
+        for supervisor in self.supervisors:
+            supervisor.cancel()
+        await asyncio.gather(*self.supervisors, return_exceptions=True)
+        for transport in list(self.serial_transports):
+            transport.close()
+        if self.serial_transports:
+            log.info(f"Closed {len(self.serial_transports)} serial connection(s)")
+        for device in self.devices:
+            device.stop_recording()
+            if device.reconnects:
+                log.info(f"{device.device_id}: {device.summary()}")
+        self.transport.close()
+
+        log.info("Cleanup complete!")
+        self.log_listener.stop()
+
+async def main():
+    # Load config
+    config = load_config()
+
+    # Logging goes through a background thread from here on
+    log_listener = setup_logging(config['system'].get('logging') or {})
+
+    # One non-blocking UDP socket, on the loop, for every OSC target
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        asyncio.DatagramProtocol, family=socket.AF_INET
+    )
+    try:
+        controller = AsyncController(config, transport, log_listener)
+    except SystemExit:
+        log_listener.stop()
+        raise
+    await controller.run()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
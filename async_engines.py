@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import List, Optional
+from mode_switcher import ModeSwitch, ModeSwitchOrchestrator
+
+log = logging.getLogger(__name__)
+
+class AsyncEngine:
+    """One engine process run as an asyncio subprocess.
+
+    ``start`` launches the command and awaits the readiness handshake (see
+    readiness.py), relaunching on failure like the threaded managers do.
+    Engines that report ready on stdout are started with ``watch_output``.
+    """
+
+    def __init__(self, name: str, readiness, timeout: float, retries: int, env: Optional[dict] = None):
+        self.name = name
+        self.env = env  # Environment of the process (the managers' engine environment)
+        self.readiness = readiness
+        self.timeout = timeout
+        self.retries = retries
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._output: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, cmd: List[str], cwd: Optional[str] = None, watch_output: bool = False) -> bool:
+        for attempt in range(1 + self.retries):
+            if attempt:
+                log.warning(f"Retrying {self.name} (attempt {attempt + 1})")
+            await self.stop()
+            if await self.launch(cmd, cwd, watch_output):
+                return True
+        return False
+
+    async def launch(self, cmd: List[str], cwd: Optional[str] = None, watch_output: bool = False) -> bool:
+        """Start the process once and wait until it is ready."""
+        log.debug(f"Command: {' '.join(cmd)}")
+        self.readiness.expect(self.name)
+        pipe = asyncio.subprocess.PIPE if watch_output else None
+        self.process = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=self.env, stdout=pipe, stderr=asyncio.subprocess.STDOUT if watch_output else None
+        )
+        if watch_output:
+            self._output = asyncio.ensure_future(self.readiness.watch_output_async(self.name, self.process.stdout))
+        return await self.readiness.wait_async(self.name, self.process, self.timeout)
+
+    async def stop(self, timeout: float = 2):
+        """Terminate the process, killing it if it does not exit promptly."""
+        if self.running:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        if self._output:
+            self._output.cancel()
+            self._output = None
+
+async def taskkill(*images: str):
+    """Kill stray engine processes by image name (Windows only, like the threaded managers)."""
+    if sys.platform != "win32":
+        return
+    for image in images:
+        process = await asyncio.create_subprocess_exec(
+            "taskkill", "/F", "/IM", image,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        await process.wait()
+
+class AsyncModeSwitchOrchestrator(ModeSwitchOrchestrator):
+    """ModeSwitchOrchestrator for the asyncio controller.
+
+    Engine starts are tasks on the running loop instead of jobs on a thread
+    pool. The ProcessingManager and SuperColliderManager are only used for
+    their settings and to build the engine commands; the processes
+    themselves are AsyncEngines. ``switch.done`` is resolved on the loop
+    thread, so its callbacks can touch controller state directly.
+    """
+
+    def __init__(self, processing, supercollider, readiness):
+        # Engines run as tasks on the loop, no thread pool
+        super().__init__(processing, supercollider, threaded=False)
+        self.sketch = AsyncEngine(processing.engine, readiness, processing.startup_timeout,
+                                  processing.startup_retries, processing.env)
+        self.sclang = AsyncEngine(supercollider.engine, readiness, supercollider.startup_timeout,
+                                  supercollider.startup_retries, supercollider.env)
+        # Resident host (see Modes/pace-host.scd), mode scripts are loaded into it over OSC
+        self.host = AsyncEngine('supercollider-host', readiness, supercollider.startup_timeout, 0,
+                                supercollider.env)
+
+    def switch(self, mode_name: str, mode_config: dict) -> ModeSwitch:
+        """Start both engines for a mode as tasks and return the switch handle."""
+        if self.busy:
+            raise RuntimeError(f"Already switching to {self.current.mode_name}")
+
+        switch = ModeSwitch(mode_name)
+        sketch = (mode_config.get('processing') or {}).get('sketch')
+        if sketch:
+            switch.engines['processing'] = asyncio.ensure_future(self._start_processing(sketch))
+        else:
+            log.info(f"No Processing sketch defined for mode {mode_name}")
+        switch.engines['supercollider'] = asyncio.ensure_future(self._start_supercollider(mode_name))
+
+        for engine, task in switch.engines.items():
+            task.add_done_callback(lambda t, engine=engine: self._engine_done(switch, engine, t))
+        self.current = switch
+        return switch
+
+    async def _start_processing(self, sketch_name: str) -> bool:
+        await self.sketch.stop()
+        if not self.processing.pooled:
+            await taskkill("processing-java.exe", "java.exe")
+        command = self.processing.sketch_command(sketch_name)
+        if command is None:
+            return False
+        cmd, cwd, cached = command
+        start = time.perf_counter()
+        log.info(f"Launching Processing sketch: {sketch_name}")
+        if not await self.sketch.start(cmd, cwd, watch_output=True):
+            log.error("Sketch failed to start")
+            return False
+        self.processing.current_sketch = sketch_name
+        log.info(f"Successfully launched sketch: {sketch_name} in {time.perf_counter() - start:.2f} s "
+                 f"({'cached build' if cached else 'compiled'})")
+        return True
+
+    async def _start_supercollider(self, mode_name: str) -> bool:
+        self.supercollider.set_current_mode(mode_name)
+        if self.supercollider.resident:
+            return await self._load_mode(mode_name)
+
+        command = self.supercollider.script_command()
+        if command is None:
+            return False
+        cmd, mode_dir = command
+        log.info(f"Starting SuperCollider with script: {cmd[1]}")
+        return await self.sclang.start(cmd, mode_dir)
+
+    async def _load_mode(self, mode_name: str) -> bool:
+        """Load the mode's script into the resident host, starting the host first if needed."""
+        sc_script = self.supercollider.script_path()
+        if sc_script is None:
+            return False
+        host_script = self.supercollider.host_script
+        for attempt in range(1 + self.supercollider.startup_retries):
+            if attempt:
+                log.warning(f"Retrying SuperCollider mode load (attempt {attempt + 1})")
+            if not self.host.running:
+                log.info(f"Starting SuperCollider host: {host_script}")
+                await self.host.stop()
+                if not await self.host.launch([self.supercollider.sclang_path, host_script],
+                                              os.path.dirname(host_script)):
+                    await self.host.stop()
+                    continue
+
+            log.info(f"Loading {mode_name} into the SuperCollider host")
+            self.sclang.readiness.expect(self.sclang.name)
+            self.supercollider.host.send_message("/pace/load", [mode_name, sc_script])
+            if await self.sclang.readiness.wait_async(self.sclang.name, self.host.process, self.sclang.timeout):
+                return True
+            # A script that hangs or crashes sclang takes the host down with it, start over
+            await self._stop_host()
+        return False
+
+    async def _stop_host(self):
+        """Ask the resident host to quit, killing it if it does not exit promptly."""
+        if not self.host.running:
+            return
+        try:
+            self.supercollider.host.send_message("/pace/quit", None)
+            await asyncio.wait_for(self.host.process.wait(), 3)
+        except (OSError, asyncio.TimeoutError):
+            await self.host.stop(5)
+
+    async def close(self):
+        """Wait for a running switch, then stop every engine process."""
+        if self.busy:
+            await asyncio.gather(*self.current.engines.values(), return_exceptions=True)
+        await self._stop_host()
+        await asyncio.gather(self.sketch.stop(), self.sclang.stop(), self.host.stop())
+        if not self.processing.pooled:
+            await taskkill("processing-java.exe", "java.exe", "sclang.exe", "scsynth.exe")
@@ -0,0 +1,438 @@
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+import wave
+from typing import Dict, Optional, Tuple
+from osc_packets import OSCTarget
+
+try:
+    import numpy
+except ImportError:  # Only needed when a mode turns analysis on
+    numpy = None
+
+try:
+    import sounddevice
+except ImportError:  # Only needed to analyse a live input
+    sounddevice = None
+
+log = logging.getLogger(__name__)
+
+FEATURES = ("rms", "centroid", "flux", "onset")
+KEEPALIVE_ADDRESS = "/pace/analysis"  # Tells the mode's SuperCollider script to leave the analysis to us
+KEEPALIVE_SECONDS = 1.0
+SILENCE = 1e-3  # RMS below which nothing counts as an onset (-60 dB)
+BATCH_FRAMES = 1024  # Frames per FFT batch when analysing a whole file
+
+DEFAULTS = {
+    'rate': 30,             # Feature messages per second
+    'gain': 1.0,            # Applied to the channel sum before analysis
+    'frame_size': 2048,     # FFT size
+    'hop_size': 512,        # Samples between analysis frames
+    'onset_threshold': 0.3,  # Spectral flux (0-1) that counts as an onset
+    'onset_gap_ms': 100,    # Shortest time between two onsets
+    'cache_dir': ".feature-cache",
+}
+
+class AnalysisSettings:
+    """A mode's `analysis` block with DEFAULTS filled in."""
+
+    __slots__ = ('source', 'target', 'features', 'channels') + tuple(DEFAULTS)
+
+    def __init__(self, analysis: dict):
+        for key, value in DEFAULTS.items():
+            setattr(self, key, analysis.get(key, value))
+        self.source = analysis.get('source', "")
+        self.target = analysis.get('target', "processing")
+        self.features = dict(analysis.get('features') or {})
+        self.channels = analysis.get('channels', 1)
+
+    def track_key(self) -> tuple:
+        """The settings a precomputed track depends on."""
+        return (self.gain, self.frame_size, self.hop_size, self.onset_threshold, self.onset_gap_ms)
+
+def _analyze(frames, window, freqs, previous):
+    """RMS, spectral centroid (Hz) and spectral flux of each row of ``frames``, one batched FFT.
+
+    ``previous`` is the magnitude spectrum of the frame before the first
+    row. Flux is the magnitude that is new since the previous frame as a
+    share of the frame's total (0-1).
+    """
+    spectra = numpy.abs(numpy.fft.rfft(frames * window, axis=1))
+    total = spectra.sum(axis=1)
+    safe_total = numpy.maximum(total, 1e-12)
+    rms = numpy.sqrt(numpy.mean(frames * frames, axis=1))
+    centroid = numpy.where(total > 0, spectra @ freqs / safe_total, 0.0)
+    before = numpy.vstack((previous[None, :], spectra[:-1]))
+    flux = numpy.where(total > 0, numpy.maximum(spectra - before, 0.0).sum(axis=1) / safe_total, 0.0)
+    return rms, centroid, flux, spectra[-1]
+
+class _OnsetDetector:
+    """Rising edges of the flux through the threshold, at least ``gap`` frames apart."""
+
+    def __init__(self, threshold: float, gap: int):
+        self.threshold = threshold
+        self.gap = gap
+        self.above = False
+        self.last = -gap
+        self.frame = 0
+
+    def __call__(self, flux, rms):
+        above = (flux >= self.threshold) & (rms > SILENCE)
+        rising = above & ~numpy.concatenate(([self.above], above[:-1]))
+        onsets = numpy.zeros(len(flux), dtype=bool)
+        # Few candidates per batch, the gap is checked one by one
+        for i in numpy.flatnonzero(rising):
+            if self.frame + i - self.last >= self.gap:
+                onsets[i] = True
+                self.last = self.frame + i
+        if len(flux):
+            self.above = bool(above[-1])
+        self.frame += len(flux)
+        return onsets
+
+class _Spectrum:
+    """Window and bin frequencies shared by the offline and streaming analysis."""
+
+    def __init__(self, sample_rate: int, settings: AnalysisSettings):
+        n = settings.frame_size
+        self.window = (0.5 - 0.5 * numpy.cos(2 * numpy.pi * numpy.arange(n) / n)).astype(numpy.float32)
+        self.freqs = numpy.fft.rfftfreq(n, 1 / sample_rate)
+        self.previous = numpy.zeros(n // 2 + 1)
+        self.onsets = _OnsetDetector(settings.onset_threshold,
+                                     max(1, round(settings.onset_gap_ms / 1000 * sample_rate / settings.hop_size)))
+
+    def features(self, frames):
+        rms, centroid, flux, self.previous = _analyze(frames, self.window, self.freqs, self.previous)
+        return rms, centroid, flux, self.onsets(flux, rms)
+
+class FeatureTrack:
+    """Precomputed features of an audio file, one entry per hop.
+
+    ``frame_at`` gives the frame playing at a time since the start and
+    ``at`` its features, looping like PlayBuf; onsets between two frames
+    are counted from a running total, so lookups cost the same however far
+    apart they are.
+    """
+
+    def __init__(self, hop_seconds: float, rms, centroid, flux, onset):
+        self.hop_seconds = hop_seconds
+        self.rms = rms
+        self.centroid = centroid
+        self.flux = flux
+        self.onset = onset
+        self.onset_total = numpy.concatenate(([0], numpy.cumsum(onset)))
+        self.frames = len(rms)
+
+    @property
+    def duration(self) -> float:
+        return self.frames * self.hop_seconds
+
+    def frame_at(self, seconds: float) -> int:
+        """Frame number since the start, not wrapped."""
+        return int(seconds / self.hop_seconds)
+
+    def at(self, frame: int) -> Tuple[float, float, float]:
+        i = frame % self.frames
+        return float(self.rms[i]), float(self.centroid[i]), float(self.flux[i])
+
+    def onsets_between(self, first: int, last: int) -> int:
+        """Onsets in frames first+1 to last, across loops."""
+        return self._onsets_before(last + 1) - self._onsets_before(first + 1)
+
+    def _onsets_before(self, frame: int) -> int:
+        loops, i = divmod(frame, self.frames)
+        return int(loops * self.onset_total[-1] + self.onset_total[i])
+
+    def save(self, path: str):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "wb") as file:
+            numpy.savez(file, hop_seconds=self.hop_seconds, rms=self.rms, centroid=self.centroid,
+                        flux=self.flux, onset=self.onset)
+        os.replace(temp, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'FeatureTrack':
+        with numpy.load(path) as data:
+            return cls(float(data['hop_seconds']), data['rms'], data['centroid'], data['flux'], data['onset'])
+
+def read_wav(path: str) -> Tuple['numpy.ndarray', int]:
+    """Mono float32 samples of a PCM WAV file, channels summed like Mix in SuperCollider."""
+    with wave.open(path, "rb") as wav:
+        channels, width, sample_rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        data = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.float32) - 128) / 128
+    elif width == 3:
+        raw = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.int32)
+        ints = (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8
+        samples = ints.astype(numpy.float32) / (1 << 23)
+    elif width in (2, 4):
+        dtype = numpy.dtype(f"<i{width}")
+        samples = numpy.frombuffer(data, dtype=dtype).astype(numpy.float32) / float(1 << (8 * width - 1))
+    else:
+        raise ValueError(f"Unsupported sample width {width} in {path}")
+    return samples.reshape(-1, channels).sum(axis=1), sample_rate
+
+def compute_track(samples, sample_rate: int, settings: AnalysisSettings) -> FeatureTrack:
+    """Analyse a whole signal: frames ending every hop, FFTs in batches of BATCH_FRAMES."""
+    frame, hop = settings.frame_size, settings.hop_size
+    if len(samples) < hop:
+        # Not a single frame, and a track without frames cannot be looped
+        raise ValueError(f"{len(samples)} samples is shorter than one hop ({hop})")
+    # Frame i ends at sample (i + 1) * hop, like analysing the audio as it plays
+    padded = numpy.concatenate((numpy.zeros(frame - hop, dtype=numpy.float32),
+                                numpy.asarray(samples, dtype=numpy.float32) * settings.gain))
+    frames = numpy.lib.stride_tricks.sliding_window_view(padded, frame)[::hop]
+    spectrum = _Spectrum(sample_rate, settings)
+    columns = [[], [], [], []]
+    for start in range(0, len(frames), BATCH_FRAMES):
+        for column, values in zip(columns, spectrum.features(frames[start:start + BATCH_FRAMES])):
+            column.append(values)
+    rms, centroid, flux, onset = (numpy.concatenate(column) if column else numpy.zeros(0) for column in columns)
+    return FeatureTrack(hop / sample_rate, rms.astype(numpy.float32), centroid.astype(numpy.float32),
+                        flux.astype(numpy.float32), onset)
+
+def track_cache_path(path: str, settings: AnalysisSettings) -> str:
+    """Cache file of a source file's track, keyed on the file's size, mtime and the analysis settings."""
+    stat = os.stat(path)
+    key = repr((os.path.abspath(path), stat.st_size, stat.st_mtime_ns, settings.track_key()))
+    digest = hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(settings.cache_dir, f"{name}-{digest}.npz")
+
+def load_track(path: str, settings: AnalysisSettings) -> FeatureTrack:
+    """The features of an audio file, from the cache or analysed (and cached) now."""
+    cached = track_cache_path(path, settings)
+    if os.path.exists(cached):
+        try:
+            track = FeatureTrack.load(cached)
+            if track.frames:  # An empty track cannot be looped, analyse again
+                return track
+        except Exception as e:
+            log.warning(f"Ignoring unreadable feature cache {cached}: {e}")
+    start = time.perf_counter()
+    samples, sample_rate = read_wav(path)
+    track = compute_track(samples, sample_rate, settings)
+    elapsed = time.perf_counter() - start
+    log.info(f"Analysed {os.path.basename(path)} ({track.duration:.0f} s of audio) in {elapsed:.2f} s")
+    try:
+        track.save(cached)
+    except OSError as e:
+        log.warning(f"Could not cache the features of {path}: {e}")
+    return track
+
+class StreamingAnalyzer:
+    """Features of live audio, analysed as it arrives.
+
+    ``push`` takes blocks of mono samples of any length into a ring buffer
+    and analyses every frame they complete in one batch. The latest values
+    are in ``latest`` and ``onset_count`` only goes up, so another thread
+    can read them without a lock.
+    """
+
+    def __init__(self, sample_rate: int, settings: AnalysisSettings):
+        self.frame_size = settings.frame_size
+        self.hop_size = settings.hop_size
+        self.gain = settings.gain
+        capacity = 1 << (2 * self.frame_size - 1).bit_length()
+        self.ring = numpy.zeros(capacity, dtype=numpy.float32)
+        self.mask = capacity - 1
+        self.max_chunk = capacity - self.frame_size
+        self.offsets = numpy.arange(self.frame_size)
+        self.spectrum = _Spectrum(sample_rate, settings)
+        self.written = 0
+        self.next_end = self.hop_size  # Sample count at which the next frame ends
+        self.latest = (0.0, 0.0, 0.0)  # rms, centroid, flux
+        self.onset_count = 0
+        self.frames = 0
+
+    def push(self, block):
+        block = numpy.asarray(block, dtype=numpy.float32)
+        for start in range(0, len(block), self.max_chunk):
+            self._write(block[start:start + self.max_chunk])
+
+    def _write(self, chunk):
+        # At most two slices, around the end of the ring
+        start = self.written & self.mask
+        first = min(len(chunk), len(self.ring) - start)
+        numpy.multiply(chunk[:first], self.gain, out=self.ring[start:start + first])
+        numpy.multiply(chunk[first:], self.gain, out=self.ring[:len(chunk) - first])
+        self.written += len(chunk)
+        if self.written < self.next_end:
+            return
+        ends = numpy.arange(self.next_end, self.written + 1, self.hop_size)
+        self.next_end = int(ends[-1]) + self.hop_size
+        # Before the start of the stream the ring is still zeros, like the padding in compute_track
+        frames = self.ring[(ends[:, None] - self.frame_size + self.offsets) & self.mask]
+        rms, centroid, flux, onset = self.spectrum.features(frames)
+        self.latest = (float(rms[-1]), float(centroid[-1]), float(flux[-1]))
+        self.onset_count += int(onset.sum())
+        self.frames += len(ends)
+
+class FeaturePublisher:
+    """Sends a mode's audio features to an engine, polled from ControllerCore.service_timers.
+
+    A file source is looked up in its precomputed FeatureTrack (loaded or
+    analysed on a background thread when the mode compiles); the clock
+    starts at the first poll, when the mode's engines have just come up and
+    SuperCollider starts playing the file. An `input` source is analysed
+    live by a StreamingAnalyzer. While features are going out the mode's
+    SuperCollider script gets a KEEPALIVE_ADDRESS message every second so
+    it can stop sending its own.
+    """
+
+    def __init__(self, mode_name: str, settings: AnalysisSettings, clients: Dict[str, OSCTarget]):
+        self.mode_name = mode_name
+        self.settings = settings
+        self.clients = clients
+        target = clients[settings.target]
+        self.packets = {feature: target.packet(address, [], with_value=True)
+                        for feature, address in settings.features.items()}
+        self.keepalive = clients.get('supercollider')
+        self.interval = 1.0 / settings.rate
+        self.track: Optional[FeatureTrack] = None
+        self.analyzer: Optional[StreamingAnalyzer] = None
+        self.stream = None
+        self.start_time = None
+        self.next_due = None
+        self.next_keepalive = 0.0
+        self.last_frame = -1
+        self.last_onsets = 0
+        self.sent = 0
+
+        if settings.source == "input":
+            self._open_input()
+        else:
+            threading.Thread(target=self._load, name="feature-track", daemon=True).start()
+
+    def _load(self):
+        try:
+            self.track = load_track(self.settings.source, self.settings)
+        except Exception as e:
+            log.error(f"Could not analyse {self.settings.source} for mode {self.mode_name}: {e}")
+
+    def _open_input(self):
+        if sounddevice is None:
+            log.error("Analysing a live input needs sounddevice (pip install sounddevice)")
+            return
+        sample_rate = int(sounddevice.query_devices(kind='input')['default_samplerate'])
+        self.analyzer = StreamingAnalyzer(sample_rate, self.settings)
+        self.stream = sounddevice.InputStream(
+            samplerate=sample_rate, channels=self.settings.channels, blocksize=self.settings.hop_size,
+            callback=lambda indata, frames, time_info, status: self.analyzer.push(indata.sum(axis=1))
+        )
+        self.stream.start()
+        log.info(f"Analysing the default input at {sample_rate} Hz for mode {self.mode_name}")
+
+    def poll(self, now: float) -> float:
+        """Send the features if they are due. Returns when to poll again."""
+        if self.start_time is None:
+            self.start_time = self.next_due = now
+        if now < self.next_due:
+            return self.next_due
+        values = self._current(now)
+        if values is not None:
+            self._send(values)
+            if self.keepalive is not None and now >= self.next_keepalive:
+                self.keepalive.forward(KEEPALIVE_ADDRESS, [1])
+                self.next_keepalive = now + KEEPALIVE_SECONDS
+        self.next_due += self.interval
+        if self.next_due < now:
+            self.next_due = now + self.interval  # Fell behind, skip rather than burst
+        return self.next_due
+
+    def _current(self, now: float) -> Optional[Tuple[float, float, float, int]]:
+        track = self.track
+        if track is not None:
+            frame = track.frame_at(now - self.start_time)
+            onsets = track.onsets_between(self.last_frame, frame) if self.last_frame >= 0 else 0
+            self.last_frame = frame
+            return track.at(frame) + (onsets,)
+        analyzer = self.analyzer
+        if analyzer is not None and analyzer.frames:
+            count = analyzer.onset_count
+            onsets, self.last_onsets = count - self.last_onsets, count
+            return analyzer.latest + (onsets,)
+        return None
+
+    def _send(self, values: Tuple[float, float, float, int]):
+        packets = self.packets
+        for feature, value in zip(("rms", "centroid", "flux"), values):
+            packet = packets.get(feature)
+            if packet is not None:
+                packet.send(value)
+        if values[3] and 'onset' in packets:
+            packets['onset'].send(1.0)
+        self.sent += 1
+
+    def stop(self):
+        """Stop the input stream and hand the analysis back to SuperCollider."""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        if self.sent and self.keepalive is not None:
+            try:
+                self.keepalive.forward(KEEPALIVE_ADDRESS, [0])
+            except Exception as e:
+                log.error(f"Error sending OSC message: {e}")
+        if self.sent:
+            log.info(f"Audio features ({self.mode_name}): sent {self.sent} times")
+
+def build_feature_publisher(mode_name: str, mode_config: Optional[dict],
+                            clients: Dict[str, OSCTarget]) -> Optional[FeaturePublisher]:
+    """A FeaturePublisher for a mode's `analysis` block, or None if it has none (or it is off)."""
+    analysis = (mode_config or {}).get('analysis') or {}
+    if not analysis.get('enabled'):
+        return None
+    if numpy is None:
+        log.error(f"Audio analysis for mode {mode_name} needs numpy (pip install numpy), leaving it to SuperCollider")
+        return None
+    settings = AnalysisSettings(analysis)
+    if settings.target not in clients:
+        log.warning(f"Unknown analysis target {settings.target} in mode {mode_name}")
+        return None
+    return FeaturePublisher(mode_name, settings, clients)
+
+def main():
+    # Imported here, the controller only needs the analysis
+    from config_loader import read_config
+
+    parser = argparse.ArgumentParser(description="Precompute the feature tracks of every mode's analysis source")
+    parser.add_argument("--config", default="config.yml", help="Controller config file")
+    parser.add_argument("--force", action="store_true", help="Analyse again even if a cached track exists")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if numpy is None:
+        print("Audio analysis needs numpy (pip install numpy)")
+        sys.exit(1)
+
+    config = read_config(args.config)
+    failed = 0
+    for mode_name, mode_config in config['modes'].items():
+        analysis = mode_config.get('analysis')
+        if not analysis or analysis.get('source', "input") == "input":
+            continue
+        settings = AnalysisSettings(analysis)
+        try:
+            cached = track_cache_path(settings.source, settings)
+            if args.force and os.path.exists(cached):
+                os.remove(cached)
+            track = load_track(settings.source, settings)
+        except Exception as e:
+            log.error(f"Could not analyse {settings.source} for mode {mode_name}: {e}")
+            failed += 1
+            continue
+        log.info(f"{mode_name}: {track.frames} frames, {int(track.onset.sum())} onsets, cached in {cached}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+import yaml
+from control_routing import input_id, NUM_INPUTS, POT_OFFSET
+from pot_filter import PotFilter, SMOOTHING_MODES
+from pot_curves import build_curve
+from audio_features import FEATURES, DEFAULTS as ANALYSIS_DEFAULTS
+from teensy_protocol import PROTOCOLS
+
+log = logging.getLogger(__name__)
+
+# Bump when validation or the cached layout changes, so old sidecars are ignored
+SCHEMA_VERSION = 4
+TARGETS = ('processing', 'supercollider')
+CONTROL_SECTIONS = ('buttons', 'pots', 'pot_filter', 'feedback')
+FILTER_SETTINGS = ('deadband', 'smoothing', 'alpha', 'min_cutoff', 'beta', 'd_cutoff', 'max_rate')
+
+class ConfigError(Exception):
+    """The config file cannot be used; ``problems`` lists everything wrong with it."""
+
+    def __init__(self, path: str, problems: List[str]):
+        self.path = path
+        self.problems = problems
+        super().__init__(f"{path}: " + "; ".join(problems))
+
+# Typed, read-only views of the settings the controller and the engine
+# managers read at startup. The raw dict stays the source of truth (and holds
+# everything else); build these once with Config.from_dict after validation.
+
+@dataclass(slots=True)
+class PortsConfig:
+    processing: int = 12000
+    supercollider: int = 57120
+    controller: int = 57300
+    teensy: str = "COM6"
+
+@dataclass(slots=True)
+class PathsConfig:
+    processing_win: str = ""
+    processing_alt_win: str = ""
+    processing_mac: str = ""
+    supercollider_win: str = ""
+
+@dataclass(slots=True)
+class DefaultsConfig:
+    baud_rate: int = 115200
+    initial_mode: str = ""
+    protocol: str = "text"
+    engine_timeout: float = 20
+    engine_retries: int = 1
+    supercollider_host: bool = False
+    listener_buffer: int = 0
+
+@dataclass(slots=True)
+class SystemConfig:
+    ports: PortsConfig = field(default_factory=PortsConfig)
+    paths: PathsConfig = field(default_factory=PathsConfig)
+    defaults: DefaultsConfig = field(default_factory=DefaultsConfig)
+
+    @classmethod
+    def from_dict(cls, system: dict) -> 'SystemConfig':
+        return cls(
+            ports=_section(PortsConfig, system.get('ports')),
+            paths=_section(PathsConfig, system.get('paths')),
+            defaults=_section(DefaultsConfig, system.get('defaults')),
+        )
+
+@dataclass(slots=True)
+class ModeConfig:
+    name: str
+    description: str = ""
+    sketch: Optional[str] = None  # processing.sketch
+    script: Optional[str] = None  # supercollider.script
+    controls: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, name: str, mode: dict) -> 'ModeConfig':
+        return cls(
+            name=name,
+            description=mode.get('description') or "",
+            sketch=(mode.get('processing') or {}).get('sketch'),
+            script=(mode.get('supercollider') or {}).get('script'),
+            controls=mode.get('controls') or {},
+        )
+
+@dataclass(slots=True)
+class Config:
+    system: SystemConfig
+    modes: Dict[str, ModeConfig]
+
+    @classmethod
+    def from_dict(cls, config: dict) -> 'Config':
+        return cls(
+            system=SystemConfig.from_dict(config['system']),
+            modes={name: ModeConfig.from_dict(name, mode) for name, mode in config['modes'].items()},
+        )
+
+def _section(cls, values: Optional[dict]):
+    """A dataclass from the matching keys of a config section, defaults for the rest."""
+    values = values or {}
+    return cls(**{name: values[name] for name in cls.__dataclass_fields__ if values.get(name) is not None})
+
+def validate_config(config) -> List[str]:
+    """Everything wrong with a parsed config, as messages naming the offending key. Empty if valid."""
+    if not isinstance(config, dict):
+        return ["the file does not contain a mapping"]
+    problems = []
+    system = config.get('system')
+    if not isinstance(system, dict):
+        problems.append("system: missing or not a mapping")
+        system = {}
+    modes = config.get('modes')
+    if not isinstance(modes, dict) or not modes:
+        problems.append("modes: missing, empty or not a mapping")
+        modes = {}
+
+    ports = system.get('ports')
+    if not isinstance(ports, dict):
+        problems.append("system.ports: missing or not a mapping")
+        ports = {}
+    for name in ('processing', 'supercollider', 'controller'):
+        port = ports.get(name, 0 if name != 'controller' else 57300)
+        if not isinstance(port, int) or not 0 < port < 65536:
+            problems.append(f"system.ports.{name}: expected a port number, got {port!r}")
+    if not isinstance(ports.get('teensy', ""), str):
+        problems.append(f"system.ports.teensy: expected a port name, got {ports.get('teensy')!r}")
+
+    defaults = system.get('defaults')
+    if not isinstance(defaults, dict):
+        problems.append("system.defaults: missing or not a mapping")
+        defaults = {}
+    if not isinstance(defaults.get('baud_rate'), int) or defaults.get('baud_rate', 0) <= 0:
+        problems.append(f"system.defaults.baud_rate: expected a positive integer, got {defaults.get('baud_rate')!r}")
+    if not isinstance(defaults.get('initial_mode'), str):
+        problems.append("system.defaults.initial_mode: missing")
+    if defaults.get('protocol', 'text') not in PROTOCOLS:
+        problems.append(f"system.defaults.protocol: expected one of {', '.join(PROTOCOLS)}, "
+                        f"got {defaults.get('protocol')!r}")
+    listener_buffer = defaults.get('listener_buffer', 0)
+    if not isinstance(listener_buffer, int) or listener_buffer < 0:
+        problems.append(f"system.defaults.listener_buffer: expected a size in bytes (0 for the OS default), "
+                        f"got {listener_buffer!r}")
+
+    devices = system.get('devices') or []
+    if not isinstance(devices, list) or not all(isinstance(device, dict) for device in devices):
+        problems.append("system.devices: expected a list of mappings")
+        devices = []
+    device_ids = [str(device.get('id') or f"device{i + 1}") for i, device in enumerate(devices)]
+
+    for mode_name, mode in modes.items():
+        problems.extend(_validate_mode(str(mode_name), mode, device_ids))
+    return problems
+
+def _validate_mode(mode_name: str, mode, device_ids: List[str]) -> List[str]:
+    where = f"modes.{mode_name}"
+    if not isinstance(mode, dict):
+        return [f"{where}: expected a mapping"]
+    problems = []
+    for engine, key in (('processing', 'sketch'), ('supercollider', 'script')):
+        section = mode.get(engine)
+        if section is not None and not (isinstance(section, dict) and isinstance(section.get(key), str)):
+            problems.append(f"{where}.{engine}: expected a mapping with a {key}")
+    if mode.get('analysis') is not None:
+        problems.extend(_validate_analysis(f"{where}.analysis", mode['analysis']))
+
+    controls = mode.get('controls')
+    if controls is None:
+        return problems
+    if not isinstance(controls, dict):
+        return problems + [f"{where}.controls: expected a mapping"]
+    where += ".controls"
+    for key, value in controls.items():
+        if key in CONTROL_SECTIONS:
+            if value is None:
+                problems.append(f"{where}.{key}: empty (remove it, or indent its entries under it)")
+            elif not isinstance(value, dict):
+                problems.append(f"{where}.{key}: expected a mapping")
+        elif input_id(str(key), device_ids) is not None:
+            problems.append(f"{where}.{key}: input at the level of the control sections, "
+                            f"indent it under {'pots' if 'pot' in str(key) else 'buttons'}:")
+        else:
+            problems.append(f"{where}.{key}: unknown section, expected one of {', '.join(CONTROL_SECTIONS)}")
+
+    for name, button in _entries(controls, 'buttons'):
+        index = input_id(str(name), device_ids)
+        if index is None or index % NUM_INPUTS >= POT_OFFSET:
+            problems.append(f"{where}.buttons.{name}: unknown button")
+        elif button is not None and not isinstance(button, dict):
+            problems.append(f"{where}.buttons.{name}: expected a mapping")
+        elif button and 'actions' in button:
+            problems.extend(_validate_actions(f"{where}.buttons.{name}", button['actions']))
+
+    for name, pot in _entries(controls, 'pots'):
+        index = input_id(str(name), device_ids)
+        if index is None or index % NUM_INPUTS < POT_OFFSET:
+            problems.append(f"{where}.pots.{name}: unknown pot")
+        elif pot is not None and not isinstance(pot, dict):
+            problems.append(f"{where}.pots.{name}: expected a mapping")
+        elif pot:
+            problems.extend(_validate_route(f"{where}.pots.{name}", pot))
+            problems.extend(_validate_filter(f"{where}.pots.{name}.filter", pot.get('filter')))
+            problems.extend(_validate_curve(f"{where}.pots.{name}.curve", pot.get('curve')))
+
+    if isinstance(controls.get('pot_filter'), dict):
+        problems.extend(_validate_filter(f"{where}.pot_filter", controls['pot_filter']))
+
+    for address, feedback in _entries(controls, 'feedback'):
+        if not str(address).startswith('/'):
+            problems.append(f"{where}.feedback.{address}: OSC addresses start with /")
+        if not isinstance(feedback, dict):
+            problems.append(f"{where}.feedback.{address}: expected a mapping")
+            continue
+        if 'actions' in feedback:
+            problems.extend(_validate_actions(f"{where}.feedback.{address}", feedback['actions']))
+        else:
+            problems.extend(_validate_route(f"{where}.feedback.{address}", feedback))
+        problems.extend(_validate_filter(f"{where}.feedback.{address}.filter", feedback.get('filter')))
+    return problems
+
+def _entries(controls: dict, section: str):
+    entries = controls.get(section)
+    return entries.items() if isinstance(entries, dict) else ()
+
+def _validate_actions(where: str, actions) -> List[str]:
+    if not isinstance(actions, list):
+        return [f"{where}.actions: expected a list"]
+    problems = []
+    for i, action in enumerate(actions):
+        if not isinstance(action, dict):
+            problems.append(f"{where}.actions[{i}]: expected a mapping")
+        else:
+            problems.extend(_validate_route(f"{where}.actions[{i}]", action))
+    return problems
+
+def _validate_route(where: str, route: dict) -> List[str]:
+    problems = []
+    if route.get('target') not in TARGETS:
+        problems.append(f"{where}.target: expected one of {', '.join(TARGETS)}, got {route.get('target')!r}")
+    if not isinstance(route.get('command'), str) or not route['command'].startswith('/'):
+        problems.append(f"{where}.command: expected an OSC address, got {route.get('command')!r}")
+    if not isinstance(route.get('params', []), list):
+        problems.append(f"{where}.params: expected a list")
+    return problems
+
+def _validate_filter(where: str, settings) -> List[str]:
+    if settings is None:
+        return []
+    if not isinstance(settings, dict):
+        return [f"{where}: expected a mapping"]
+    unknown = [key for key in settings if key not in FILTER_SETTINGS]
+    if unknown:
+        return [f"{where}: unknown settings {', '.join(map(str, unknown))}"]
+    if settings.get('smoothing', 'none') not in SMOOTHING_MODES:
+        return [f"{where}.smoothing: expected one of {', '.join(SMOOTHING_MODES)}"]
+    try:
+        PotFilter(**settings)
+    except (TypeError, ValueError) as e:
+        return [f"{where}: {e}"]
+    return []
+
+def _validate_analysis(where: str, analysis) -> List[str]:
+    if not isinstance(analysis, dict):
+        return [f"{where}: expected a mapping"]
+    problems = []
+    if analysis.get('enabled') and not isinstance(analysis.get('source'), str):
+        problems.append(f"{where}.source: expected a WAV file or input")
+    if analysis.get('target', 'processing') not in TARGETS:
+        problems.append(f"{where}.target: expected one of {', '.join(TARGETS)}, got {analysis.get('target')!r}")
+    for key in ('rate', 'frame_size', 'hop_size'):
+        value = analysis.get(key, ANALYSIS_DEFAULTS[key])
+        if not isinstance(value, (int, float)) or value <= 0:
+            problems.append(f"{where}.{key}: expected a number above 0, got {value!r}")
+    if not problems and (analysis.get('hop_size', ANALYSIS_DEFAULTS['hop_size'])
+                         > analysis.get('frame_size', ANALYSIS_DEFAULTS['frame_size'])):
+        problems.append(f"{where}.hop_size: larger than frame_size")
+    features = analysis.get('features') or {}
+    if not isinstance(features, dict):
+        return problems + [f"{where}.features: expected a mapping of feature: OSC address"]
+    for feature, address in features.items():
+        if feature not in FEATURES:
+            problems.append(f"{where}.features.{feature}: unknown feature, expected one of {', '.join(FEATURES)}")
+        elif not isinstance(address, str) or not address.startswith('/'):
+            problems.append(f"{where}.features.{feature}: expected an OSC address, got {address!r}")
+    return problems
+
+def _validate_curve(where: str, settings) -> List[str]:
+    if settings is None:
+        return []
+    if not isinstance(settings, dict):
+        return [f"{where}: expected a mapping"]
+    try:
+        build_curve(settings)
+    except ValueError as e:
+        return [f"{where}: {e}"]
+    return []
+
+def cache_path(path: str) -> str:
+    """Sidecar file holding the parsed config: .<name>.cache next to it."""
+    folder, name = os.path.split(os.path.abspath(path))
+    return os.path.join(folder, f".{name}.cache")
+
+def read_config(path: str = 'config.yml', use_cache: bool = True) -> dict:
+    """Parse and validate the config file, or take it from its sidecar cache.
+
+    The cache holds the validated dict as a pickle, keyed by the file's
+    mtime and size (checked first, without reading the file) and its
+    content hash (so a touched but unchanged file is still a hit). Only
+    valid configs are cached. Raises ConfigError if the file is invalid.
+    """
+    stat = os.stat(path)
+    sidecar = cache_path(path)
+    cached = _read_cache(sidecar) if use_cache else None
+    if cached and cached['mtime_ns'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+        return cached['config']
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    if cached and cached['digest'] == digest:
+        config = cached['config']
+    else:
+        try:
+            config = yaml.safe_load(data)
+        except yaml.YAMLError as e:
+            raise ConfigError(path, [f"not valid YAML: {e}"])
+        problems = validate_config(config)
+        if problems:
+            raise ConfigError(path, problems)
+    if use_cache:
+        _write_cache(sidecar, {'schema': SCHEMA_VERSION, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                               'digest': digest, 'config': config})
+    return config
+
+def _read_cache(sidecar: str) -> Optional[dict]:
+    try:
+        with open(sidecar, 'rb') as file:
+            cached = pickle.load(file)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.debug(f"Ignoring unreadable config cache {sidecar}: {e}")
+        return None
+    if not isinstance(cached, dict) or cached.get('schema') != SCHEMA_VERSION:
+        return None
+    return cached
+
+def _write_cache(sidecar: str, cached: dict):
+    temp = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        with open(temp, 'wb') as file:
+            pickle.dump(cached, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, sidecar)
+    except OSError as e:
+        log.debug(f"Could not write config cache {sidecar}: {e}")
+
+class ConfigWatcher:
+    """Polls the config file and hands every valid new version to ``on_change``.
+
+    ``on_change(config)`` runs on the watcher thread; an invalid file is
+    reported and skipped, the controller keeps the last good config. A change
+    is only read once the file has stayed the same for one poll, so an editor
+    that is still writing it is not caught halfway.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[dict], None], interval: float = 1.0):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stamp = self._read_stamp()
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+        self._thread.start()
+        log.info(f"Watching {self.path} for control changes")
+
+    def poll(self) -> bool:
+        """Check the file once. Returns True if a new valid config was handed over."""
+        stamp = self._read_stamp()
+        if stamp is None or stamp == self._stamp:
+            self._pending = None
+            return False
+        if stamp != self._pending:
+            self._pending = stamp
+            return False
+        self._stamp = stamp
+        self._pending = None
+        try:
+            config = read_config(self.path)
+        except ConfigError as e:
+            log.error(f"Not reloading {self.path}, it is invalid:\n  " + "\n  ".join(e.problems))
+            return False
+        except Exception as e:
+            log.error(f"Error reloading {self.path}: {e}")
+            return False
+        self.on_change(config)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
@@ -0,0 +1,147 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+from osc_packets import OSCTarget
+
+log = logging.getLogger(__name__)
+
+# Flat input ID layout shared by the parser and the routing table
+NUM_DIRECT_BUTTONS = 7
+NUM_MATRIX_BUTTONS = 16  # 4x4 matrix
+NUM_POTS = 3
+
+MATRIX_OFFSET = NUM_DIRECT_BUTTONS
+POT_OFFSET = MATRIX_OFFSET + NUM_MATRIX_BUTTONS
+NUM_INPUTS = POT_OFFSET + NUM_POTS
+
+# Names used in the config file, 1-indexed for the user interface
+INPUT_NAMES = (
+    [f"btn{i + 1}" for i in range(NUM_DIRECT_BUTTONS)]
+    + [f"mbtn{i + 1}" for i in range(NUM_MATRIX_BUTTONS)]
+    + [f"pot{i + 1}" for i in range(NUM_POTS)]
+)
+INPUT_IDS = {name: index for index, name in enumerate(INPUT_NAMES)}
+
+# With several controllers (system.devices) each device gets its own block of
+# NUM_INPUTS IDs, in config order: device d's input i is d * NUM_INPUTS + i.
+# Config names address them as "<device id>/<input>", e.g. "deck/pot1"; a
+# plain name is an input of the first device.
+
+def input_id(name: str, devices: Sequence[str] = ()) -> Optional[int]:
+    """Flat input ID for a config name like "btn1" or "deck/btn1", or None."""
+    device, _, local = name.rpartition('/')
+    index = INPUT_IDS.get(local)
+    if index is None or not device:
+        return index
+    if device not in devices:
+        return None
+    return devices.index(device) * NUM_INPUTS + index
+
+def input_name(input_id: int, devices: Sequence[str] = ()) -> str:
+    """Config name of a flat input ID, prefixed with its device after the first."""
+    device, index = divmod(input_id, NUM_INPUTS)
+    if device:
+        return f"{devices[device]}/{INPUT_NAMES[index]}"
+    return INPUT_NAMES[index]
+
+def pot_input_id(pot_slot: int) -> int:
+    """Flat input ID of a pot slot (device * NUM_POTS + pot index)."""
+    device, index = divmod(pot_slot, NUM_POTS)
+    return device * NUM_INPUTS + POT_OFFSET + index
+
+# Engine feedback (OSC the engines send to the controller port, routed by a
+# mode's `controls.feedback`) takes the slots after the last device's block,
+# one per address in config order.
+
+def feedback_slots(mode_config: Optional[dict]) -> Dict[str, int]:
+    """Feedback slot of each OSC address in a mode's `controls.feedback`."""
+    controls = (mode_config or {}).get('controls') or {}
+    return {str(address): slot for slot, address in enumerate(controls.get('feedback') or {})}
+
+def feedback_input_id(slot: int, devices: Sequence[str] = ()) -> int:
+    """Flat input ID of a feedback slot."""
+    return NUM_INPUTS * max(1, len(devices)) + slot
+
+def compile_controls(mode_name: str, mode_config: Optional[dict], clients: Dict[str, OSCTarget],
+                     devices: Sequence[str] = ()) -> List[Optional[tuple]]:
+    """Compile a mode's `controls` section into a flat routing table.
+
+    The table has one slot per input ID, NUM_INPUTS for each device in
+    ``devices`` (one block when empty), then one per feedback address. Each
+    slot is either None (input not
+    configured) or a tuple of routes ``(packet, address, params, target)``,
+    where ``packet`` is the target's pre-encoded OSCPacket. Button packets are
+    sent as-is; pot packets end with a float slot that ``packet.send(value)``
+    fills in with the mapped value. Feedback packets also end with a float
+    slot, for messages with a single float argument; other feedback is
+    encoded per message with its arguments appended to ``params``.
+
+    Configuration problems are reported here, once per compile, instead of
+    on every event.
+    """
+    controls = (mode_config or {}).get('controls') or {}
+    feedback = controls.get('feedback') or {}
+    table = [None] * (NUM_INPUTS * max(1, len(devices)) + len(feedback))
+
+    buttons = controls.get('buttons') or {}
+    for btn_name, btn_config in buttons.items():
+        index = input_id(btn_name, devices)
+        if index is None or index % NUM_INPUTS >= POT_OFFSET:
+            log.warning(f"Unknown button {btn_name} in mode {mode_name}")
+            continue
+        if not btn_config or 'actions' not in btn_config:
+            continue  # System buttons like the mode switch have no actions
+
+        routes = []
+        for action in btn_config['actions'] or []:
+            route = _compile_route(mode_name, btn_name, action, clients, False)
+            if route:
+                routes.append(route)
+        if routes:
+            table[index] = tuple(routes)
+
+    pots = controls.get('pots') or {}
+    for pot_name, pot_config in pots.items():
+        index = input_id(pot_name, devices)
+        if index is None or index % NUM_INPUTS < POT_OFFSET:
+            log.warning(f"Unknown pot {pot_name} in mode {mode_name}")
+            continue
+        if not pot_config:
+            continue
+
+        route = _compile_route(mode_name, pot_name, pot_config, clients, True)
+        if route:
+            table[index] = (route,)
+
+    for slot, (address, feedback_config) in enumerate(feedback.items()):
+        if not feedback_config:
+            continue
+        # Either a list of actions like a button or a single route like a pot
+        actions = (feedback_config['actions'] or []) if 'actions' in feedback_config else [feedback_config]
+        routes = []
+        for action in actions:
+            route = _compile_route(mode_name, address, action, clients, True)
+            if route:
+                routes.append(route)
+        if routes:
+            table[feedback_input_id(slot, devices)] = tuple(routes)
+
+    return table
+
+def _compile_route(mode_name, input_name, entry, clients, with_value):
+    target = entry.get('target')
+    if not target:
+        log.warning(f"No target defined for {input_name} in mode {mode_name}")
+        return None
+
+    command = entry.get('command')
+    if not command:
+        log.warning(f"No command defined for {input_name} in mode {mode_name}")
+        return None
+
+    client = clients.get(target)
+    if client is None:
+        log.warning(f"Unknown target {target} for {input_name} in mode {mode_name}")
+        return None
+
+    params = list(entry.get('params', []))
+    return (client.packet(command, params, with_value), command, params, target)
@@ -0,0 +1,498 @@
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Callable, Optional
+from config_loader import read_config, Config, ConfigError
+from control_routing import (compile_controls, input_name, pot_input_id, feedback_slots, feedback_input_id,
+                             NUM_DIRECT_BUTTONS, NUM_MATRIX_BUTTONS, NUM_POTS, NUM_INPUTS, MATRIX_OFFSET)
+from osc_packets import OSCTarget, OSCBatcher
+from pot_filter import build_pot_filters, build_feedback_filters
+from pot_curves import build_pot_curves, POT_STEPS
+from teensy_protocol import parse_text_line, EVENT_BUTTON, EVENT_MATRIX, EVENT_POT, EVENT_FEEDBACK
+from log_setup import EventLogger
+from mode_switcher import SWITCH_INPUT_POLICIES
+from input_devices import load_devices
+from latency_stats import LatencyStats
+from latency_probe import LatencyProbe
+from audio_features import build_feature_publisher
+
+log = logging.getLogger("controller")
+
+CONFIG_PATH = 'config.yml'
+
+def load_config(path: str = CONFIG_PATH) -> dict:
+    """The validated config (from its sidecar cache when unchanged, see config_loader.py)."""
+    try:
+        return read_config(path)
+    except ConfigError as e:
+        print(f"Invalid config file {path}:\n  " + "\n  ".join(e.problems))
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error loading config file: {e}")
+        sys.exit(1)
+
+class ControllerCore(ABC):
+    """Config-driven input handling shared by the controllers.
+
+    Holds the current mode, its compiled routing table, pot filters and curves, and
+    turns decoded input events (see teensy_protocol.py) into OSC packets.
+    How events arrive, how engines are started and when timers run is up to
+    the controller: MainController (main-control.py) uses a reader thread and
+    a blocking queue, AsyncController (async_controller.py) an asyncio loop.
+    Subclasses implement ``start_mode_switch``.
+
+    ``transport`` replaces the targets' own sockets for sending, e.g. an
+    ``asyncio.DatagramTransport``.
+
+    Input can come from several controllers (``system.devices``, see
+    input_devices.py); each has its own block of routing table slots and pot
+    filters, selected by the device index on its events.
+
+    OSC the engines send to the controller port is routed the same way when
+    the mode lists its address under `controls.feedback`: the controllers
+    register ``feedback_handler`` on their listener and hand the resulting
+    EVENT_FEEDBACK events to ``dispatch_event`` like input, so engine to
+    engine traffic can be fanned out, filtered and rate limited.
+
+    With ``system.latency_stats`` on, ``stats`` is a LatencyStats, the
+    engine targets' sends are timed and the controllers dispatch through
+    ``stats.event_dispatcher``. With
+    ``system.latency_probe`` on, ``probe`` pings the engines from
+    ``service_timers``; the controllers attach it to their listener.
+
+    A mode with an `analysis` block gets an ``analysis`` FeaturePublisher
+    (audio_features.py) that ``service_timers`` polls like the probe. It
+    runs until the mode is left, recompiling the controls keeps it.
+    """
+
+    def __init__(self, config: dict, transport=None):
+        self.config = config
+        self.settings = Config.from_dict(config)
+        self.devices = load_devices(self.config)
+        self.device_ids = [device.device_id for device in self.devices]
+        stats_settings = self.config['system'].get('latency_stats') or {}
+        self.stats = LatencyStats(stats_settings) if stats_settings.get('enabled') else None
+        probe_settings = self.config['system'].get('latency_probe') or {}
+        self.probe = LatencyProbe(probe_settings) if probe_settings.get('enabled') else None
+        log_settings = self.config['system'].get('logging') or {}
+        self.events = EventLogger(log_settings.get('sample_every', 1), NUM_INPUTS * max(1, len(self.devices)))
+
+        # Initialize state
+        self.running = True
+        self.pot_values = [0, 0, 0]
+        self.direct_button_states = [0] * NUM_DIRECT_BUTTONS
+        self.matrix_button_states = [0] * NUM_MATRIX_BUTTONS
+        self.pool = None  # Set by controllers that run an engine pool
+        self.analysis = None
+
+        # Mode management
+        self.available_modes = list(self.config['modes'].keys())
+        if not self.available_modes:
+            log.critical("No modes found in configuration file!")
+            sys.exit(1)
+
+        self.current_mode = self.config['system']['defaults']['initial_mode']
+        if self.current_mode not in self.available_modes:
+            log.warning(f"Initial mode '{self.current_mode}' not found in configuration")
+            self.current_mode = self.available_modes[0]
+            log.warning(f"Using '{self.current_mode}' as fallback initial mode")
+
+        self.current_mode_index = self.available_modes.index(self.current_mode)
+        self.mode_config = self.config['modes'][self.current_mode]
+        log.info(f"Available modes: {', '.join(self.available_modes)}")
+        log.info(f"Starting in mode: {self.current_mode}")
+
+        # Optional per-tick bundling of outgoing OSC
+        batching = self.config['system'].get('osc_batching') or {}
+        self.batcher = None
+        if batching.get('enabled'):
+            self.batcher = OSCBatcher(
+                batching.get('tick_ms', 5) / 1000,
+                batching.get('latency_ms', 0) / 1000
+            )
+            log.info(f"OSC batching enabled: {batching.get('tick_ms', 5)} ms tick")
+
+        # Initialize OSC clients
+        self.sc_client = OSCTarget(
+            "127.0.0.1",
+            self.settings.system.ports.supercollider,
+            self.batcher,
+            transport
+        )
+        self.processing_client = OSCTarget(
+            "127.0.0.1",
+            self.settings.system.ports.processing,
+            self.batcher,
+            transport
+        )
+        self.osc_clients = {
+            'supercollider': self.sc_client,
+            'processing': self.processing_client,
+        }
+        self.compile_mode()
+
+        self.mode_switch = None
+        self.switch_policy = self.config['system']['defaults'].get('switch_input_policy', 'queue')
+        if self.switch_policy not in SWITCH_INPUT_POLICIES:
+            log.warning(f"Unknown switch_input_policy '{self.switch_policy}', using queue")
+            self.switch_policy = 'queue'
+        self.switch_backlog = deque(maxlen=self.config['system']['defaults'].get('switch_queue_size', 256))
+        self.switch_discarded = 0
+
+    def compile_mode(self):
+        """Build the current mode's routing table, pot filters and curves for the current OSC clients."""
+        if self.stats:
+            # Packets bind their target's send function when they are encoded
+            for client in self.osc_clients.values():
+                self.stats.instrument_target(client)
+        self.routing_table = compile_controls(self.current_mode, self.mode_config, self.osc_clients, self.device_ids)
+        self.pot_filters = build_pot_filters(self.current_mode, self.mode_config, self.device_ids)
+        self.pot_curves = build_pot_curves(self.current_mode, self.mode_config, self.device_ids)
+        self.feedback_slots = feedback_slots(self.mode_config)
+        self.feedback_filters = build_feedback_filters(self.current_mode, self.mode_config)
+        if self.probe:
+            self.probe.set_targets(self.osc_clients)
+        if self.analysis is not None and self.analysis.clients is not self.osc_clients:
+            self.stop_analysis()
+        if self.analysis is None:
+            self.analysis = build_feature_publisher(self.current_mode, self.mode_config, self.osc_clients)
+
+    def stop_analysis(self):
+        """Stop the current mode's audio feature publisher, if it has one."""
+        if self.analysis is not None:
+            self.analysis.stop()
+            self.analysis = None
+
+    def reload_controls(self, config: dict):
+        """Take every mode's `controls` from a reloaded config, engines keep running.
+
+        The current mode's routing and filters are recompiled right away
+        (during a mode switch, finish_mode_switch compiles the new ones).
+        Other changes need a restart.
+        """
+        changed = []
+        for mode_name, mode_config in self.config['modes'].items():
+            new_mode = config['modes'].get(mode_name)
+            if new_mode is not None and new_mode.get('controls') != mode_config.get('controls'):
+                mode_config['controls'] = new_mode.get('controls')
+                changed.append(mode_name)
+        self.settings = Config.from_dict(self.config)
+
+        # Everything but the controls, compared as loaded
+        def without_controls(modes):
+            return {name: {key: value for key, value in mode.items() if key != 'controls'}
+                    for name, mode in modes.items()}
+        if config['system'] != self.config['system'] or without_controls(config['modes']) != without_controls(self.config['modes']):
+            log.warning("Config changes outside the modes' controls take effect after a restart")
+
+        if not changed:
+            return
+        log.info(f"Reloaded controls of {', '.join(changed)}")
+        if self.current_mode in changed and self.mode_switch is None:
+            self.report_pot_filters()
+            self.compile_mode()
+
+    @abstractmethod
+    def start_mode_switch(self, mode_name: str):
+        """Start the engines for a mode in the background and return the switch handle.
+
+        The handle needs ``mode_name`` and ``elapsed``; the controller calls
+        finish_mode_switch once it is done.
+        """
+
+    def switch_to_next_mode(self):
+        """Start switching to the next available mode in the configuration.
+
+        The engines restart in the background; finish_mode_switch activates
+        the new mode once both are up.
+        """
+        try:
+            if not self.available_modes:
+                log.error("No available modes found in configuration")
+                return False
+
+            if self.mode_switch is not None:
+                log.info(f"Already switching to {self.mode_switch.mode_name}, ignoring mode switch")
+                return False
+
+            self.current_mode_index = (self.current_mode_index + 1) % len(self.available_modes)
+            new_mode = self.available_modes[self.current_mode_index]
+
+            if new_mode not in self.config['modes']:
+                log.error(f"Mode {new_mode} not found in configuration")
+                return False
+
+            self.report_pot_filters()
+            self.stop_analysis()
+            self.pot_filters = [None] * len(self.pot_filters)
+            self.feedback_filters = [None] * len(self.feedback_filters)
+            log.info(f"Switching to mode: {new_mode}")
+
+            self.mode_switch = self.start_mode_switch(new_mode)
+            return True
+
+        except Exception as e:
+            log.exception(f"Error switching modes: {e}")
+            return False
+
+    def finish_mode_switch(self):
+        """Activate the new mode's routing and replay input held during the switch."""
+        switch = self.mode_switch
+        self.mode_switch = None
+
+        self.current_mode = switch.mode_name
+        self.mode_config = self.config['modes'][switch.mode_name]
+        if self.pool:
+            # Each pool slot listens on its own ports
+            self.osc_clients = self.pool.clients or self.osc_clients
+        self.compile_mode()
+        log.info(f"Mode switch to {self.current_mode} completed in {switch.elapsed:.2f} s")
+
+        if self.switch_discarded:
+            log.info(f"Discarded {self.switch_discarded} input events during the switch")
+            self.switch_discarded = 0
+        backlog = list(self.switch_backlog)
+        self.switch_backlog.clear()
+        if backlog:
+            log.info(f"Replaying {len(backlog)} input events held during the switch")
+        for event in backlog:
+            self.dispatch_event(*event)
+
+    def hold_event(self, kind: int, index: int, value: int, device: int = 0):
+        """Queue or discard an input event that arrives while a mode switch is running."""
+        if kind == EVENT_FEEDBACK:
+            return  # From the engines being replaced, meaningless in the new mode
+        if kind == EVENT_BUTTON and index == 2 and not device:
+            log.info("Mode switch already in progress, ignoring mode switch button")
+        elif self.switch_policy == 'queue':
+            if len(self.switch_backlog) == self.switch_backlog.maxlen:
+                self.switch_discarded += 1
+            self.switch_backlog.append((kind, index, value, device))
+        else:
+            self.switch_discarded += 1
+
+    def handle_button_action(self, input_id: int):
+        """Send the precompiled actions for a button."""
+        routes = self.routing_table[input_id]
+        log_event = self.events.enabled and self.events.sampled(input_id)
+        if routes is None:
+            if log_event:
+                self.events.debug("%s not configured in mode %s", input_name(input_id, self.device_ids), self.current_mode)
+            return
+
+        for packet, command, params, target in routes:
+            try:
+                packet.send()
+                if log_event:
+                    self.events.debug("%s -> %s %s %s", input_name(input_id, self.device_ids), target, command, params)
+            except Exception as e:
+                log.error(f"Error sending OSC message: {e}")
+
+    def handle_pot_control(self, pot_slot: int, raw_value: int):
+        """Send the precompiled control message for a pot, mapped through its curve's lookup table.
+
+        ``pot_slot`` is ``device * NUM_POTS + pot index``; readings outside
+        0-4095 are clamped.
+        """
+        input_id = pot_input_id(pot_slot)
+        routes = self.routing_table[input_id]
+        log_event = self.events.enabled and self.events.sampled(input_id)
+        if routes is None:
+            if log_event:
+                self.events.debug("%s not configured in mode %s", input_name(input_id, self.device_ids), self.current_mode)
+            return
+
+        curve = self.pot_curves[pot_slot]
+        if 0 <= raw_value < POT_STEPS:
+            mapped_value = curve[raw_value]
+        else:
+            mapped_value = curve[0 if raw_value < 0 else POT_STEPS - 1]
+        for packet, command, params, target in routes:
+            try:
+                packet.send(mapped_value)
+                if log_event:
+                    self.events.debug("%s: %d -> %s %s %s", input_name(input_id, self.device_ids), raw_value,
+                                      target, command, params + [mapped_value])
+            except Exception as e:
+                log.error(f"Error sending OSC message: {e}")
+
+    def feedback_handler(self, deliver: Callable) -> Callable:
+        """A default handler for the listener's dispatcher that passes feedback events to ``deliver``.
+
+        Runs on the listener's thread (or loop); only addresses the current
+        mode routes are delivered, the rest are dropped right there.
+        """
+        def on_message(address, *args):
+            if address in self.feedback_slots:
+                deliver((EVENT_FEEDBACK, address, args))
+        return on_message
+
+    def handle_feedback(self, slot: int, args: tuple):
+        """Forward engine feedback along its routes.
+
+        A single float argument is patched into the pre-encoded packet, any
+        other arguments are appended to the route's params.
+        """
+        routes = self.routing_table[feedback_input_id(slot, self.device_ids)]
+        if routes is None:
+            return
+        single_float = len(args) == 1 and type(args[0]) is float
+        for packet, command, params, target in routes:
+            try:
+                if single_float:
+                    packet.send(args[0])
+                else:
+                    self.osc_clients[target].forward(command, params + list(args))
+                if self.events.enabled:
+                    self.events.debug("feedback -> %s %s %s", target, command, params + list(args))
+            except Exception as e:
+                log.error(f"Error sending OSC message: {e}")
+
+    def filter_feedback(self, slot: int, args: tuple):
+        """Pass single-value feedback through its filter stage, if it has one, before forwarding."""
+        feedback_filter = self.feedback_filters[slot]
+        if feedback_filter is None or len(args) != 1 or not isinstance(args[0], (int, float)):
+            self.handle_feedback(slot, args)
+            return
+
+        value = feedback_filter.push(args[0], time.perf_counter())
+        if value is not None:
+            self.handle_feedback(slot, (float(value),))
+
+    def filter_pot(self, pot_slot: int, raw_value: int):
+        """Pass a raw pot sample through the mode's filter stage before sending.
+
+        ``pot_slot`` is ``device * NUM_POTS + pot index``.
+        """
+        pot_filter = self.pot_filters[pot_slot]
+        if pot_filter is None:
+            self.handle_pot_control(pot_slot, raw_value)
+            return
+
+        value = pot_filter.push(raw_value, time.perf_counter())
+        if value is not None:
+            self.handle_pot_control(pot_slot, value)
+
+    def flush_pot_filters(self) -> Optional[float]:
+        """Send any rate-limited pot (and feedback) values that are due.
+
+        Returns the time the next held value becomes due, or None.
+        """
+        now = time.perf_counter()
+        next_due = None
+        for pot_slot, pot_filter in enumerate(self.pot_filters):
+            if pot_filter is None or pot_filter.pending is None:
+                continue
+            value = pot_filter.flush(now)
+            if value is not None:
+                self.handle_pot_control(pot_slot, value)
+            elif next_due is None or pot_filter.next_due < next_due:
+                next_due = pot_filter.next_due
+        for slot, feedback_filter in enumerate(self.feedback_filters):
+            if feedback_filter is None or feedback_filter.pending is None:
+                continue
+            value = feedback_filter.flush(now)
+            if value is not None:
+                self.handle_feedback(slot, (float(value),))
+            elif next_due is None or feedback_filter.next_due < next_due:
+                next_due = feedback_filter.next_due
+        return next_due
+
+    def service_timers(self) -> Optional[float]:
+        """Send due pot values, latency probe pings, audio features and OSC bundles.
+
+        Returns the ``time.perf_counter()`` value at which this should run
+        again, or None if nothing is waiting.
+        """
+        next_due = self.flush_pot_filters()
+        # A failing probe or analysis must not hold back the bundle poll below
+        if self.probe and self.mode_switch is None:
+            try:
+                # Pings are batched like input, so they go out before the bundle poll
+                ping_due = self.probe.poll(time.perf_counter())
+                if next_due is None or ping_due < next_due:
+                    next_due = ping_due
+            except Exception as e:
+                log.error(f"Error sending latency probe pings: {e}")
+        if self.analysis and self.mode_switch is None:
+            try:
+                features_due = self.analysis.poll(time.perf_counter())
+                if next_due is None or features_due < next_due:
+                    next_due = features_due
+            except Exception as e:
+                log.error(f"Error sending audio features: {e}")
+        if self.batcher:
+            bundle_due = self.batcher.poll(time.perf_counter())
+            if bundle_due is not None and (next_due is None or bundle_due < next_due):
+                next_due = bundle_due
+        return next_due
+
+    def report_pot_filters(self):
+        """Log how many raw pot (and feedback) samples each filter dropped or merged."""
+        for pot_slot, pot_filter in enumerate(self.pot_filters):
+            if pot_filter is not None and pot_filter.received:
+                name = input_name(pot_input_id(pot_slot), self.device_ids)
+                log.info(f"{name} filter ({self.current_mode}): {pot_filter.summary()}")
+        for address, slot in self.feedback_slots.items():
+            feedback_filter = self.feedback_filters[slot]
+            if feedback_filter is not None and feedback_filter.received:
+                log.info(f"{address} filter ({self.current_mode}): {feedback_filter.summary()}")
+
+    def flush_output(self):
+        """Send whatever is still batched and report the filter, batching and probe counters."""
+        self.report_pot_filters()
+        if self.probe:
+            self.probe.stop()
+        self.stop_analysis()
+        if self.batcher:
+            try:
+                self.batcher.flush()
+            except Exception as e:
+                log.error(f"Error flushing OSC bundles: {e}")
+            log.info(f"OSC batching: {self.batcher.messages} messages in {self.batcher.bundles} bundles")
+
+    def parse_teensy_data(self, line: str):
+        """Parse one line of the Teensy text protocol and act on it."""
+        try:
+            event = parse_text_line(line.strip())
+            if event is not None:
+                self.dispatch_event(*event)
+        except Exception as e:
+            log.exception(f"Error processing data: {e}, line: {line}")
+
+    def dispatch_event(self, kind: int, index: int, value: int, device: int = 0):
+        """Act on one decoded input event (0-based index, see teensy_protocol.py).
+
+        ``device`` is the index of the controller it came from; the mode
+        switch button is btn3 of the first controller only.
+        """
+        if self.mode_switch is not None:
+            self.hold_event(kind, index, value, device)
+            return
+
+        # Direct buttons
+        if kind == EVENT_BUTTON:
+            if 0 <= index < NUM_DIRECT_BUTTONS:
+                # Check if it's our mode switch button (typically btn3 in old code)
+                if index == 2 and not device:  # btn3 was our mode switch button
+                    self.switch_to_next_mode()
+                else:
+                    self.handle_button_action(device * NUM_INPUTS + index)
+
+        # Matrix buttons
+        elif kind == EVENT_MATRIX:
+            if 0 <= index < NUM_MATRIX_BUTTONS:
+                self.handle_button_action(device * NUM_INPUTS + MATRIX_OFFSET + index)
+
+        # Potentiometers
+        elif kind == EVENT_POT:
+            if 0 <= index < NUM_POTS:
+                self.filter_pot(device * NUM_POTS + index, value)
+
+        # Engine feedback, index is the OSC address and value its arguments
+        elif kind == EVENT_FEEDBACK:
+            slot = self.feedback_slots.get(index)
+            if slot is not None:
+                self.filter_feedback(slot, value)
@@ -0,0 +1,352 @@
+import logging
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from mode_switcher import ModeSwitch, ModeSwitchOrchestrator
+from osc_packets import OSCTarget
+from processing_manager import ProcessingManager
+from supercollider_manager import SuperColliderManager
+
+try:
+    import psutil
+except ImportError:  # Only needed for the memory budget
+    psutil = None
+
+log = logging.getLogger(__name__)
+
+PRELOAD_POLICIES = ("next", "most_used")
+
+class EngineSlot:
+    """One mode's Processing sketch and SuperCollider script, running on the slot's own ports.
+
+    Slot N's sketch listens on ``processing_port_base + N``, its sclang on
+    ``supercollider_port_base + 2N`` and its scsynth one port above that.
+    The engines start in standby (hidden and muted) and are switched on and
+    off with /pace/activate and /pace/deactivate (see Modes/pace-slot.scd
+    and the PaceSlot.pde tab of each sketch).
+    """
+
+    def __init__(self, index: int, mode_name: str, config: dict, readiness,
+                 processing_port: int, supercollider_port: int, batcher=None, assets=None):
+        self.index = index
+        self.mode_name = mode_name
+        self.processing_port = processing_port
+        self.supercollider_port = supercollider_port
+
+        self.processing = ProcessingManager(config, readiness, assets)
+        self.processing.engine = f"processing-{index}"
+        self.processing.pooled = True
+        self.processing.sketch_args = [processing_port, supercollider_port, "standby"]
+
+        self.supercollider = SuperColliderManager(config, readiness, assets)
+        self.supercollider.engine = f"supercollider-{index}"
+        self.supercollider.pooled = True
+        self.supercollider.resident = False  # Each slot runs its own sclang
+        self.supercollider.script_args = [supercollider_port, supercollider_port + 1,
+                                          processing_port, self.supercollider.engine]
+
+        self.clients = {
+            'supercollider': OSCTarget("127.0.0.1", supercollider_port, batcher),
+            'processing': OSCTarget("127.0.0.1", processing_port, batcher),
+        }
+        # Resolved with {engine: started} once both engines are up (or failed)
+        self.ready: Future = Future()
+
+    def start(self, mode_config: dict, executor: ThreadPoolExecutor):
+        """Launch both engines in the background. They come up in standby."""
+        try:
+            orchestrator = ModeSwitchOrchestrator(self.processing, self.supercollider, executor)
+            startup = orchestrator.switch(self.mode_name, mode_config)
+            startup.done.add_done_callback(lambda f: self.ready.set_result(f.result()))
+        except Exception as e:
+            log.error(f"Error starting engines for {self.mode_name} in slot {self.index}: {e}")
+            self.ready.set_result({'processing': False, 'supercollider': False})
+
+    def healthy(self) -> bool:
+        """False once startup failed or an engine has exited since."""
+        if not self.ready.done():
+            return True  # Still warming up
+        if not all(self.ready.result().values()):
+            return False
+        for process in (self.processing.sketch_process, self.supercollider.sclang_process):
+            if process is not None and process.poll() is not None:
+                return False
+        return True
+
+    def activate(self):
+        self._send("/pace/activate")
+
+    def deactivate(self):
+        self._send("/pace/deactivate")
+
+    def _send(self, address: str):
+        # Straight to the socket, bypassing any OSC batching
+        for target, client in self.clients.items():
+            try:
+                client.send_message(address, None)
+            except OSError as e:
+                log.warning(f"Could not send {address} to {target} in slot {self.index}: {e}")
+
+    def memory(self) -> int:
+        """Resident memory of the slot's engines and their child processes in bytes."""
+        total = 0
+        for process in self._processes():
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _processes(self) -> list:
+        """psutil handles for the engine processes and everything they spawned (JVM, scsynth)."""
+        processes = []
+        if psutil is None:
+            return processes
+        for process in (self.processing.sketch_process, self.supercollider.sclang_process):
+            if process is None or process.poll() is not None:
+                continue
+            try:
+                parent = psutil.Process(process.pid)
+                processes.append(parent)
+                processes.extend(parent.children(recursive=True))
+            except psutil.Error:
+                pass
+        return processes
+
+    def stop(self):
+        """Stop both engines, including child processes the managers do not know about."""
+        children = self._processes()
+        self.processing.cleanup()
+        self.supercollider.cleanup()
+        for process in children:
+            try:
+                if process.is_running():
+                    process.terminate()
+            except psutil.Error:
+                pass
+
+class EnginePool:
+    """Keeps the engines of several modes running so a mode switch is an OSC message.
+
+    Drop-in replacement for ModeSwitchOrchestrator (``busy``, ``switch``,
+    ``shutdown``). Switching to a mode with a warm slot deactivates the
+    current slot and activates that one; a mode without a slot is started
+    from scratch. After every switch the pool preloads the modes most
+    likely to come next, within the ``max_modes`` process budget and the
+    optional ``max_memory_mb`` budget (needs psutil), evicting the least
+    recently used standby slots to make room. The controller must send to
+    the active slot's ``clients``.
+    """
+
+    def __init__(self, config: dict, settings: dict, readiness, batcher=None, assets=None):
+        self.config = config
+        self.readiness = readiness
+        self.batcher = batcher
+        self.assets = assets
+        self.modes = list(config['modes'].keys())
+
+        self.max_modes = max(1, settings.get('max_modes', 2))
+        self.preload_count = settings.get('preload_count', 1)
+        self.preload = settings.get('preload', 'next')
+        if self.preload not in PRELOAD_POLICIES:
+            log.warning(f"Unknown engine pool preload policy '{self.preload}', using next")
+            self.preload = 'next'
+        self.max_memory = settings.get('max_memory_mb', 0) * 1024 * 1024
+        if self.max_memory and psutil is None:
+            log.warning("engine_pool.max_memory_mb needs psutil, only max_modes applies")
+            self.max_memory = 0
+        self.processing_port_base = settings.get('processing_port_base', 12100)
+        self.supercollider_port_base = settings.get('supercollider_port_base', 57400)
+
+        # Two engine starts per slot, plus room for cold starts and preloading
+        self.executor = ThreadPoolExecutor(max_workers=2 * self.max_modes + 2, thread_name_prefix="engine-pool")
+        self.slots: "OrderedDict[str, EngineSlot]" = OrderedDict()  # Least recently used first
+        self.free = list(range(self.max_modes))
+        self.usage = Counter()
+        self.active: Optional[EngineSlot] = None
+        self.current: Optional[ModeSwitch] = None
+        self._lock = threading.Lock()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None and not self.current.done.done()
+
+    @property
+    def clients(self) -> Dict[str, OSCTarget]:
+        """OSC targets of the active slot."""
+        return self.active.clients if self.active else {}
+
+    def switch(self, mode_name: str, mode_config: dict) -> ModeSwitch:
+        """Switch to a mode, instantly if it has a warm slot. Returns the switch handle."""
+        if self.busy:
+            raise RuntimeError(f"Already switching to {self.current.mode_name}")
+
+        switch = ModeSwitch(mode_name)
+        self.current = switch
+        with self._lock:
+            slot = self.slots.get(mode_name)
+            if slot is not None and not slot.healthy():
+                # _new_slot replaces it in the same slot
+                log.warning(f"Standby engines for {mode_name} are not running, restarting them")
+                slot = None
+        if slot is None:
+            self.misses += 1
+            self._submit(self._cold_start, switch, mode_config)
+        else:
+            self.hits += 1
+            log.info(f"Activating standby engines for {mode_name}")
+            slot.ready.add_done_callback(lambda f: self._activate(switch, slot, f))
+        return switch
+
+    def _cold_start(self, switch: ModeSwitch, mode_config: dict):
+        try:
+            slot = self._new_slot(switch.mode_name, keep={switch.mode_name}, allow_active=True)
+            if slot is None:
+                raise RuntimeError("no free engine slot")
+            slot.ready.add_done_callback(lambda f: self._activate(switch, slot, f))
+            slot.start(mode_config, self.executor)
+        except Exception as e:
+            log.error(f"Error starting engines for mode {switch.mode_name}: {e}")
+            switch.finished = time.perf_counter()
+            switch.done.set_result({'processing': False, 'supercollider': False})
+
+    def _activate(self, switch: ModeSwitch, slot: EngineSlot, ready: Future):
+        results = ready.result()
+        with self._lock:
+            previous = self.active
+            if previous is not None and previous is not slot:
+                previous.deactivate()
+            slot.activate()
+            self.active = slot
+            if slot.mode_name in self.slots:
+                self.slots.move_to_end(slot.mode_name)
+            self.usage[slot.mode_name] += 1
+        switch.finished = time.perf_counter()
+        switch.done.set_result(results)
+        self._submit(self._refill)
+
+    def _submit(self, func, *args):
+        try:
+            self.executor.submit(func, *args)
+        except RuntimeError:
+            pass  # Shutting down, callbacks can still fire but their follow-up work is moot
+
+    def _plan(self) -> List[str]:
+        """Modes to keep warm besides the active one, most wanted first."""
+        if self.active is None or self.max_modes < 2:
+            return []
+        start = self.modes.index(self.active.mode_name)
+        upcoming = [self.modes[(start + i) % len(self.modes)] for i in range(1, len(self.modes))]
+        if self.preload == 'most_used':
+            # Stable sort, so modes used equally often keep the btn3 cycle order
+            upcoming.sort(key=lambda mode: -self.usage[mode])
+        return upcoming[:min(self.preload_count, self.max_modes - 1)]
+
+    def _refill(self):
+        """Preload the planned modes that have no slot yet."""
+        try:
+            wanted = self._plan()
+            for mode_name in wanted:
+                if mode_name in self.slots:
+                    continue
+                if self.max_memory and self.memory() >= self.max_memory:
+                    log.info(f"Engine pool memory budget reached, not preloading {mode_name}")
+                    break
+                slot = self._new_slot(mode_name, keep=set(wanted), allow_active=False)
+                if slot is None:
+                    break
+                log.info(f"Preloading engines for {mode_name} in slot {slot.index}")
+                slot.ready.add_done_callback(lambda f: self._submit(self._enforce_memory))
+                slot.start(self.config['modes'][mode_name], self.executor)
+        except Exception as e:
+            log.error(f"Error preloading engines: {e}")
+
+    def _new_slot(self, mode_name: str, keep: set, allow_active: bool) -> Optional[EngineSlot]:
+        """Create a slot for a mode, evicting the least recently used standby slot if the pool is full.
+
+        A dead slot of the same mode is replaced in place.
+        """
+        victim = None
+        with self._lock:
+            if mode_name in self.slots:
+                victim = self.slots[mode_name]
+                self._remove(victim)
+                index = victim.index
+            elif self.free:
+                index = self.free.pop(0)
+            else:
+                candidates = [slot for slot in self.slots.values()
+                              if slot.mode_name not in keep and slot is not self.active]
+                if not candidates and allow_active and self.active is not None:
+                    candidates = [self.active]  # max_modes 1: replace the active engines outright
+                if not candidates:
+                    return None
+                victim = candidates[0]
+                self._remove(victim)
+                index = victim.index
+            slot = EngineSlot(
+                index, mode_name, self.config, self.readiness,
+                self.processing_port_base + index,
+                self.supercollider_port_base + 2 * index,
+                self.batcher, self.assets
+            )
+            self.slots[mode_name] = slot
+        if victim is not None:
+            if victim.mode_name != mode_name:
+                self.evictions += 1
+                log.info(f"Evicting engines for {victim.mode_name} from slot {index}")
+            # Stop before the new slot starts, it reuses the same ports
+            victim.stop()
+        return slot
+
+    def _remove(self, slot: EngineSlot):
+        """Forget a slot (call with the lock held). The caller stops it and reuses or frees its index."""
+        del self.slots[slot.mode_name]
+        if slot is self.active:
+            self.active = None
+
+    def memory(self) -> int:
+        """Resident memory of all pooled engines in bytes (0 without psutil)."""
+        return sum(slot.memory() for slot in list(self.slots.values()))
+
+    def _enforce_memory(self):
+        """Evict least recently used standby slots while the pool is over its memory budget."""
+        if not self.max_memory:
+            return
+        while self.memory() > self.max_memory:
+            with self._lock:
+                # Never the active slot or one a running switch is waiting for
+                target = self.current.mode_name if self.busy else None
+                candidates = [slot for slot in self.slots.values()
+                              if slot is not self.active and slot.mode_name != target]
+                if not candidates:
+                    break
+                victim = candidates[0]
+                self._remove(victim)
+            self.evictions += 1
+            log.info(f"Engine pool over {self.max_memory // (1024 * 1024)} MB, evicting {victim.mode_name}")
+            victim.stop()
+            with self._lock:
+                self.free.append(victim.index)
+
+    def summary(self) -> str:
+        return (f"{self.hits} warm switches, {self.misses} cold starts, {self.evictions} evictions, "
+                f"{len(self.slots)}/{self.max_modes} slots in use")
+
+    def shutdown(self):
+        """Stop every pooled engine and the worker threads."""
+        with self._lock:
+            slots = list(self.slots.values())
+            self.slots.clear()
+            self.active = None
+        for slot in slots:
+            slot.stop()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,269 @@
+import logging
+import os
+import threading
+import time
+from typing import Iterator, List, Optional
+import serial
+import serial.tools.list_ports
+from serial_reader import SerialReader
+from teensy_protocol import make_decoder
+from input_replay import InputRecorder, RECORDING_EXTENSION
+
+log = logging.getLogger("controller")
+
+def match_usb_port(usb_id: str, ports) -> Optional[str]:
+    """The first of ``ports`` (``list_ports`` entries) whose USB ids match "VID:PID[:SERIAL]"."""
+    try:
+        vid, pid, *serial_number = usb_id.split(':', 2)
+        vid, pid = int(vid, 16), int(pid, 16)
+    except ValueError:
+        log.warning(f"Invalid usb_id '{usb_id}', expected VID:PID[:SERIAL] in hex")
+        return None
+    for port in ports:
+        if port.vid == vid and port.pid == pid and (not serial_number or port.serial_number == serial_number[0]):
+            return port.device
+    return None
+
+class InputDevice:
+    """One hardware controller on its own serial port.
+
+    ``index`` is the device's position in ``system.devices``; it selects the
+    device's block of input IDs in the routing table (see control_routing.py)
+    and is appended to every event the device produces after the first, so
+    the first (or only) device keeps the plain ``(kind, index, value)``
+    events.
+
+    With ``reconnect`` on, a device that disconnects (USB glitch, Teensy
+    reset) or is not plugged in yet is waited for with exponential backoff
+    between ``reconnect_delay`` and ``reconnect_max_delay`` seconds, on its
+    configured port or, failing that, on any port matching ``usb_id``.
+    ``reconnects`` and ``downtime`` count the outages.
+
+    With a ``record_dir`` the raw input is recorded there for replay (see
+    input_replay.py), one file per run and device.
+    """
+
+    def __init__(self, device_id: str, index: int, port: str, baud_rate: int, protocol: str,
+                 usb_id: Optional[str] = None, reconnect: bool = True,
+                 reconnect_delay: float = 0.1, reconnect_max_delay: float = 2.0,
+                 record_dir: Optional[str] = None):
+        self.device_id = device_id
+        self.index = index
+        self.port = port
+        self.baud_rate = baud_rate
+        self.protocol = protocol
+        self.usb_id = usb_id
+        self.reconnect = reconnect
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = max(reconnect_delay, reconnect_max_delay)
+        self.serial: Optional[serial.Serial] = None
+        self.reader: Optional[SerialReader] = None
+        self.reconnects = 0
+        self.downtime = 0.0
+        self.record_dir = record_dir
+        self.recorder: Optional[InputRecorder] = None
+        self._closed = threading.Event()
+
+    def start_recording(self) -> Optional[InputRecorder]:
+        """The device's recorder, created on first use if recording is on."""
+        if self.recorder is None and self.record_dir:
+            try:
+                os.makedirs(self.record_dir, exist_ok=True)
+                path = os.path.join(self.record_dir, f"{self.device_id}-{time.strftime('%Y%m%d-%H%M%S')}"
+                                                     f"{RECORDING_EXTENSION}")
+                self.recorder = InputRecorder(path, self.protocol)
+                log.info(f"Recording {self.device_id} input to {path}")
+            except OSError as e:
+                log.error(f"Cannot record {self.device_id} input: {e}")
+                self.record_dir = None
+        return self.recorder
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def resolve_port(self) -> Optional[str]:
+        """The configured port if it is present, else a port matching ``usb_id``, else None."""
+        ports = serial.tools.list_ports.comports()
+        if self.port in (p.device for p in ports) or os.path.exists(self.port):
+            return self.port
+        if self.usb_id:
+            return match_usb_port(self.usb_id, ports)
+        return None
+
+    def retry_delays(self) -> Iterator[float]:
+        """Seconds to wait before each reconnect attempt, doubling up to the maximum."""
+        delay = self.reconnect_delay
+        while True:
+            yield delay
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    def connect(self, port: str) -> serial.Serial:
+        connection = serial.Serial(port, self.baud_rate, timeout=1)
+        # Teensy USB serial does not reset on open, just drop any partial line
+        connection.reset_input_buffer()
+        return connection
+
+    def open(self, event_queue, stats=None) -> bool:
+        """Open the port and start its reader thread feeding ``event_queue``.
+
+        With ``reconnect`` on the reader is started even if the port cannot
+        be opened yet, and picks the device up once it appears. With
+        ``stats`` (a LatencyStats) the reader times its decoding.
+        """
+        self._closed.clear()
+        try:
+            log.info(f"Connecting to {self.device_id} on {self.port} at {self.baud_rate} baud...")
+            self.serial = self.connect(self.port)
+            log.info(f"Successfully connected to {self.device_id} ({self.protocol} protocol)")
+        except serial.SerialException as e:
+            self.serial = None
+            if not self.reconnect:
+                log.error(f"Error connecting to {self.device_id}: {e}")
+                return False
+            log.warning(f"Could not open {self.device_id} ({e}), waiting for it to be plugged in...")
+        self.reader = SerialReader(self.serial, event_queue, make_decoder(self.protocol), self.index,
+                                   self.device_id, self.reopen if self.reconnect else None,
+                                   self.start_recording(), stats.histogram('decode') if stats else None)
+        self.reader.start()
+        return True
+
+    def reopen(self) -> Optional[serial.Serial]:
+        """Wait for the device to come back and open it again (runs on the reader thread).
+
+        Returns the new connection, or None once the device is closed.
+        """
+        lost = time.perf_counter()
+        if self.serial is not None:
+            log.warning(f"Lost {self.device_id}, reconnecting...")
+            try:
+                self.serial.close()
+            except Exception:
+                pass
+            self.serial = None
+
+        attempts = 0
+        for delay in self.retry_delays():
+            if self._closed.wait(delay):
+                return None
+            attempts += 1
+            port = self.resolve_port()
+            if port is None:
+                continue
+            try:
+                connection = self.connect(port)
+            except (serial.SerialException, OSError) as e:
+                log.debug(f"Reconnect to {self.device_id} on {port} failed: {e}")
+                continue
+            if self._closed.is_set():
+                connection.close()
+                return None
+            self.serial = connection
+            self.reconnected(port, attempts, lost)
+            return connection
+
+    def reconnected(self, port: str, attempts: int, lost: float):
+        """Count an outage that ended with the port reopened (``lost`` is its perf_counter start)."""
+        elapsed = time.perf_counter() - lost
+        self.reconnects += 1
+        self.downtime += elapsed
+        log.info(f"Reconnected to {self.device_id} on {port} after {elapsed:.2f} s ({attempts} attempts)")
+
+    def summary(self) -> str:
+        return f"{self.reconnects} reconnects, {self.downtime:.2f} s without input"
+
+    def close(self):
+        """Stop the reader before closing the port it is blocked on."""
+        self._closed.set()
+        if self.reconnects:
+            log.info(f"{self.device_id}: {self.summary()}")
+        if self.reader:
+            self.reader.stop()
+            self.reader = None
+        self.stop_recording()
+        if self.serial:
+            try:
+                if self.serial.is_open:
+                    self.serial.close()
+                    log.info(f"Closed serial connection to {self.device_id}")
+            except Exception as e:
+                log.error(f"Error closing serial connection to {self.device_id}: {e}")
+            self.serial = None
+
+def load_devices(config: dict) -> List[InputDevice]:
+    """The controllers listed in ``system.devices``, else the one Teensy on ``system.ports.teensy``.
+
+    Entries take ``id`` and ``port``, and optionally ``baud_rate``,
+    ``protocol`` (defaulting to ``system.defaults``) and ``usb_id``. The
+    default ``usb_id`` only applies to the single Teensy, since several
+    controllers of the same kind share their VID:PID.
+    """
+    defaults = config['system']['defaults']
+    baud_rate = defaults['baud_rate']
+    protocol = defaults.get('protocol', 'text')
+    recording = config['system'].get('recording') or {}
+    settings = {
+        'reconnect': defaults.get('reconnect', True),
+        'reconnect_delay': defaults.get('reconnect_delay', 0.1),
+        'reconnect_max_delay': defaults.get('reconnect_max_delay', 2.0),
+        'record_dir': recording.get('dir', 'recordings') if recording.get('enabled') else None,
+    }
+    entries = config['system'].get('devices')
+    if not entries:
+        return [InputDevice('teensy', 0, config['system']['ports']['teensy'], baud_rate, protocol,
+                            defaults.get('usb_id'), **settings)]
+
+    devices = []
+    for entry in entries:
+        device_id = str(entry.get('id') or f"device{len(devices) + 1}")
+        if '/' in device_id or any(device.device_id == device_id for device in devices):
+            log.warning(f"Invalid or duplicate device id '{device_id}', device skipped")
+            continue
+        if not entry.get('port'):
+            log.warning(f"No port defined for device {device_id}, device skipped")
+            continue
+        devices.append(InputDevice(
+            device_id, len(devices), str(entry['port']),
+            entry.get('baud_rate', baud_rate), entry.get('protocol', protocol),
+            entry.get('usb_id'), **settings
+        ))
+    return devices
+
+def find_ports(devices: List[InputDevice]) -> List[InputDevice]:
+    """The devices whose port is present, plus those waiting to be plugged in.
+
+    A port counts as present if the system lists it or its path exists (for
+    /dev/serial/by-id links and pseudo-terminals). A device on another port
+    is found by its ``usb_id``; a single device that is not found either
+    way falls back to the first serial port found, as the controller always
+    has. Missing devices with ``reconnect`` on are kept, their readers wait
+    for them.
+    """
+    ports = serial.tools.list_ports.comports()
+    available_ports = [p.device for p in ports]
+    log.info(f"Available serial ports: {', '.join(available_ports)}")
+
+    found = []
+    for device in devices:
+        usb_port = device.usb_id and match_usb_port(device.usb_id, ports)
+        if device.port in available_ports or os.path.exists(device.port):
+            found.append(device)
+        elif usb_port:
+            log.info(f"Found {device.device_id} ({device.usb_id}) on {usb_port}")
+            device.port = usb_port
+            found.append(device)
+        elif len(devices) == 1 and available_ports:
+            log.warning(f"Configured port {device.port} not found in available ports"
+                        + (f" and no port matches {device.usb_id}." if device.usb_id else "."))
+            log.warning(f"Using first available port instead: {available_ports[0]}")
+            device.port = available_ports[0]
+            found.append(device)
+        elif device.reconnect:
+            log.warning(f"Port {device.port} for {device.device_id} not found, waiting for it")
+            found.append(device)
+        else:
+            log.warning(f"Port {device.port} for {device.device_id} not found. Will run without its input.")
+    if not found:
+        log.warning("No serial ports detected. Will run without hardware input.")
+    return found
@@ -0,0 +1,268 @@
+import argparse
+import logging
+import math
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+from teensy_protocol import (LineFramer, BinaryDecoder, encode_text_event, encode_binary_event,
+                             EVENT_BUTTON, EVENT_MATRIX, EVENT_POT, PROTOCOLS)
+
+log = logging.getLogger(__name__)
+
+# Recording file: MAGIC, one protocol byte (index into PROTOCOLS), then one
+# record per serial read: CHUNK (microseconds since the previous read, byte
+# count) followed by the bytes exactly as they came off the port. Gaps longer
+# than a CHUNK delta can hold are written as empty records.
+MAGIC = b"PACEREC1"
+CHUNK = struct.Struct('<IH')
+MAX_DELTA_US = 0xFFFFFFFF
+MAX_CHUNK = 0xFFFF
+
+RECORDING_EXTENSION = ".pacerec"
+
+Stream = List[Tuple[float, bytes]]  # (seconds from the start, raw bytes)
+
+class InputRecorder:
+    """Writes the raw serial byte stream of one controller to a recording file.
+
+    ``write`` is called from the reader thread with the ``time.perf_counter()``
+    timestamp of each read. The file is buffered, so a record costs a few
+    memory copies on the hot path; it is flushed on ``close``.
+    """
+
+    def __init__(self, path: str, protocol: str = "text"):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(MAGIC + bytes([PROTOCOLS.index(protocol) if protocol in PROTOCOLS else 0]))
+        self.last = None
+        self.chunks = 0
+        self._lock = threading.Lock()
+
+    def write(self, timestamp: float, data: bytes):
+        with self._lock:
+            if self.file is None:
+                return
+            delta = 0 if self.last is None else int((timestamp - self.last) * 1e6)
+            self.last = timestamp
+            while delta > MAX_DELTA_US:
+                self.file.write(CHUNK.pack(MAX_DELTA_US, 0))
+                delta -= MAX_DELTA_US
+            for start in range(0, len(data), MAX_CHUNK):
+                part = data[start:start + MAX_CHUNK]
+                self.file.write(CHUNK.pack(delta, len(part)))
+                self.file.write(part)
+                delta = 0
+            self.chunks += 1
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+                log.info(f"Recorded {self.chunks} serial reads to {self.path}")
+
+def load_recording(path: str) -> Tuple[str, Stream]:
+    """Read a recording into ``(protocol, stream)``.
+
+    Also reads the older text format of ``<seconds> <line>`` pairs (see
+    bench_serial_ingest.py), which is always the text protocol.
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        stream = []
+        for raw in data.decode(errors="replace").splitlines():
+            raw = raw.strip()
+            if raw:
+                offset, line = raw.split(" ", 1)
+                stream.append((float(offset), (line + "\n").encode()))
+        return "text", stream
+
+    protocol = PROTOCOLS[data[len(MAGIC)]]
+    stream = []
+    pos = len(MAGIC) + 1
+    offset_us = 0
+    while pos + CHUNK.size <= len(data):
+        delta, length = CHUNK.unpack_from(data, pos)
+        pos += CHUNK.size
+        offset_us += delta
+        if length:
+            stream.append((offset_us / 1e6, data[pos:pos + length]))
+            pos += length
+    return protocol, stream
+
+def save_recording(path: str, stream: Stream, protocol: str = "text"):
+    """Write a stream (e.g. a synthetic one) as a recording file."""
+    recorder = InputRecorder(path, protocol)
+    for offset, data in stream:
+        recorder.write(offset, data)
+    recorder.close()
+
+def encoder_for(protocol: str) -> Callable:
+    return encode_binary_event if protocol == "binary" else encode_text_event
+
+def pot_sweep(rate: float, seconds: float, pots: Sequence[int] = (0, 1, 2), period: float = 2.0,
+              protocol: str = "text") -> Stream:
+    """Pots sweeping up and down (triangle waves, offset per pot), ``rate`` readings per second in total."""
+    encode = encoder_for(protocol)
+    stream = []
+    for i in range(int(rate * seconds)):
+        offset = i / rate
+        pot = pots[i % len(pots)]
+        phase = (offset / period + pot / len(pots)) % 1.0
+        value = int(4095 * (1 - abs(2 * phase - 1)))
+        stream.append((offset, encode(EVENT_POT, pot, value)))
+    return stream
+
+def button_storm(rate: float, seconds: float, burst: int = 8, seed: int = 0,
+                 buttons: Sequence[int] = (0, 1, 3, 4, 5, 6), matrix: Sequence[int] = tuple(range(16)),
+                 protocol: str = "text") -> Stream:
+    """Bursts of ``burst`` random presses, ``rate`` presses per second on average.
+
+    Each burst arrives in one chunk, like presses the Teensy flushes in one
+    USB packet. btn3 (index 2, the mode switch) is left out by default.
+    """
+    encode = encoder_for(protocol)
+    rng = random.Random(seed)
+    stream = []
+    for i in range(int(rate * seconds / burst)):
+        presses = []
+        for _ in range(burst):
+            if rng.random() < len(buttons) / (len(buttons) + len(matrix)):
+                presses.append(encode(EVENT_BUTTON, rng.choice(buttons)))
+            else:
+                presses.append(encode(EVENT_MATRIX, rng.choice(matrix)))
+        stream.append((i * burst / rate, b"".join(presses)))
+    return stream
+
+def merge(*streams: Stream) -> Stream:
+    """Interleave streams by time."""
+    return sorted((item for stream in streams for item in stream), key=lambda item: item[0])
+
+def play(stream: Stream, sink: Callable[[bytes], None], speed: float = 1.0,
+         stop: Optional[threading.Event] = None, on_write: Optional[Callable[[int, float], None]] = None) -> float:
+    """Feed a stream to ``sink`` at ``speed`` times real time (0: as fast as possible).
+
+    ``on_write(i, timestamp)`` is called right before chunk ``i`` is
+    written. Returns the seconds the playback took.
+    """
+    start = time.perf_counter()
+    for i, (offset, data) in enumerate(stream):
+        if stop is not None and stop.is_set():
+            break
+        if speed > 0:
+            delay = start + offset / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if on_write is not None:
+            on_write(i, time.perf_counter())
+        sink(data)
+    return time.perf_counter() - start
+
+def controller_sink(controller, protocol: str = "text") -> Callable[[bytes], None]:
+    """A sink that hands the bytes to a controller like its serial reader would.
+
+    Text lines go through ``parse_teensy_data``, binary frames are decoded
+    and passed to ``dispatch_event``.
+    """
+    if protocol == "binary":
+        decoder = BinaryDecoder()
+
+        def sink(data: bytes):
+            for event in decoder.feed(data):
+                controller.dispatch_event(*event)
+        return sink
+
+    framer = LineFramer()
+
+    def sink(data: bytes):
+        for line in framer.feed(data):
+            controller.parse_teensy_data(line.decode(errors="replace"))
+    return sink
+
+def fd_sink(fd: int) -> Callable[[bytes], None]:
+    """A sink that writes to a file descriptor, e.g. the master side of a pty."""
+    def sink(data: bytes):
+        os.write(fd, data)
+    return sink
+
+def count_events(stream: Stream, protocol: str = "text") -> List[int]:
+    """Number of complete input events in each chunk of a stream."""
+    if protocol == "binary":
+        decoder = BinaryDecoder()
+        return [len(decoder.feed(data)) for _, data in stream]
+    framer = LineFramer()
+    return [len(framer.feed(data)) for _, data in stream]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate, inspect and play back controller input recordings")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="Write a synthetic recording")
+    generate.add_argument("output")
+    generate.add_argument("--seconds", type=float, default=10)
+    generate.add_argument("--pot-rate", type=float, default=300, help="Pot readings per second")
+    generate.add_argument("--button-rate", type=float, default=20, help="Button presses per second")
+    generate.add_argument("--burst", type=int, default=4, help="Presses per chunk")
+    generate.add_argument("--protocol", choices=PROTOCOLS, default="text")
+    generate.add_argument("--seed", type=int, default=0)
+
+    info = commands.add_parser("info", help="Summarize a recording")
+    info.add_argument("recording")
+
+    playback = commands.add_parser("play", help="Play a recording into a serial port or a new pty")
+    playback.add_argument("recording")
+    target = playback.add_mutually_exclusive_group(required=True)
+    target.add_argument("--port", help="Serial port to write to")
+    target.add_argument("--pty", action="store_true", help="Create a pty and print its path (use it as ports.teensy)")
+    playback.add_argument("--speed", type=float, default=1.0, help="Playback speed, 0 for as fast as possible")
+    playback.add_argument("--loop", action="store_true", help="Play again from the start until interrupted")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "generate":
+        stream = merge(
+            pot_sweep(args.pot_rate, args.seconds, protocol=args.protocol),
+            button_storm(args.button_rate, args.seconds, args.burst, args.seed, protocol=args.protocol),
+        )
+        save_recording(args.output, stream, args.protocol)
+        return
+
+    protocol, stream = load_recording(args.recording)
+    if not stream:
+        print("Empty recording")
+        sys.exit(1)
+    events = sum(count_events(stream, protocol))
+    duration = stream[-1][0]
+    print(f"{args.recording}: {protocol} protocol, {len(stream)} reads, {events} events, "
+          f"{sum(len(data) for _, data in stream)} bytes over {duration:.2f} s "
+          f"({events / duration if duration else math.inf:.0f} events/s)")
+    if args.command == "info":
+        return
+
+    if args.pty:
+        import tty
+        fd, slave = os.openpty()
+        tty.setraw(slave)
+        print(f"Playing on {os.ttyname(slave)}, press Ctrl+C to stop")
+        input("Start the controller on that port, then press Enter...")
+        sink = fd_sink(fd)
+    else:
+        import serial
+        port = serial.Serial(args.port, 115200)
+        sink = port.write
+    try:
+        while True:
+            elapsed = play(stream, sink, args.speed)
+            print(f"Played {len(stream)} reads in {elapsed:.2f} s")
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import logging
+import time
+from typing import Dict, Optional
+from latency_stats import LatencyHistogram, summarize
+
+log = logging.getLogger(__name__)
+
+PING_ADDRESS = "/pace/ping"
+PONG_ADDRESS = "/pace/pong"
+
+# Pings carry their sequence number in a float32 value slot (see OSCPacket),
+# which holds integers exactly up to 2^24; the ring of send times divides that.
+SEQ_LIMIT = 1 << 24
+RING = 1 << 12
+
+class ProbeTarget:
+    """Send times and counters of the pings to one engine.
+
+    The controller's main loop writes the send times, the listener thread
+    marks the answered ones and records their round trip.
+    """
+
+    __slots__ = ('engine', 'packet', 'sent_at', 'seqs', 'answered', 'seq', 'oldest',
+                 'sent', 'received', 'lost', 'late', 'histogram')
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.packet = None
+        self.sent_at = [0.0] * RING
+        self.seqs = [-1] * RING
+        self.answered = bytearray(RING)
+        self.seq = 0     # Next ping to send
+        self.oldest = 0  # Oldest ping still waiting for its pong
+        self.sent = 0
+        self.received = 0
+        self.lost = 0
+        self.late = 0
+        self.histogram = LatencyHistogram()
+
+    def ping(self, now: float):
+        if self.seq - self.oldest >= RING:
+            self.expire_one()
+        slot = self.seq % RING
+        self.sent_at[slot] = now
+        self.seqs[slot] = self.seq
+        self.answered[slot] = 0
+        self.packet.send(self.seq % SEQ_LIMIT)
+        self.seq += 1
+        self.sent += 1
+
+    def expire_one(self):
+        if not self.answered[self.oldest % RING]:
+            self.lost += 1
+        self.oldest += 1
+
+    def expire(self, deadline: float):
+        """Count pings sent before ``deadline`` and still unanswered as lost."""
+        while self.oldest < self.seq and self.sent_at[self.oldest % RING] < deadline:
+            self.expire_one()
+
+    def forget(self):
+        """Drop the pings in flight without counting them, e.g. after the engine restarted."""
+        self.oldest = self.seq
+
+    def pong(self, wire_seq: int, now: float, timeout: float):
+        slot = wire_seq % RING
+        if self.seqs[slot] % SEQ_LIMIT != wire_seq or self.answered[slot]:
+            return  # Unknown, forgotten or duplicate
+        rtt = now - self.sent_at[slot]
+        if rtt > timeout:
+            self.late += 1  # Counted as lost
+            return
+        self.answered[slot] = 1
+        self.received += 1
+        self.histogram.record(rtt)
+
+class LatencyProbe:
+    """Round-trip probe to the engines (``system.latency_probe``).
+
+    Every ``interval_ms`` the controller sends ``/pace/ping <engine> <seq>``
+    to each engine through the same OSC targets, batching and sockets as its
+    input traffic, and the engine answers ``/pace/pong`` with the same
+    arguments on the controller port (PaceSlot.pde, pace-slot.scd). The send
+    times stay here, keyed by sequence number. Pings without a pong within
+    ``timeout_ms`` count as lost.
+
+    ``poll`` runs from the controller's timer servicing, the pong handler
+    on whatever thread serves the ControllerListener.
+    """
+
+    def __init__(self, settings: dict):
+        self.interval = settings.get('interval_ms', 100) / 1000
+        self.timeout = settings.get('timeout_ms', 1000) / 1000
+        self.summary_seconds = settings.get('summary_seconds', 10)
+        self.targets: Dict[str, ProbeTarget] = {}
+        self.next_ping = time.perf_counter()
+        self.next_report = self.next_ping + self.summary_seconds if self.summary_seconds else None
+        log.info(f"Latency probe enabled: /pace/ping every {self.interval * 1000:g} ms")
+
+    def attach(self, dispatcher):
+        """Register the `/pace/pong` handler on a ControllerListener dispatcher."""
+        dispatcher.map(PONG_ADDRESS, self._on_pong)
+
+    def _on_pong(self, address, *args):
+        now = time.perf_counter()
+        if len(args) < 2:
+            return
+        target = self.targets.get(str(args[0]))
+        if target is not None:
+            target.pong(int(args[1]), now, self.timeout)
+
+    def set_targets(self, clients: dict):
+        """Ping the engines behind these OSC clients (called whenever the controller's clients change).
+
+        Pings still in flight are forgotten, the engines may have restarted.
+        """
+        for engine, client in clients.items():
+            target = self.targets.get(engine)
+            if target is None:
+                target = self.targets[engine] = ProbeTarget(engine)
+            target.forget()
+            target.packet = client.packet(PING_ADDRESS, (engine,), with_value=True)
+
+    def expire(self, now: float):
+        deadline = now - self.timeout
+        for target in self.targets.values():
+            target.expire(deadline)
+
+    def poll(self, now: float) -> float:
+        """Send the pings that are due and log the summary if it is time.
+
+        Returns the time this should run again.
+        """
+        if now >= self.next_ping:
+            for target in self.targets.values():
+                target.ping(now)
+            self.next_ping += self.interval
+            if self.next_ping < now:
+                self.next_ping = now + self.interval
+            self.expire(now)
+        if self.next_report is not None and now >= self.next_report:
+            self.report()
+            self.next_report = now + self.summary_seconds
+        if self.next_report is not None and self.next_report < self.next_ping:
+            return self.next_report
+        return self.next_ping
+
+    def snapshot(self) -> dict:
+        """Counters and RTT percentiles (us) per engine."""
+        result = {}
+        for engine, target in self.targets.items():
+            entry = {'sent': target.sent, 'received': target.received, 'lost': target.lost, 'late': target.late,
+                     'in_flight': target.seq - target.oldest}
+            answered_or_lost = target.received + target.lost
+            entry['loss_percent'] = round(target.lost / answered_or_lost * 100, 2) if answered_or_lost else 0.0
+            entry['rtt_us'] = summarize([target.histogram])
+            result[engine] = entry
+        return result
+
+    def report(self):
+        """Log one line per engine."""
+        for engine, s in self.snapshot().items():
+            line = f"RTT {engine:>13}: {s['sent']} pings, {s['lost']} lost ({s['loss_percent']:.1f}%)"
+            rtt = s['rtt_us']
+            if rtt:
+                line += (f", p50 {rtt['p50'] / 1000:.2f} ms  p90 {rtt['p90'] / 1000:.2f} ms  "
+                         f"p99 {rtt['p99'] / 1000:.2f} ms  max {rtt['max'] / 1000:.2f} ms")
+            log.info(line)
+
+    def stop(self, now: Optional[float] = None):
+        """Count the pings that timed out and log the final numbers."""
+        self.expire(time.perf_counter() if now is None else now)
+        self.report()
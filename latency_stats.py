@@ -0,0 +1,218 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Log-linear buckets in microseconds, like HDR histograms: values below
+# 2 * SUB_BUCKETS get a bucket each, above that every power of two is split
+# into SUB_BUCKETS buckets, so a bucket is at most 1/SUB_BUCKETS (6%) wide.
+SUB_BITS = 4
+SUB_BUCKETS = 1 << SUB_BITS
+MAX_SHIFT = 30  # Up to ~10^10 us, larger values land in the last bucket
+NUM_BUCKETS = (MAX_SHIFT + 2) * SUB_BUCKETS
+
+# Stages of an input event, in pipeline order. Lines are framed and parsed
+# in the reader as soon as they are read, so both are timed as one decode
+# per read. Routing is not timed on its own, it is part of dispatch: with
+# OSC batching on, sends wait for the next flush and dispatch is routing and
+# filtering alone, without it dispatch also includes the sends.
+STAGES = ("decode", "queue", "dispatch", "send", "total")
+STAGE_NOTES = {
+    'decode': "framing and parsing one serial read, reader thread",
+    'queue': "serial read -> main loop",
+    'dispatch': "routing, filtering and sending one event (no sends when batching)",
+    'send': "per datagram",
+    'total': "serial read -> last datagram sent",
+}
+
+def bucket_index(us: int) -> int:
+    shift = us.bit_length() - SUB_BITS - 1
+    if shift <= 0:
+        return us
+    if shift > MAX_SHIFT:
+        return NUM_BUCKETS - 1
+    return shift * SUB_BUCKETS + (us >> shift)
+
+def bucket_value(index: int) -> int:
+    """Highest value (us) that lands in a bucket."""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS + 1) << shift) - 1
+
+class LatencyHistogram:
+    """Counts of durations in log-linear microsecond buckets.
+
+    ``record`` is a bucket lookup and a list increment, without a lock:
+    each histogram has a single writer thread (stages recorded on several
+    threads get one histogram per thread, merged when read). Readers copy
+    the counts and may miss an increment in flight.
+    """
+
+    __slots__ = ('counts', 'max_us')
+
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.max_us = 0
+
+    def record(self, seconds: float):
+        us = int(seconds * 1e6)
+        if us < 0:
+            us = 0
+        self.counts[bucket_index(us)] += 1
+        if us > self.max_us:
+            self.max_us = us
+
+def summarize(histograms: List[LatencyHistogram]) -> Optional[dict]:
+    """Count, percentiles and max (us) over one stage's histograms, or None if empty."""
+    counts = [sum(column) for column in zip(*(histogram.counts for histogram in histograms))]
+    total = sum(counts)
+    if not total:
+        return None
+    summary = {'count': total}
+    targets = [(name, pct * total) for name, pct in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999))]
+    seen = 0
+    for index, count in enumerate(counts):
+        if not count:
+            continue
+        seen += count
+        while targets and seen >= targets[0][1]:
+            summary[targets.pop(0)[0]] = bucket_value(index)
+    summary['max'] = max(histogram.max_us for histogram in histograms)
+    return summary
+
+class LatencyStats:
+    """Optional per-stage latency histograms for the input pipeline (``system.latency_stats``).
+
+    Nothing here runs unless the feature is enabled: the controllers only
+    install the timed wrappers below when a LatencyStats exists, so with it
+    off the hot path is the same code as without this module.
+    """
+
+    def __init__(self, settings: dict):
+        self.summary_seconds = settings.get('summary_seconds', 10)
+        self.http_port = settings.get('http_port', 0)
+        self._stages: Dict[str, List[LatencyHistogram]] = {stage: [] for stage in STAGES}
+        self._lock = threading.Lock()  # Only for registering histograms and reading them
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+        self.started = time.time()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        """A new histogram for ``stage``, to be written by one thread only."""
+        histogram = LatencyHistogram()
+        with self._lock:
+            self._stages.setdefault(stage, []).append(histogram)
+        return histogram
+
+    def timed(self, stage: str, func: Callable) -> Callable:
+        """Wrap ``func`` so every call's duration is recorded under ``stage``."""
+        histogram = self.histogram(stage)
+        record = histogram.record
+        clock = time.perf_counter
+
+        def wrapper(*args):
+            start = clock()
+            result = func(*args)
+            record(clock() - start)
+            return result
+        return wrapper
+
+    def instrument_target(self, target):
+        """Time every datagram an OSCTarget sends (call before it encodes packets)."""
+        if getattr(target, '_timed', False):
+            return
+        target._sendto = self.timed('send', target._sendto)
+        target._timed = True
+
+    def event_dispatcher(self, dispatch_event: Callable) -> Callable:
+        """Return ``dispatch(timestamp, event)`` recording queue, dispatch and total times.
+
+        ``timestamp`` is the ``time.perf_counter()`` value at which the event
+        was read off the serial port.
+        """
+        queue_times = self.histogram('queue').record
+        dispatch_times = self.histogram('dispatch').record
+        total_times = self.histogram('total').record
+        clock = time.perf_counter
+
+        def dispatch(timestamp: float, event):
+            start = clock()
+            dispatch_event(*event)
+            end = clock()
+            queue_times(start - timestamp)
+            dispatch_times(end - start)
+            total_times(end - timestamp)
+        return dispatch
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {stage: list(histograms) for stage, histograms in self._stages.items()}
+        result = {'uptime_s': round(time.time() - self.started, 1), 'unit': "us", 'stages': {}}
+        for stage, histograms in stages.items():
+            summary = summarize(histograms) if histograms else None
+            if summary:
+                summary['note'] = STAGE_NOTES.get(stage, "")
+                result['stages'][stage] = summary
+        return result
+
+    def report(self):
+        """Log one line per stage with events recorded."""
+        stages = self.snapshot()['stages']
+        if not stages:
+            log.info("Latency: no events recorded")
+        for stage, s in stages.items():
+            log.info(f"Latency {stage:>8}: {s['count']:8d} x  p50 {s['p50']:6d} us  p90 {s['p90']:6d} us  "
+                     f"p99 {s['p99']:6d} us  max {s['max']:7d} us  ({s['note']})")
+
+    def start(self):
+        """Start the periodic summary and the HTTP endpoint, as configured."""
+        if self.summary_seconds:
+            self._thread = threading.Thread(target=self._report_loop, name="latency-stats", daemon=True)
+            self._thread.start()
+        if self.http_port:
+            stats = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip('/') not in ("", "/stats"):
+                        self.send_error(404)
+                        return
+                    body = json.dumps(stats.snapshot(), indent=2).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    pass
+
+            try:
+                self._server = ThreadingHTTPServer(("127.0.0.1", self.http_port), Handler)
+            except OSError as e:
+                log.error(f"Cannot serve latency stats on port {self.http_port}: {e}")
+                return
+            threading.Thread(target=self._server.serve_forever, name="latency-http", daemon=True).start()
+            log.info(f"Latency stats on http://127.0.0.1:{self.http_port}/stats")
+
+    def _report_loop(self):
+        while not self._stop.wait(self.summary_seconds):
+            self.report()
+
+    def stop(self):
+        """Stop the summary thread and the endpoint and log the final numbers."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.report()
@@ -0,0 +1,60 @@
+import logging
+import logging.handlers
+import queue
+import sys
+from control_routing import NUM_INPUTS
+
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+DATE_FORMAT = "%H:%M:%S"
+
+def setup_logging(settings: dict) -> logging.handlers.QueueListener:
+    """Route all logging through a queue that is written out on a background thread.
+
+    Callers only pay for putting a record on the queue; the console write
+    (which can stall for a long time on Windows terminals) happens on the
+    listener thread. Returns the started listener, stop it on shutdown to
+    flush what is left.
+    """
+    settings = settings or {}
+    level = str(settings.get('level', 'INFO')).upper()
+
+    log_queue = queue.SimpleQueue()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    # Per-event logs have their own switch so they can be enabled without
+    # turning on debug output everywhere else
+    events = logging.getLogger("events")
+    events.setLevel(logging.DEBUG if settings.get('log_events') else logging.WARNING)
+
+    listener.start()
+    return listener
+
+class EventLogger:
+    """Per-event debug logging for the hot path, off unless `log_events` is set.
+
+    Check ``enabled`` before doing any formatting work. With
+    ``sample_every`` = N only every Nth event of each input is logged.
+    """
+
+    def __init__(self, sample_every: int = 1, num_inputs: int = NUM_INPUTS):
+        self.logger = logging.getLogger("events")
+        self.enabled = self.logger.isEnabledFor(logging.DEBUG)
+        self.sample_every = max(1, int(sample_every))
+        self._counts = [0] * num_inputs
+
+    def sampled(self, input_id: int) -> bool:
+        """Count an event for this input and say whether it should be logged."""
+        count = self._counts[input_id]
+        self._counts[input_id] = count + 1
+        return count % self.sample_every == 0
+
+    def debug(self, msg: str, *args):
+        self.logger.debug(msg, *args)
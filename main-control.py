@@ -1,333 +1,212 @@
-import serial
-import serial.tools.list_ports
 import time
-import os
-import sys
-import yaml
-from typing import Optional, Dict, List
+import queue
+import logging
 from threading import Lock
 from processing_manager import ProcessingManager
 from supercollider_manager import SuperColliderManager
-from pythonosc import udp_client
+from serial_reader import InputQueue
+from log_setup import setup_logging
+from mode_switcher import ModeSwitchOrchestrator
+from osc_listener import ControllerListener
+from readiness import ReadinessTracker
+from engine_pool import EnginePool
+from asset_registry import AssetRegistry
+from input_devices import find_ports
+from config_loader import ConfigWatcher
+from sample_index import refresh_index
+from controller_core import ControllerCore, load_config, CONFIG_PATH
 
-class MainController:
+log = logging.getLogger("controller")
+
+class MainController(ControllerCore):
     def __init__(self):
         # Load config
+        config = load_config()
+
+        # Logging goes through a background thread from here on
+        self.log_listener = setup_logging(config['system'].get('logging') or {})
         try:
-            with open('config.yml', 'r') as file:
-                self.config = yaml.safe_load(file)
-        except Exception as e:
-            print(f"Error loading config file: {e}")
-            sys.exit(1)
-        
+            super().__init__(config)
+        except SystemExit:
+            self.log_listener.stop()
+            raise
+
         # Initialize state
-        self.running = True
-        self.pot_values = [0, 0, 0]
         self.pot_lock = Lock()
-        self.direct_button_states = [0] * 7
-        self.matrix_button_states = [0] * 16  # 4x4 matrix
-        self.connected = False
-        
-        # Mode management
-        self.available_modes = list(self.config['modes'].keys())
-        if not self.available_modes:
-            print("No modes found in configuration file!")
-            sys.exit(1)
-            
-        self.current_mode = self.config['system']['defaults']['initial_mode']
-        if self.current_mode not in self.available_modes:
-            print(f"Initial mode '{self.current_mode}' not found in configuration")
-            self.current_mode = self.available_modes[0]
-            print(f"Using '{self.current_mode}' as fallback initial mode")
-            
-        self.current_mode_index = self.available_modes.index(self.current_mode)
-        self.mode_config = self.config['modes'][self.current_mode]
-        print(f"Available modes: {', '.join(self.available_modes)}")
-        print(f"Starting in mode: {self.current_mode}")
-
-        # Try to connect to Teensy
-        try:
-            port = self.config['system']['ports']['teensy']
-            baud = self.config['system']['defaults']['baud_rate']
-            
-            # List available serial ports
-            ports = list(serial.tools.list_ports.comports())
-            available_ports = [p.device for p in ports]
-            print(f"Available serial ports: {', '.join(available_ports)}")
-            
-            if not available_ports:
-                print("No serial ports detected. Will run without hardware input.")
-                self.connected = False
-            elif port not in available_ports:
-                print(f"Configured port {port} not found in available ports.")
-                print(f"Using first available port instead: {available_ports[0]}")
-                port = available_ports[0]
-                self.connected = True
-            else:
-                self.connected = True
-                
-            if self.connected:
-                print(f"Connecting to Teensy on {port} at {baud} baud...")
-                self.serial = serial.Serial(port, baud, timeout=1)
-                time.sleep(2)
-                print("Successfully connected to Teensy\n")
-        except serial.SerialException as e:
-            print(f"Error connecting to Teensy: {e}")
-            print("Will run without hardware input.")
-            self.connected = False
-        
-        # Initialize OSC clients
-        self.sc_client = udp_client.SimpleUDPClient(
-            "127.0.0.1", 
-            self.config['system']['ports']['supercollider']
+        self.event_queue = InputQueue(
+            maxsize=self.config['system']['defaults'].get('input_queue_size', 256)
         )
-        self.processing_client = udp_client.SimpleUDPClient(
-            "127.0.0.1", 
-            self.config['system']['ports']['processing']
+
+        # Connect every controller, each read on its own thread into the shared queue
+        self.connected = [device for device in find_ports(self.devices) if device.open(self.event_queue, self.stats)]
+        if self.devices and not self.connected:
+            log.warning("Will run without hardware input.")
+
+        # Engines report back on the controller port once they are ready
+        self.readiness = ReadinessTracker()
+        self.listener = ControllerListener(self.settings.system.ports.controller,
+                                           receive_buffer=self.settings.system.defaults.listener_buffer)
+        self.readiness.attach(self.listener.dispatcher)
+        if self.probe:
+            self.probe.attach(self.listener.dispatcher)
+        # Engine feedback the mode routes goes through the main loop like input
+        self.listener.dispatcher.set_default_handler(
+            self.feedback_handler(lambda event: self.event_queue.put((time.perf_counter(), event)))
         )
+        self.listener.start()
 
-        # Initialize managers
-        print("Initializing Processing...")
-        self.processing = ProcessingManager(self.config)
-        
-        print("Initializing SuperCollider...")
-        self.supercollider = SuperColliderManager(self.config)
-        
-        print("Setup complete! Running controller...")
+        # Sketch folders and scripts of every mode, shared by all engine managers
+        self.assets = AssetRegistry(self.config)
 
-    def switch_to_next_mode(self):
-        """Switch to the next available mode in the configuration."""
-        try:
-            if not self.available_modes:
-                print("No available modes found in configuration")
-                return False
-            
-            self.current_mode_index = (self.current_mode_index + 1) % len(self.available_modes)
-            new_mode = self.available_modes[self.current_mode_index]
-            
-            print(f"\nSwitching to mode: {new_mode}")
-            self.current_mode = new_mode
-            
-            # Update mode config
-            if new_mode in self.config['modes']:
-                self.mode_config = self.config['modes'][new_mode]
-            else:
-                print(f"Error: Mode {new_mode} not found in configuration")
-                return False
-            
-            # Update Processing sketch if needed
-            if 'processing' in self.mode_config and 'sketch' in self.mode_config['processing']:
-                new_sketch = self.mode_config['processing']['sketch']
-                if new_sketch:
-                    result = self.processing.start_sketch(new_sketch)
-                    if not result:
-                        print(f"Warning: Failed to start Processing sketch for mode {new_mode}")
-            else:
-                print(f"No Processing sketch defined for mode {new_mode}")
-            
-            # Update SuperCollider script if needed
-            if hasattr(self.supercollider, 'set_current_mode'):
-                self.supercollider.set_current_mode(new_mode)
-            
-            result = self.supercollider.start_supercollider()
-            if not result:
-                print(f"Warning: Failed to start SuperCollider for mode {new_mode}")
-                
-            print(f"Mode switch to {new_mode} completed")
-            return True
-            
-        except Exception as e:
-            print(f"Error switching modes: {e}")
-            return False
+        # Index new or changed samples before SuperCollider reads the index
+        index_settings = self.config['system'].get('sample_index') or {}
+        if index_settings.get('enabled'):
+            refresh_index(index_settings)
 
-    def handle_button_action(self, btn_name: str):
-        """Process configured actions for a button."""
-        # Check if the button configuration exists in the current mode
-        if not self.mode_config:
-            print(f"No active mode configuration for button {btn_name}")
-            return
-            
-        buttons = self.mode_config.get('controls', {}).get('buttons', {})
-        if not buttons:
-            print(f"No button controls defined in mode {self.current_mode}")
-            return
-            
-        btn_config = buttons.get(btn_name)
-        if not btn_config:
-            print(f"Button {btn_name} not configured in mode {self.current_mode}")
-            return
-        
-        # Check if actions are defined for this button
-        if 'actions' not in btn_config:
-            print(f"No actions defined for button {btn_name}")
-            return
-            
-        for action in btn_config['actions']:
-            target = action.get('target')
-            if not target:
-                print(f"No target defined for action in button {btn_name}")
-                continue
-                
-            command = action.get('command')
-            if not command:
-                print(f"No command defined for action in button {btn_name}")
-                continue
-                
-            params = action.get('params', [])
-            
-            try:
-                if target == 'supercollider':
-                    self.sc_client.send_message(command, params)
-                    print(f"Sent to SC: {command} {params}")
-                elif target == 'processing':
-                    self.processing_client.send_message(command, params)
-                    print(f"Sent to Processing: {command} {params}")
-                else:
-                    print(f"Unknown target: {target}")
-            except Exception as e:
-                print(f"Error sending OSC message: {e}")
+        # Optional standby pool: modes stay running and a switch is just an OSC message
+        pool_settings = self.config['system'].get('engine_pool') or {}
+        if pool_settings.get('enabled'):
+            log.info("Initializing engine pool...")
+            self.pool = EnginePool(self.config, pool_settings, self.readiness, self.batcher, self.assets)
+            self.orchestrator = self.pool
+        else:
+            # Initialize managers
+            log.info("Initializing Processing...")
+            self.processing = ProcessingManager(self.config, self.readiness, self.assets)
 
-    def handle_pot_control(self, pot_name: str, raw_value: int):
-        """Process configured control for a pot."""
-        # Check if the pot configuration exists in the current mode
-        if not self.mode_config:
-            print(f"No active mode configuration for pot {pot_name}")
-            return
-            
-        pots = self.mode_config.get('controls', {}).get('pots', {})
-        if not pots:
-            print(f"No pot controls defined in mode {self.current_mode}")
-            return
-            
-        pot_config = pots.get(pot_name)
-        if not pot_config:
-            print(f"Pot {pot_name} not configured in mode {self.current_mode}")
-            return
-        
-        # Check if command is defined for this pot
-        if 'command' not in pot_config:
-            print(f"No command defined for pot {pot_name}")
-            return
-            
-        if 'target' not in pot_config:
-            print(f"No target defined for pot {pot_name}")
-            return
-            
-        mapped_value = self.map_value(raw_value)
-        target = pot_config['target']
-        command = pot_config['command']
-        params = pot_config.get('params', [])
-        message = params + [mapped_value]
-        
-        try:
-            if target == 'supercollider':
-                self.sc_client.send_message(command, message)
-                print(f"Sent to SC: {command} {message}")
-            elif target == 'processing':
-                self.processing_client.send_message(command, message)
-                print(f"Sent to Processing: {command} {message}")
-            else:
-                print(f"Unknown target: {target}")
-        except Exception as e:
-            print(f"Error sending OSC message: {e}")
+            log.info("Initializing SuperCollider...")
+            self.supercollider = SuperColliderManager(self.config, self.readiness, self.assets)
 
-    def map_value(self, value: int, in_min: int = 0, in_max: int = 4095, 
-                  out_min: float = 0, out_max: float = 1.0) -> float:
-        """Map input value from one range to another."""
-        return (value - in_min) * (out_max - out_min) / (in_max - in_min) + out_min
+            # Mode switches restart the engines in the background while input keeps flowing
+            self.orchestrator = ModeSwitchOrchestrator(self.processing, self.supercollider)
 
-    def parse_teensy_data(self, line: str):
-        """Parse data from Teensy in the new format."""
-        try:
-            line = line.strip()
-            # Direct buttons
-            if line.startswith("btn"):
-                try:
-                    btn_id = int(line[3:])
-                    if 0 <= btn_id < 7:
-                        btn_name = f"btn{btn_id+1}"  # 1-indexed for user interface
-                        print(f"Direct button press: {btn_name}")
-                        
-                        # Check if it's our mode switch button (typically btn3 in old code)
-                        if btn_id == 2:  # btn3 was our mode switch button
-                            self.switch_to_next_mode()
-                        else:
-                            self.handle_button_action(btn_name)
-                except ValueError:
-                    print(f"Invalid button format: {line}")
-            
-            # Matrix buttons
-            elif line.startswith("mbtn_"):
-                try:
-                    mbtn_id = int(line[5:])
-                    if 0 <= mbtn_id < 16:
-                        mbtn_name = f"mbtn{mbtn_id+1}"  # 1-indexed for user interface
-                        print(f"Matrix button press: {mbtn_name}")
-                        self.handle_button_action(mbtn_name)
-                except ValueError:
-                    print(f"Invalid matrix button format: {line}")
-            
-            # Potentiometers
-            elif line.startswith("pot"):
-                try:
-                    colon_pos = line.find(":")
-                    if colon_pos > 0:
-                        pot_id = int(line[3:colon_pos])
-                        value = int(line[colon_pos+1:])
-                        
-                        if 1 <= pot_id <= 3:  # pot1, pot2, pot3
-                            pot_name = f"pot{pot_id}"
-                            print(f"{pot_name}: {value}")
-                            self.handle_pot_control(pot_name, value)
-                except ValueError:
-                    print(f"Invalid pot format: {line}")
-            else:
-                print(f"Unknown data format: {line}")
-                        
-        except ValueError as e:
-            print(f"Error parsing data: {e}, line: {line}")
-        except Exception as e:
-            print(f"Error processing data: {e}, line: {line}")
+        # Cold start both engines at once and wait until they report ready
+        startup = self.orchestrator.switch(self.current_mode, self.mode_config)
+        results = startup.done.result()
+        log.info(f"Engines started in {startup.elapsed:.2f} s: "
+                 + ", ".join(f"{engine} {'ready' if ok else 'FAILED'}" for engine, ok in results.items()))
+        if self.pool:
+            self.osc_clients = self.pool.clients or self.osc_clients
+            self.compile_mode()
+        if self.stats:
+            self.stats.start()
+
+        # Edited controls are applied by the main loop, handed over through the queue
+        self.reloaded_config = None
+        self.config_watcher = None
+        reload_settings = self.config['system'].get('config_reload') or {}
+        if reload_settings.get('enabled'):
+            self.config_watcher = ConfigWatcher(CONFIG_PATH, self.config_changed, reload_settings.get('poll_seconds', 1.0))
+            self.config_watcher.start()
+
+        log.info("Setup complete! Running controller...")
+
+    def config_changed(self, config: dict):
+        """Called on the watcher thread with a new valid config."""
+        self.reloaded_config = config
+        self.event_queue.put((time.perf_counter(), None))
+
+    def start_mode_switch(self, mode_name: str):
+        switch = self.orchestrator.switch(mode_name, self.config['modes'][mode_name])
+        # Wake the main loop as soon as both engines are done
+        switch.done.add_done_callback(
+            lambda _: self.event_queue.put((time.perf_counter(), None))
+        )
+        return switch
 
     def run(self):
         """Main run loop."""
+        # With latency stats on, events go through a timed dispatch
+        timed_dispatch = self.stats.event_dispatcher(self.dispatch_event) if self.stats else None
         try:
-            print("Running main loop...")
+            log.info("Running main loop...")
             while self.running:
-                if self.connected and self.serial.in_waiting:
-                    line = self.serial.readline().decode().strip()
-                    self.parse_teensy_data(line)
-                time.sleep(0.001)
-                    
+                if self.mode_switch is not None and self.mode_switch.done.done():
+                    self.finish_mode_switch()
+                if self.reloaded_config is not None:
+                    config, self.reloaded_config = self.reloaded_config, None
+                    self.reload_controls(config)
+
+                # Sleeps until the reader thread hands over a complete line,
+                # a rate-limited pot value is due or an OSC bundle tick ends
+                try:
+                    next_due = self.service_timers()
+                except Exception as e:
+                    log.exception(f"Error servicing timers: {e}")
+                    next_due = None
+                timeout = 0.5 if next_due is None else max(0.0, next_due - time.perf_counter())
+                try:
+                    timestamp, event = self.event_queue.get(timeout=timeout)
+                except queue.Empty:
+                    self.check_readers()
+                    continue
+                if event is None:
+                    continue  # Wake-up from a finished mode switch or a config reload
+                try:
+                    if timed_dispatch is None:
+                        self.dispatch_event(*event)
+                    else:
+                        timed_dispatch(timestamp, event)
+                except Exception as e:
+                    log.exception(f"Error processing event {event}: {e}")
+
         except KeyboardInterrupt:
-            print("\nShutting down...")
+            log.info("Shutting down...")
         except Exception as e:
-            print(f"\nUnexpected error: {e}")
+            log.exception(f"Unexpected error: {e}")
         finally:
             self.running = False
             self.cleanup()
 
+    def check_readers(self):
+        """Drop controllers whose port failed; stop once the last one is gone."""
+        failed = [device for device in self.connected if device.reader.error]
+        for device in failed:
+            error = device.reader.error
+            self.connected.remove(device)
+            device.close()
+            if not self.connected:
+                raise error
+            log.warning(f"Lost {device.device_id}, other controllers keep running")
+
     def cleanup(self):
         """Clean up all resources."""
-        print("\nCleaning up...")
-        
+        log.info("Cleaning up...")
+        if hasattr(self, 'pot_filters'):
+            self.flush_output()
+
+        # Let a running mode switch finish before stopping the engines
+        # (the engine pool stops all of its engines here)
+        if getattr(self, 'pool', None):
+            log.info(f"Engine pool: {self.pool.summary()}")
+        if hasattr(self, 'orchestrator'):
+            self.orchestrator.shutdown()
+
         # Clean up managers first
         if hasattr(self, 'processing'):
             self.processing.cleanup()
         if hasattr(self, 'supercollider'):
             self.supercollider.cleanup()
-        
-        # Clean up serial connection
-        if self.connected and hasattr(self, 'serial'):
-            try:
-                if self.serial.is_open:
-                    self.serial.close()
-                    print("Closed serial connection")
-            except Exception as e:
-                print(f"Error closing serial connection: {e}")
-        
-        print("Cleanup complete!")
+
+        if getattr(self, 'stats', None):
+            self.stats.stop()
+        if getattr(self, 'config_watcher', None):
+            self.config_watcher.stop()
+
+        if hasattr(self, 'listener'):
+            self.listener.stop()
+        if hasattr(self, 'assets'):
+            self.assets.stop()
+
+        # Stop the readers and close their serial connections
+        for device in getattr(self, 'connected', []):
+            device.close()
+        if hasattr(self, 'event_queue') and self.event_queue.dropped:
+            log.warning(f"Dropped {self.event_queue.dropped} stale pot or feedback events (input queue full)")
+
+        log.info("Cleanup complete!")
+        self.log_listener.stop()
 
 if __name__ == "__main__":
     controller = MainController()
-    controller.run()
\ No newline at end of file
+    controller.run()
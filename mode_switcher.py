@@ -0,0 +1,101 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+log = logging.getLogger(__name__)
+
+SWITCH_INPUT_POLICIES = ("queue", "discard")
+
+class ModeSwitch:
+    """One mode switch in progress.
+
+    ``engines`` holds one future per engine (True if it started), ``done`` is
+    resolved with a dict of those results once every engine has finished.
+    """
+
+    def __init__(self, mode_name: str):
+        self.mode_name = mode_name
+        self.started = time.perf_counter()
+        self.finished = None
+        self.engines: Dict[str, Future] = {}
+        self.done: Future = Future()
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+class ModeSwitchOrchestrator:
+    """Restarts the Processing sketch and SuperCollider script for a mode concurrently.
+
+    Engine restarts run on a small thread pool so the controller's main loop
+    keeps consuming serial input during a switch. Only one switch runs at a
+    time. An ``executor`` can be shared with other orchestrators (the engine
+    pool runs one per slot); it is then not shut down by ``shutdown``.
+    Subclasses that start the engines some other way pass ``threaded=False``
+    and get no thread pool at all.
+    """
+
+    def __init__(self, processing, supercollider, executor: Optional[ThreadPoolExecutor] = None,
+                 threaded: bool = True):
+        self.processing = processing
+        self.supercollider = supercollider
+        self._owns_executor = threaded and executor is None
+        if self._owns_executor:
+            executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mode-switch")
+        self.executor = executor
+        self.current = None
+
+    @property
+    def busy(self) -> bool:
+        return self.current is not None and not self.current.done.done()
+
+    def switch(self, mode_name: str, mode_config: dict) -> ModeSwitch:
+        """Start restarting both engines for a mode and return the switch handle."""
+        if self.busy:
+            raise RuntimeError(f"Already switching to {self.current.mode_name}")
+
+        switch = ModeSwitch(mode_name)
+        sketch = (mode_config.get('processing') or {}).get('sketch')
+        if sketch:
+            switch.engines['processing'] = self.executor.submit(self.processing.start_sketch, sketch)
+        else:
+            log.info(f"No Processing sketch defined for mode {mode_name}")
+        switch.engines['supercollider'] = self.executor.submit(self._start_supercollider, mode_name)
+
+        for engine, future in switch.engines.items():
+            future.add_done_callback(lambda f, engine=engine: self._engine_done(switch, engine, f))
+        self.current = switch
+        return switch
+
+    def _start_supercollider(self, mode_name: str) -> bool:
+        if hasattr(self.supercollider, 'set_current_mode'):
+            self.supercollider.set_current_mode(mode_name)
+        return self.supercollider.start_supercollider()
+
+    def _engine_done(self, switch: ModeSwitch, engine: str, future: Future):
+        try:
+            ok = bool(future.result())
+        except Exception as e:
+            log.error(f"Error starting {engine} for mode {switch.mode_name}: {e}")
+            ok = False
+        if ok:
+            log.info(f"{engine} ready for mode {switch.mode_name} after {switch.elapsed:.2f} s")
+        else:
+            log.warning(f"Failed to start {engine} for mode {switch.mode_name}")
+
+        with switch._lock:
+            if switch.done.done() or not all(f.done() for f in switch.engines.values()):
+                return
+            switch.finished = time.perf_counter()
+            results = {}
+            for name, f in switch.engines.items():
+                results[name] = f.exception() is None and bool(f.result())
+            switch.done.set_result(results)
+
+    def shutdown(self):
+        """Wait for a running switch to finish and stop the worker threads."""
+        if self._owns_executor:
+            self.executor.shutdown(wait=True)
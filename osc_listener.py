@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import socket
+import sys
+import threading
+from pythonosc import osc_server
+from pythonosc.dispatcher import Dispatcher
+
+log = logging.getLogger(__name__)
+
+class ControllerListener:
+    """OSC server on the controller's own port, served on a background thread.
+
+    Engines talk back to the controller through this port. Other parts of the
+    controller register their handlers on ``dispatcher`` before ``start``.
+    The asyncio controller calls ``start_async`` instead, which serves on the
+    running event loop so handlers run on the loop thread.
+
+    With ``receive_buffer`` (bytes) the socket's receive buffer is raised,
+    so bursts of feedback wait in the kernel while the handler catches up
+    instead of being dropped (Linux caps it at net.core.rmem_max).
+    """
+
+    def __init__(self, port: int, host: str = "127.0.0.1", receive_buffer: int = 0):
+        self.host = host
+        self.port = port
+        self.receive_buffer = receive_buffer
+        self.dispatcher = Dispatcher()
+        self.server = None
+        self._thread = None
+        self._transport = None
+
+    def start(self):
+        self.server = osc_server.BlockingOSCUDPServer((self.host, self.port), self.dispatcher)
+        self._size_buffer(self.server.socket)
+        self._thread = threading.Thread(target=self.server.serve_forever, name="osc-listener", daemon=True)
+        self._thread.start()
+        log.info(f"Listening for engine OSC on {self.host}:{self.port}")
+
+    async def start_async(self):
+        server = osc_server.AsyncIOOSCUDPServer((self.host, self.port), self.dispatcher, asyncio.get_running_loop())
+        self._transport, _ = await server.create_serve_endpoint()
+        self._size_buffer(self._transport.get_extra_info('socket'))
+        log.info(f"Listening for engine OSC on {self.host}:{self.port}")
+
+    def _size_buffer(self, sock):
+        if not self.receive_buffer:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+        except OSError as e:
+            log.warning(f"Could not set the listener's receive buffer to {self.receive_buffer} bytes: {e}")
+            return
+        granted = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith("linux"):
+            granted //= 2  # Linux doubles the size it grants for its bookkeeping
+        if granted < self.receive_buffer:
+            # Most systems cap it below the shipped default, the listener still works
+            log.info(f"Listener receive buffer is {granted} bytes, asked for {self.receive_buffer} "
+                     f"(raise net.core.rmem_max for more)")
+
+    def stop(self):
+        if self._transport:
+            self._transport.close()
+            self._transport = None
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
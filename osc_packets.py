@@ -0,0 +1,179 @@
+import logging
+import socket
+import struct
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from pythonosc.osc_message_builder import OscMessageBuilder
+from pythonosc.parsing import osc_types
+
+log = logging.getLogger(__name__)
+
+BUNDLE_HEADER = b"#bundle\x00"
+
+class OSCPacket:
+    """A pre-encoded OSC message bound to one destination.
+
+    Constant parts (address, type tags, fixed params) are encoded once. If the
+    message ends in a value slot, ``send(value)`` patches that float32 in place
+    in the reusable buffer before handing it to ``sendto``.
+    """
+
+    __slots__ = ('data', 'value_offset', '_sendto', '_address')
+
+    def __init__(self, data: bytearray, value_offset: int, sendto, address: Tuple[str, int]):
+        self.data = data
+        self.value_offset = value_offset
+        self._sendto = sendto
+        self._address = address
+
+    def send(self, value: float = None):
+        if value is not None:
+            struct.pack_into('>f', self.data, self.value_offset, value)
+        self._sendto(self.data, self._address)
+
+class OSCTarget:
+    """UDP OSC destination with a cache of pre-encoded packets.
+
+    Drop-in replacement for ``udp_client.SimpleUDPClient`` for the
+    controller's outgoing traffic: ``send_message`` still works for one-off
+    messages, while the routing table uses ``packet()`` for the hot path.
+
+    With a ``batcher``, packets are not sent right away but collected and
+    sent as one bundle per tick (see OSCBatcher). With a ``transport``
+    (anything with ``sendto(data, address)``, e.g. an asyncio
+    DatagramTransport shared by all targets) no socket of its own is opened.
+    """
+
+    def __init__(self, address: str, port: int, batcher: Optional['OSCBatcher'] = None, transport=None):
+        self.address = (address, port)
+        self._sock = None
+        if transport is None:
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+        self._sendto = transport.sendto if transport is not None else self._sock.sendto
+        self._cache: Dict[tuple, OSCPacket] = {}
+        self._batcher = batcher
+        self._pending: List[bytes] = []
+
+    def packet(self, command: str, params=(), with_value: bool = False) -> OSCPacket:
+        """Return the cached packet for (command, params), encoding it on first use.
+
+        With ``with_value`` the message gets a trailing float32 slot that is
+        filled in on each ``OSCPacket.send(value)``.
+        """
+        key = (command, tuple(params), with_value)
+        packet = self._cache.get(key)
+        if packet is None:
+            args = list(params) + [0.0] if with_value else list(params)
+            data = bytearray(encode_message(command, args))
+            # A float32 argument is always the last 4 bytes of the datagram
+            value_offset = len(data) - 4 if with_value else -1
+            sendto = self._enqueue if self._batcher else self._sendto
+            packet = OSCPacket(data, value_offset, sendto, self.address)
+            self._cache[key] = packet
+        return packet
+
+    def send_message(self, address: str, value):
+        """Encode and send a one-off message, same as SimpleUDPClient.send_message."""
+        self._sendto(encode_message(address, value), self.address)
+
+    def forward(self, address: str, args: list):
+        """Encode and send a message built per call (forwarded engine feedback), batched like packets."""
+        data = encode_message(address, args)
+        if self._batcher:
+            self._enqueue(data, self.address)
+        else:
+            self._sendto(data, self.address)
+
+    def _enqueue(self, data: bytearray, address: Tuple[str, int]):
+        if not self._pending:
+            self._batcher.add(self)
+        # Copy, since the packet buffer is patched again on the next send
+        self._pending.append(bytes(data))
+
+    def send_bundle(self, timetag: bytes, max_size: int) -> int:
+        """Send everything queued this tick as OSC bundles. Returns the number of bundles sent."""
+        bundles = 0
+        bundle = bytearray(BUNDLE_HEADER + timetag)
+        empty_size = len(bundle)
+        try:
+            for message in self._pending:
+                if len(bundle) > empty_size and len(bundle) + 4 + len(message) > max_size:
+                    self._sendto(bundle, self.address)
+                    bundles += 1
+                    del bundle[empty_size:]
+                bundle += struct.pack('>i', len(message))
+                bundle += message
+            if len(bundle) > empty_size:
+                self._sendto(bundle, self.address)
+                bundles += 1
+        finally:
+            self._pending.clear()
+        return bundles
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+
+class OSCBatcher:
+    """Collects the packets sent within one tick into one OSC bundle per target.
+
+    The tick starts with the first message queued after a flush. The bundle
+    timetag is the flush time plus ``latency``, so SuperCollider can schedule
+    the contents at a fixed offset; Processing (oscP5) just unpacks the bundle.
+    """
+
+    def __init__(self, tick: float, latency: float = 0.0, max_bundle_size: int = 8192):
+        self.tick = tick
+        self.latency = latency
+        self.max_bundle_size = max_bundle_size
+        self.deadline = None
+        self._targets: List[OSCTarget] = []
+
+        # Counters
+        self.messages = 0
+        self.bundles = 0
+
+    def add(self, target: OSCTarget):
+        """Called by a target when it queues its first message of the tick."""
+        if self.deadline is None:
+            self.deadline = time.perf_counter() + self.tick
+        self._targets.append(target)
+
+    def poll(self, now: float) -> Optional[float]:
+        """Flush if the tick is over. Returns the current deadline, or None if nothing is queued."""
+        if self.deadline is not None and now >= self.deadline:
+            self.flush()
+        return self.deadline
+
+    def flush(self):
+        """Send all queued messages now.
+
+        A target whose send fails loses this tick's messages (logged, like
+        an unbatched send); the others are still sent, and every target
+        starts the next tick with an empty queue.
+        """
+        if not self._targets:
+            return
+        timetag = osc_types.write_date(time.time() + self.latency)
+        targets, self._targets = self._targets, []
+        self.deadline = None
+        for target in targets:
+            self.messages += len(target._pending)
+            try:
+                self.bundles += target.send_bundle(timetag, self.max_bundle_size)
+            except Exception as e:
+                # send_bundle has emptied the target's queue either way
+                log.error(f"Error sending OSC message: {e}")
+
+def encode_message(address: str, value) -> bytes:
+    """Encode a message exactly the way python-osc's SimpleUDPClient does."""
+    builder = OscMessageBuilder(address=address)
+    if value is None:
+        pass
+    elif not isinstance(value, Iterable) or isinstance(value, (str, bytes)):
+        builder.add_arg(value)
+    else:
+        for val in value:
+            builder.add_arg(val)
+    return builder.build().dgram
@@ -0,0 +1,199 @@
+import argparse
+import inspect
+import logging
+import math
+import sys
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+from control_routing import NUM_POTS
+
+try:
+    import numpy
+except ImportError:  # Only needed to map numpy arrays in one go
+    numpy = None
+
+log = logging.getLogger(__name__)
+
+POT_STEPS = 4096  # 12-bit ADC, raw pot values 0-4095
+CURVE_TYPES = ("linear", "exp", "log", "scale", "table")
+
+# Semitones above the root
+SCALES = {
+    'chromatic': tuple(range(12)),
+    'major': (0, 2, 4, 5, 7, 9, 11),
+    'minor': (0, 2, 3, 5, 7, 8, 10),
+    'dorian': (0, 2, 3, 5, 7, 9, 10),
+    'mixolydian': (0, 2, 4, 5, 7, 9, 10),
+    'harmonic_minor': (0, 2, 3, 5, 7, 8, 11),
+    'pentatonic': (0, 2, 4, 7, 9),
+    'minor_pentatonic': (0, 3, 5, 7, 10),
+    'blues': (0, 3, 5, 6, 7, 10),
+}
+
+# Lookup tables by their settings, so switching back to a mode does not rebuild them
+_tables: Dict[str, array] = {}
+
+def _linear(min: float = 0.0, max: float = 1.0) -> Callable[[float], float]:
+    return lambda t: min + (max - min) * t
+
+def _exp(min: float = 0.0, max: float = 1.0, shape: Optional[float] = None) -> Callable[[float], float]:
+    if shape is None:
+        # Equal ratios per step, like SuperCollider's linexp
+        if min * max <= 0:
+            raise ValueError("exp without a shape needs min and max of the same sign and not 0")
+        return lambda t: min * (max / min) ** t
+    if shape == 0:
+        raise ValueError("exp shape must not be 0")
+    return lambda t: min + (max - min) * math.expm1(shape * t) / math.expm1(shape)
+
+def _log(min: float = 0.0, max: float = 1.0, shape: float = 9.0) -> Callable[[float], float]:
+    # Rises fast and flattens out; the default shape is log10(1 + 9t)
+    if shape <= 0:
+        raise ValueError("log shape must be above 0")
+    return lambda t: min + (max - min) * math.log1p(shape * t) / math.log1p(shape)
+
+def _scale(low: int = 48, high: int = 72, scale="major", root: int = 0,
+           output: str = "midi") -> Callable[[float], float]:
+    # Equal-width steps across the pot, one per note of the scale in low-high (MIDI notes)
+    degrees = SCALES.get(scale) if isinstance(scale, str) else scale
+    if degrees is None:
+        raise ValueError(f"Unknown scale '{scale}', expected one of {', '.join(SCALES)} or a list of semitones")
+    if output not in ("midi", "hz"):
+        raise ValueError(f"Unknown output '{output}', expected midi or hz")
+    degrees = {int(degree) % 12 for degree in degrees}
+    notes = [note for note in range(int(low), int(high) + 1) if (note - root) % 12 in degrees]
+    if not notes:
+        raise ValueError(f"No notes of the scale between {low} and {high}")
+    if output == "hz":
+        notes = [440.0 * 2 ** ((note - 69) / 12) for note in notes]
+    count = len(notes)
+    return lambda t: float(notes[min(int(t * count), count - 1)])
+
+def _table(points: Sequence[Sequence[float]] = ()) -> Callable[[float], float]:
+    # Breakpoints [position 0-1, value], straight lines in between, flat past the ends
+    if len(points) < 2 or any(len(point) != 2 for point in points):
+        raise ValueError("table needs at least two [position, value] points")
+    xs = [float(x) for x, _ in points]
+    ys = [float(y) for _, y in points]
+    if any(b <= a for a, b in zip(xs, xs[1:])):
+        raise ValueError("table positions must be increasing")
+
+    def at(t: float) -> float:
+        if t <= xs[0]:
+            return ys[0]
+        for i in range(1, len(xs)):
+            if t <= xs[i]:
+                return ys[i - 1] + (ys[i] - ys[i - 1]) * (t - xs[i - 1]) / (xs[i] - xs[i - 1])
+        return ys[-1]
+    return at
+
+_CURVES = {'linear': _linear, 'exp': _exp, 'log': _log, 'scale': _scale, 'table': _table}
+
+def build_curve(settings: Optional[dict] = None) -> array:
+    """Lookup table for a pot's `curve:` settings: POT_STEPS floats, indexed by the raw value.
+
+    Raises ValueError for unknown curve types or bad settings. Tables are
+    float32 like the OSC floats they are sent as, and shared between pots
+    and modes with the same settings.
+    """
+    settings = dict(settings or {})
+    key = repr(sorted(settings.items()))
+    table = _tables.get(key)
+    if table is not None:
+        return table
+
+    kind = settings.pop('type', 'linear')
+    if kind not in CURVE_TYPES:
+        raise ValueError(f"Unknown curve type '{kind}', expected one of {', '.join(CURVE_TYPES)}")
+    builder = _CURVES[kind]
+    unknown = [str(name) for name in settings if name not in inspect.signature(builder).parameters]
+    if unknown:
+        raise ValueError(f"Unknown {kind} curve settings {', '.join(unknown)}")
+    try:
+        shape = builder(**settings)
+        table = array('f', [shape(step / (POT_STEPS - 1)) for step in range(POT_STEPS)])
+    except (TypeError, ZeroDivisionError, OverflowError) as e:
+        raise ValueError(f"Invalid {kind} curve settings: {e}") from None
+    _tables[key] = table
+    return table
+
+LINEAR = build_curve()  # 0-1, what pots without a curve send
+
+def build_pot_curves(mode_name: str, mode_config: Optional[dict], devices: Sequence[str] = ()) -> List[array]:
+    """One lookup table per pot slot from a mode's `controls.pots.potN.curve`.
+
+    Indexed like build_pot_filters (``device * NUM_POTS + pot``); pots
+    without a curve, or with an invalid one, get LINEAR.
+    """
+    pots = ((mode_config or {}).get('controls') or {}).get('pots') or {}
+    curves = []
+    for device in range(max(1, len(devices))):
+        prefix = f"{devices[device]}/" if device else ""
+        for i in range(NUM_POTS):
+            name = f"{prefix}pot{i + 1}"
+            pot_config = pots.get(name)
+            if pot_config is None and devices and not device:
+                pot_config = pots.get(f"{devices[0]}/{name}")
+            settings = (pot_config or {}).get('curve')
+            if not settings:
+                curves.append(LINEAR)
+                continue
+            try:
+                curves.append(build_curve(settings))
+            except ValueError as e:
+                log.warning(f"Invalid curve for {name} in mode {mode_name}: {e}")
+                curves.append(LINEAR)
+    return curves
+
+def map_samples(curve: array, samples):
+    """Map many raw pot values at once, e.g. a recording for offline analysis.
+
+    A numpy array comes back as a float32 numpy array (one gather over the
+    table); any other sequence of ints as an ``array('f')``. Values outside
+    0-4095 are clamped like in the controller.
+    """
+    last = POT_STEPS - 1
+    if numpy is not None and isinstance(samples, numpy.ndarray):
+        table = numpy.frombuffer(curve, dtype=numpy.float32)
+        return table[numpy.clip(samples, 0, last).astype(numpy.intp)]
+    return array('f', map(curve.__getitem__, [last if s > last else 0 if s < 0 else s for s in samples]))
+
+def main():
+    # Imported here, the controller only needs the tables
+    from config_loader import read_config
+    from input_replay import load_recording
+    from teensy_protocol import make_decoder, EVENT_POT
+
+    parser = argparse.ArgumentParser(description="Show a mode's pot curves, or what they make of a recording")
+    parser.add_argument("mode")
+    parser.add_argument("--recording", help="Map the pot values of this input recording (see input_replay.py)")
+    parser.add_argument("--config", default="config.yml", help="Controller config file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    config = read_config(args.config)
+    if args.mode not in config['modes']:
+        print(f"No mode {args.mode}, expected one of {', '.join(config['modes'])}")
+        sys.exit(1)
+    curves = build_pot_curves(args.mode, config['modes'][args.mode])
+
+    samples = [[] for _ in range(NUM_POTS)]
+    if args.recording:
+        protocol, stream = load_recording(args.recording)
+        decoder = make_decoder(protocol)
+        for _, data in stream:
+            for kind, index, value in decoder.feed(data):
+                if kind == EVENT_POT and 0 <= index < NUM_POTS:
+                    samples[index].append(value)
+
+    for pot, curve in enumerate(curves):
+        points = "  ".join(f"{percent}%: {curve[round(percent / 100 * (POT_STEPS - 1))]:g}"
+                           for percent in (0, 25, 50, 75, 100))
+        print(f"pot{pot + 1}: {points}")
+        if samples[pot]:
+            mapped = map_samples(curve, numpy.array(samples[pot]) if numpy is not None else samples[pot])
+            print(f"  {len(mapped)} recorded values -> {min(mapped):g} to {max(mapped):g}, "
+                  f"mean {sum(mapped) / len(mapped):g}, {len(set(mapped))} distinct")
+
+if __name__ == "__main__":
+    main()
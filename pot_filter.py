@@ -0,0 +1,178 @@
+import logging
+import math
+from typing import List, Optional, Sequence
+from control_routing import NUM_POTS
+
+log = logging.getLogger(__name__)
+
+SMOOTHING_MODES = ("none", "ema", "one_euro")
+
+class OneEuroFilter:
+    """One-euro filter (Casiez et al.): smooths jitter when the pot is still,
+    follows quickly when it moves."""
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.x_prev = None
+        self.dx_prev = 0.0
+        self.t_prev = None
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x: float, now: float) -> float:
+        if self.x_prev is None:
+            self.x_prev, self.t_prev = x, now
+            return x
+        dt = max(now - self.t_prev, 1e-6)
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx = a_d * ((x - self.x_prev) / dt) + (1 - a_d) * self.dx_prev
+        a = self._alpha(self.min_cutoff + self.beta * abs(dx), dt)
+        x_hat = a * x + (1 - a) * self.x_prev
+        self.x_prev, self.dx_prev, self.t_prev = x_hat, dx, now
+        return x_hat
+
+class PotFilter:
+    """Per-pot deadband, smoothing and rate limiting between parsing and sending.
+
+    ``push`` takes a raw ADC sample and returns the value to send now, or None
+    if the sample was dropped or is being held back by the rate limit. A held
+    value is always the latest one and is released by ``flush`` once the rate
+    limit allows it, so the final position of a pot is never lost.
+
+    Values are rounded to whole ADC steps; with ``integer`` off (engine
+    feedback) they stay floats.
+    """
+
+    def __init__(self, deadband: float = 0, smoothing: str = "none", alpha: float = 0.5,
+                 min_cutoff: float = 1.0, beta: float = 0.0, d_cutoff: float = 1.0,
+                 max_rate: float = 0, integer: bool = True):
+        if smoothing not in SMOOTHING_MODES:
+            raise ValueError(f"Unknown smoothing '{smoothing}', expected one of {', '.join(SMOOTHING_MODES)}")
+        self.deadband = deadband
+        self.smoothing = smoothing
+        self.alpha = alpha
+        self.one_euro = OneEuroFilter(min_cutoff, beta, d_cutoff) if smoothing == "one_euro" else None
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.integer = integer
+
+        self.smoothed = None
+        self.last_sent = None
+        self.last_send_time = None
+        self.pending = None
+        self.next_due = None
+
+        # Counters
+        self.received = 0
+        self.sent = 0
+        self.dropped = 0   # Inside the deadband
+        self.merged = 0    # Replaced by a newer sample while rate limited
+
+    def push(self, raw: float, now: float) -> Optional[float]:
+        self.received += 1
+
+        if self.smoothing == "ema":
+            self.smoothed = raw if self.smoothed is None else self.alpha * raw + (1 - self.alpha) * self.smoothed
+        elif self.smoothing == "one_euro":
+            self.smoothed = self.one_euro(raw, now)
+        else:
+            self.smoothed = raw
+        value = int(round(self.smoothed)) if self.integer else self.smoothed
+
+        if self.last_sent is not None and abs(value - self.last_sent) < self.deadband:
+            self.dropped += 1
+            if self.pending is not None:
+                # The pot came back to where it was last sent, nothing left to deliver
+                self.merged += 1
+                self.pending = None
+                self.next_due = None
+            return None
+
+        if self.last_send_time is None or now - self.last_send_time >= self.min_interval:
+            if self.pending is not None:
+                self.merged += 1
+                self.pending = None
+                self.next_due = None
+            return self._sent(value, now)
+
+        if self.pending is not None:
+            self.merged += 1
+        self.pending = value
+        self.next_due = self.last_send_time + self.min_interval
+        return None
+
+    def flush(self, now: float) -> Optional[int]:
+        """Release the held value if its rate-limit slot has come up."""
+        if self.pending is None or now < self.next_due:
+            return None
+        value = self.pending
+        self.pending = None
+        self.next_due = None
+        return self._sent(value, now)
+
+    def _sent(self, value: int, now: float) -> int:
+        self.last_sent = value
+        self.last_send_time = now
+        self.sent += 1
+        return value
+
+    def summary(self) -> str:
+        return f"{self.received} raw, {self.sent} sent, {self.dropped} dropped, {self.merged} merged"
+
+def build_pot_filters(mode_name: str, mode_config: Optional[dict],
+                      devices: Sequence[str] = ()) -> List[Optional[PotFilter]]:
+    """Build one filter per pot from a mode's `controls` section.
+
+    `controls.pot_filter` sets defaults for every pot in the mode and
+    `controls.pots.potN.filter` overrides them for a single pot (`deck/potN`
+    for pots of another device, see control_routing.py). Pots with no
+    filter settings at all get None and are passed straight through. The list
+    has NUM_POTS entries per device, indexed by ``device * NUM_POTS + pot``.
+    """
+    controls = (mode_config or {}).get('controls') or {}
+    defaults = controls.get('pot_filter') or {}
+    pots = controls.get('pots') or {}
+
+    filters = []
+    for device in range(max(1, len(devices))):
+        prefix = f"{devices[device]}/" if device else ""
+        for i in range(NUM_POTS):
+            name = f"{prefix}pot{i + 1}"
+            settings = dict(defaults)
+            pot_config = pots.get(name)
+            if pot_config is None and devices and not device:
+                pot_config = pots.get(f"{devices[0]}/{name}")
+            settings.update((pot_config or {}).get('filter') or {})
+            if not settings:
+                filters.append(None)
+                continue
+            try:
+                filters.append(PotFilter(**settings))
+            except (TypeError, ValueError) as e:
+                log.warning(f"Invalid filter settings for {name} in mode {mode_name}: {e}")
+                filters.append(None)
+    return filters
+
+def build_feedback_filters(mode_name: str, mode_config: Optional[dict]) -> List[Optional[PotFilter]]:
+    """One filter per feedback slot (see control_routing.py), from `controls.feedback.<address>.filter`.
+
+    Only single-value messages go through the filter, and values stay
+    floats. Addresses without a `filter:` block get None.
+    """
+    controls = (mode_config or {}).get('controls') or {}
+    filters = []
+    for address, feedback_config in (controls.get('feedback') or {}).items():
+        settings = (feedback_config or {}).get('filter')
+        if not settings:
+            filters.append(None)
+            continue
+        try:
+            filters.append(PotFilter(**settings, integer=False))
+        except (TypeError, ValueError) as e:
+            log.warning(f"Invalid filter settings for {address} in mode {mode_name}: {e}")
+            filters.append(None)
+    return filters
@@ -1,146 +1,187 @@
 # processing_manager.py
+import logging
 import sys
 import os
 import time
 import subprocess
-from typing import List
+from typing import List, Optional, Tuple
+from asset_registry import AssetRegistry
+from config_loader import SystemConfig
+from sketch_cache import SketchCache
+from readiness import engine_environment
+
+log = logging.getLogger(__name__)
 
 class ProcessingManager:
-    def __init__(self, config):
+    def __init__(self, config, readiness=None, assets: Optional[AssetRegistry] = None):
         self.config = config
+        self.readiness = readiness
+        self.assets = assets or AssetRegistry(config)
+        system = SystemConfig.from_dict(config['system'])
+        self.startup_timeout = system.defaults.engine_timeout
+        self.startup_retries = system.defaults.engine_retries
+        self.env = engine_environment(system.ports.controller)  # Tells the sketch where to report
         self.sketch_process = None
         self.current_sketch = None
+        # Set by the engine pool for its slots (see engine_pool.py)
+        self.engine = 'processing'  # Name used for the readiness handshake
+        self.sketch_args = []       # Extra arguments passed to the sketch
+        self.pooled = False         # Other slots run their own JVMs, never kill them all
+        self.closed = False         # Set by cleanup(), stops a running start from relaunching
         self.available_sketches = self.find_sketches()
-        print(f"Available Sketches: {self.available_sketches}")
+        log.info(f"Available Sketches: {self.available_sketches}")
         
         # Set up Processing paths based on OS
         if sys.platform == "win32":
-            self.processing_path = self.config['system']['paths']['processing_win']
+            self.processing_path = system.paths.processing_win
             if not os.path.exists(self.processing_path):
-                alternative_path = self.config['system']['paths']['processing_alt_win']
+                alternative_path = system.paths.processing_alt_win
                 if os.path.exists(alternative_path):
                     self.processing_path = alternative_path
-                    print(f"Using alternative path: {self.processing_path}")
+                    log.info(f"Using alternative path: {self.processing_path}")
         elif sys.platform == "darwin":
-            self.processing_path = self.config['system']['paths']['processing_mac']
+            self.processing_path = system.paths.processing_mac
         else:
             self.processing_path = "processing-java"
-            
-        # Get initial sketch from the initial mode's configuration
-        initial_mode = self.config['system']['defaults']['initial_mode']
-        initial_sketch = self.config['modes'][initial_mode]['processing']['sketch']
-        
-        self.start_sketch(initial_sketch)
+
+        # Prebuilt sketches start with java directly (see sketch_cache.py)
+        cache_settings = self.config['system'].get('sketch_cache') or {}
+        self.cache = None
+        if cache_settings.get('enabled'):
+            self.cache = SketchCache(
+                cache_settings.get('dir', '.sketch-cache'),
+                self.processing_path,
+                cache_settings.get('java') or None
+            )
 
     def find_sketches(self) -> List[str]:
         """Find all available Processing sketches across all modes."""
-        sketches = []
-        
-        # Check for sketches in the modes directory structure
-        modes_dir = "modes"
-        if os.path.exists(modes_dir):
-            for mode_folder in os.listdir(modes_dir):
-                mode_path = os.path.join(modes_dir, mode_folder)
-                if not os.path.isdir(mode_path):
-                    continue
-                    
-                # Check each mode folder for .pde files
-                for item in os.listdir(mode_path):
-                    item_path = os.path.join(mode_path, item)
-                    if os.path.isdir(item_path):
-                        pde_files = [f for f in os.listdir(item_path) if f.endswith('.pde')]
-                        if pde_files:
-                            sketches.append(item)
-        
-        return sketches
+        return self.assets.sketch_names()
+
+    def find_sketch_path(self, sketch_name: str) -> Optional[str]:
+        """Absolute path of a sketch folder, preferring the modes that use it."""
+        return self.assets.sketch_path(sketch_name)
         
+    def sketch_command(self, sketch_name: str) -> Optional[Tuple[List[str], Optional[str], bool]]:
+        """Return (command, working directory, cached) to run a sketch, or None if it is missing.
+
+        A prebuilt sketch whose sources are unchanged is started with java
+        directly and skips the compile (see sketch_cache.py).
+        """
+        sketch_path = self.find_sketch_path(sketch_name)
+        if sketch_path is None:
+            log.error(f"Could not find sketch {sketch_name} in any mode folder")
+            return None
+
+        cwd = None
+        cached = self.cache.lookup(sketch_name, sketch_path) if self.cache else None
+        if cached:
+            cmd, cwd = cached
+        else:
+            if self.cache:
+                log.info(f"No up-to-date build of {sketch_name} in the sketch cache, compiling it "
+                         f"(prebuild with: python sketch_cache.py)")
+            # Modified command to run in regular window mode
+            cmd = [
+                self.processing_path,
+                "--force",
+                "--sketch=" + sketch_path,
+                "--output=" + os.path.join(sketch_path, "output"),
+                "--run"
+            ]
+        return cmd + [str(arg) for arg in self.sketch_args], cwd, cached is not None
+
     def start_sketch(self, sketch_name: str) -> bool:
         if not sketch_name:
-            print("No sketch name provided")
+            log.warning("No sketch name provided")
             return False
             
         if sketch_name not in self.available_sketches:
-            print(f"Sketch '{sketch_name}' not found in available sketches.")
-            print(f"Available sketches: {', '.join(self.available_sketches)}")
-            print("Will check in mode directories instead...")
+            log.warning(f"Sketch '{sketch_name}' not found in available sketches.")
+            log.info(f"Available sketches: {', '.join(self.available_sketches)}")
+            log.info("Will check in mode directories instead...")
             
+        sketch_path = None
         try:
             # Kill any existing Processing instances
-            if self.sketch_process:
-                self.sketch_process.terminate()
-                time.sleep(0.5)
-                if self.sketch_process.poll() is None:
-                    self.sketch_process.kill()
+            self.stop_sketch()
                     
-            if sys.platform == "win32":
+            if sys.platform == "win32" and not self.pooled:
                 os.system('taskkill /F /IM processing-java.exe 2>nul')
                 os.system('taskkill /F /IM java.exe 2>nul')
                 time.sleep(1)
             
             # First, look for the sketch in the current mode folder structure
-            found = False
-            sketch_path = None
-            
-            for mode_name in self.config['modes']:
-                mode_config = self.config['modes'][mode_name]
-                if mode_config.get('processing', {}).get('sketch') == sketch_name:
-                    mode_dir = os.path.join("modes", mode_name)
-                    potential_path = os.path.join(mode_dir, sketch_name)
-                    
-                    if os.path.exists(potential_path) and os.path.isdir(potential_path):
-                        sketch_path = os.path.abspath(potential_path)
-                        found = True
-                        break
-            
-            if not found:
-                print(f"Could not find sketch {sketch_name} in any mode folder")
+            sketch_path = self.find_sketch_path(sketch_name)
+            command = self.sketch_command(sketch_name)
+            if command is None:
                 return False
-                
-            # Modified command to run in regular window mode
-            cmd = [
-                self.processing_path,
-                "--force",
-                "--sketch=" + sketch_path,
-                "--output=" + os.path.join(sketch_path, "output"),
-                "--run"
-            ]
-            
-            print(f"Launching Processing sketch: {sketch_name}")
-            print(f"Command: {' '.join(cmd)}")
+            cmd, cwd, cached = command
             
-            if sys.platform == "win32":
-                self.sketch_process = subprocess.Popen(cmd)
-            else:
-                self.sketch_process = subprocess.Popen(cmd)
-                
-            time.sleep(1)
-            
-            if self.sketch_process.poll() is not None:
-                print("Sketch failed to start")
-                return False
-                
-            self.current_sketch = sketch_name
-            print(f"Successfully launched sketch: {sketch_name}\n")
-            return True
+            log.debug(f"Command: {' '.join(cmd)}")
+            start = time.perf_counter()
+
+            for attempt in range(1 + self.startup_retries):
+                if self.closed:
+                    return False
+                if attempt:
+                    log.warning(f"Retrying sketch {sketch_name} (attempt {attempt + 1})")
+                    self.stop_sketch()
+                log.info(f"Launching Processing sketch: {sketch_name}")
+                ok = self.launch(cmd, cwd)
+                if self.closed:
+                    # cleanup() ran while the sketch was starting
+                    self.stop_sketch()
+                    return False
+                if ok:
+                    self.current_sketch = sketch_name
+                    log.info(f"Successfully launched sketch: {sketch_name} in {time.perf_counter() - start:.2f} s "
+                             f"({'cached build' if cached else 'compiled'})")
+                    return True
+
+            log.error("Sketch failed to start")
+            return False
             
         except Exception as e:
-            print(f"Error launching Processing sketch: {e}")
-            print(f"Working directory: {os.getcwd()}")
+            log.error(f"Error launching Processing sketch: {e}")
+            log.error(f"Working directory: {os.getcwd()}")
             if sketch_path:
-                print(f"Sketch path: {sketch_path}")
-            print(f"Processing path: {self.processing_path}")
+                log.error(f"Sketch path: {sketch_path}")
+            log.error(f"Processing path: {self.processing_path}")
             return False
 
+    def launch(self, cmd: List[str], cwd: Optional[str] = None) -> bool:
+        """Start the sketch process and wait until it is ready."""
+        if not self.readiness:
+            # No handshake available, fall back to a fixed wait
+            self.sketch_process = subprocess.Popen(cmd, cwd=cwd, env=self.env)
+            time.sleep(1)
+            return self.sketch_process.poll() is None
+
+        # The sketch prints the ready line from setup(), so watch its output
+        self.readiness.expect(self.engine)
+        self.sketch_process = subprocess.Popen(
+            cmd, cwd=cwd, env=self.env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1
+        )
+        self.readiness.watch_output(self.engine, self.sketch_process.stdout)
+        return self.readiness.wait(self.engine, self.sketch_process, self.startup_timeout)
+
+    def stop_sketch(self):
+        """Terminate the running sketch, killing it if it does not exit promptly."""
+        if self.sketch_process and self.sketch_process.poll() is None:
+            self.sketch_process.terminate()
+            try:
+                self.sketch_process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.sketch_process.kill()
+
     def cleanup(self):
+        self.closed = True
         try:
-            if self.sketch_process:
-                self.sketch_process.terminate()
-                time.sleep(0.5)
-                if self.sketch_process.poll() is None:
-                    self.sketch_process.kill()
+            self.stop_sketch()
                     
-            if sys.platform == "win32":
+            if sys.platform == "win32" and not self.pooled:
                 os.system('taskkill /F /IM processing-java.exe 2>nul')
                 os.system('taskkill /F /IM java.exe 2>nul')
         except Exception as e:
-            print(f"Error cleaning up Processing: {e}")
\ No newline at end of file
+            log.error(f"Error cleaning up Processing: {e}")
\ No newline at end of file
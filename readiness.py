@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Line an engine prints on stdout once it is ready (Processing sketches use this)
+READY_LINE = "PACE_READY"
+
+# Environment variable the managers set to system.ports.controller when they
+# start an engine; the engines send /ready, /pace/pong and feedback there
+# (see Modes/pace-slot.scd and PaceSlot.pde)
+CONTROLLER_PORT_VARIABLE = "PACE_CONTROLLER_PORT"
+
+def engine_environment(controller_port: int) -> dict:
+    """Environment for engine processes: the controller's own plus the controller port."""
+    env = dict(os.environ)
+    env[CONTROLLER_PORT_VARIABLE] = str(controller_port)
+    return env
+
+class ReadinessTracker:
+    """Tracks the `/ready` handshake from the engines.
+
+    An engine reports readiness either by sending ``/ready <engine>`` to the
+    controller's OSC port (SuperCollider scripts) or by printing READY_LINE on
+    its stdout (Processing sketches). Managers call ``expect`` before
+    launching an engine and ``wait`` afterwards, so startup takes exactly as
+    long as the engine needs instead of a fixed sleep.
+
+    ``wait_async`` and ``watch_output_async`` do the same for engines
+    started as asyncio subprocesses, without blocking the event loop.
+    """
+
+    def __init__(self):
+        self._events = {}
+        self._waiters = {}  # Engine -> asyncio futures of pending wait_async calls
+        self._lock = threading.Lock()
+
+    def attach(self, dispatcher):
+        """Register the `/ready` handler on a ControllerListener dispatcher."""
+        dispatcher.map("/ready", self._on_ready)
+
+    def _on_ready(self, address, *args):
+        self.mark_ready(str(args[0]) if args else "unknown")
+
+    def _event(self, engine: str) -> threading.Event:
+        with self._lock:
+            event = self._events.get(engine)
+            if event is None:
+                event = self._events[engine] = threading.Event()
+            return event
+
+    def expect(self, engine: str):
+        """Forget any earlier ready signal, call this right before (re)launching."""
+        self._event(engine).clear()
+
+    def mark_ready(self, engine: str):
+        log.debug(f"{engine} reported ready")
+        self._event(engine).set()
+        with self._lock:
+            waiters = self._waiters.pop(engine, [])
+        for waiter in waiters:
+            # May be called from a listener thread, resolve on the waiter's loop
+            waiter.get_loop().call_soon_threadsafe(_resolve, waiter)
+
+    def wait(self, engine: str, process, timeout: float) -> bool:
+        """Wait until the engine reports ready. Gives up early if its process exits."""
+        event = self._event(engine)
+        deadline = time.perf_counter() + timeout
+        while not event.wait(0.05):
+            if process is not None and process.poll() is not None:
+                log.error(f"{engine} exited with code {process.returncode} before it was ready")
+                return False
+            if time.perf_counter() >= deadline:
+                log.error(f"{engine} did not report ready within {timeout:.0f} s")
+                return False
+        return True
+
+    async def wait_async(self, engine: str, process: asyncio.subprocess.Process, timeout: float) -> bool:
+        """Await the engine's ready signal. Gives up early if its process exits."""
+        ready = asyncio.get_running_loop().create_future()
+        with self._lock:
+            if engine in self._events and self._events[engine].is_set():
+                return True
+            self._waiters.setdefault(engine, []).append(ready)
+        exited = asyncio.ensure_future(process.wait()) if process is not None else None
+        try:
+            done, _ = await asyncio.wait([f for f in (ready, exited) if f], timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if exited:
+                exited.cancel()
+            with self._lock:
+                if ready in self._waiters.get(engine, []):
+                    self._waiters[engine].remove(ready)
+        if ready in done:
+            return True
+        if exited in done:
+            log.error(f"{engine} exited with code {process.returncode} before it was ready")
+        else:
+            log.error(f"{engine} did not report ready within {timeout:.0f} s")
+        return False
+
+    async def watch_output_async(self, engine: str, stream: asyncio.StreamReader):
+        """Forward an asyncio subprocess's stdout to the log and watch it for READY_LINE."""
+        engine_log = logging.getLogger(engine)
+        async for line in stream:
+            line = line.decode(errors="replace").rstrip()
+            if line == READY_LINE:
+                self.mark_ready(engine)
+            elif line:
+                engine_log.info(line)
+
+    def watch_output(self, engine: str, stream):
+        """Forward an engine's stdout to the log and watch it for READY_LINE."""
+        engine_log = logging.getLogger(engine)
+        def forward():
+            for line in stream:
+                line = line.rstrip()
+                if line == READY_LINE:
+                    self.mark_ready(engine)
+                elif line:
+                    engine_log.info(line)
+        threading.Thread(target=forward, name=f"{engine}-output", daemon=True).start()
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
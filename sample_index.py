@@ -0,0 +1,357 @@
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import struct
+import sys
+import time
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy
+except ImportError:  # Only needed to measure the pitch, the note comes from the file name
+    numpy = None
+
+log = logging.getLogger(__name__)
+
+# One JSON object per line and sample, sorted by instrument, articulation and
+# note. Paths are relative to the library root and use forward slashes, so
+# SuperCollider can join them to its own base path. Keys without a value are
+# left out rather than written as null:
+#   path, instrument, articulation, note, midi      where and what it is
+#   pitch_hz, cents                                 measured pitch, cents off the named note (needs numpy)
+#   peak_db, rms_db                                 loudness in dBFS over the whole file
+#   start                                           seconds until the sound starts (40 dB below the peak)
+#   duration, channels, sample_rate, frames         format
+#   size, mtime_ns, v                               for incremental updates
+INDEX_NAME = "sample-index.jsonl"
+ANALYSIS_VERSION = 1  # Bump when the analysis changes, every sample is analysed again
+AUDIO_EXTENSIONS = ('.aif', '.aiff', '.wav')
+
+NOTE = re.compile(r'^([A-Ga-g])(b|#)?(-?\d)$')
+PITCH_CLASSES = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+START_THRESHOLD_DB = -40.0
+PITCH_WINDOW = 16384  # Samples analysed for the pitch, after the attack
+
+def note_to_midi(name: str) -> Optional[int]:
+    """MIDI note of a name like C4, Db4 or F#3 (C4 = 60), or None."""
+    match = NOTE.match(name)
+    if not match:
+        return None
+    letter, accidental, octave = match.groups()
+    offset = {'b': -1, '#': 1}.get(accidental, 0)
+    return (int(octave) + 1) * 12 + PITCH_CLASSES[letter.lower()] + offset
+
+def describe(relative: str) -> dict:
+    """Instrument, articulation and note from a library path like Flute/Flute.vib.ff.stereo/Flute.vib.ff.C4.stereo.aiff.
+
+    The instrument is the top folder, the articulation the second part of
+    the sample folder's name (as in G.A.S.'s sample-config.scd) and the
+    note the first part of the file name that reads as one.
+    """
+    parts = relative.split('/')
+    folder = parts[-2] if len(parts) > 1 else ""
+    tokens = folder.split('.')
+    info = {'instrument': parts[0].lower() if len(parts) > 1 else "",
+            'articulation': tokens[1] if len(tokens) > 1 else ""}
+    for token in os.path.splitext(parts[-1])[0].split('.'):
+        midi = note_to_midi(token)
+        if midi is not None:
+            info.update(note=token, midi=midi)
+            break
+    return info
+
+def _extended(data: bytes) -> float:
+    """80-bit IEEE extended float (the AIFF sample rate)."""
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
+
+def read_audio(path: str) -> Tuple[int, int, int, bytes, bool]:
+    """``(channels, sample_rate, sample_width, frames data, big_endian)`` of a PCM WAV or AIFF file."""
+    if path.lower().endswith('.wav'):
+        with wave.open(path, "rb") as wav:
+            return (wav.getnchannels(), wav.getframerate(), wav.getsampwidth(),
+                    wav.readframes(wav.getnframes()), False)
+
+    with open(path, "rb") as file:
+        data = file.read()
+    form, _, kind = struct.unpack_from('>4sI4s', data, 0)
+    if form != b'FORM' or kind not in (b'AIFF', b'AIFC'):
+        raise ValueError("not an AIFF file")
+    channels = sample_rate = width = None
+    frames = b""
+    big_endian = True
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk, size = struct.unpack_from('>4sI', data, pos)
+        body = pos + 8
+        if chunk == b'COMM':
+            channels, count, bits = struct.unpack_from('>hIh', data, body)
+            sample_rate = int(round(_extended(data[body + 8:body + 18])))
+            width = (bits + 7) // 8
+            if kind == b'AIFC':
+                compression = data[body + 18:body + 22]
+                if compression == b'sowt':
+                    big_endian = False
+                elif compression != b'NONE':
+                    raise ValueError(f"compressed AIFC ({compression.decode(errors='replace')})")
+        elif chunk == b'SSND':
+            offset = struct.unpack_from('>I', data, body)[0]
+            frames = data[body + 8 + offset:body + size]
+        pos = body + size + (size & 1)
+    if channels is None:
+        raise ValueError("no COMM chunk")
+    return channels, sample_rate, width, frames[:len(frames) - len(frames) % (channels * width)], big_endian
+
+def _samples(data: bytes, width: int, big_endian: bool):
+    """Integer samples, interleaved, as a numpy array or an array('i')."""
+    if numpy is not None:
+        if width == 3:
+            raw = numpy.frombuffer(data, dtype=numpy.uint8).reshape(-1, 3).astype(numpy.int32)
+            if big_endian:
+                raw = raw[:, ::-1]
+            return (raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)) << 8 >> 8
+        if width == 1:
+            # WAV 8-bit is unsigned, AIFF 8-bit signed
+            if big_endian:
+                return numpy.frombuffer(data, dtype=numpy.int8).astype(numpy.int32)
+            return numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.int32) - 128
+        return numpy.frombuffer(data, dtype=f"{'>' if big_endian else '<'}i{width}").astype(numpy.int64)
+
+    if width == 3:
+        order = "big" if big_endian else "little"
+        return array('i', (int.from_bytes(data[i:i + 3], order, signed=True) for i in range(0, len(data), 3)))
+    if width == 1:
+        # WAV 8-bit is unsigned, AIFF 8-bit signed
+        return array('i', (b - 128 for b in data) if not big_endian else (b - 256 if b > 127 else b for b in data))
+    samples = array({2: 'h', 4: 'i'}[width], data)
+    if big_endian != (sys.byteorder == "big"):
+        samples.byteswap()
+    return samples
+
+def _db(value: float) -> float:
+    return round(20 * math.log10(value), 2) if value > 0 else -120.0
+
+def _pitch(mono, sample_rate: int, start: int, expected_midi: Optional[int]) -> Optional[float]:
+    """Fundamental in Hz from the autocorrelation of a window after the attack.
+
+    With the named note known the peak is searched within a semitone of
+    it, which keeps octave errors out.
+    """
+    begin = start + int(0.05 * sample_rate)
+    window = mono[begin:begin + PITCH_WINDOW]
+    if len(window) < PITCH_WINDOW // 4:
+        window = mono[-PITCH_WINDOW:]
+    taper = numpy.hanning(len(window))
+
+    def autocorrelation(signal):
+        spectrum = numpy.fft.rfft(signal, 2 * len(signal))
+        return numpy.fft.irfft(spectrum * numpy.conj(spectrum))[:len(signal)]
+
+    # Divided by the taper's own autocorrelation, which falls off with the
+    # lag and would pull low notes sharp
+    correlation = autocorrelation((window - window.mean()) * taper)
+    if correlation[0] <= 0:
+        return None
+    correlation = correlation / numpy.maximum(autocorrelation(taper), 1e-9)
+    if expected_midi is not None:
+        expected = 440.0 * 2 ** ((expected_midi - 69) / 12)
+        low, high = expected / 2 ** (1 / 12), expected * 2 ** (1 / 12)
+    else:
+        low, high = 27.5, 4200.0
+    shortest, longest = int(sample_rate / high), int(math.ceil(sample_rate / low))
+    if longest + 1 >= len(correlation) or shortest < 1:
+        return None
+    lag = shortest + int(numpy.argmax(correlation[shortest:longest + 1]))
+    # Parabolic interpolation between the neighbouring lags
+    a, b, c = correlation[lag - 1], correlation[lag], correlation[lag + 1]
+    shift = 0.5 * (a - c) / (a - 2 * b + c) if a - 2 * b + c else 0.0
+    return sample_rate / (lag + shift)
+
+def analyse_sample(job: Tuple[str, str]) -> dict:
+    """Index record of one sample file, run in the worker processes. ``job`` is ``(root, relative path)``."""
+    root, relative = job
+    path = os.path.join(root, relative)
+    try:
+        stat = os.stat(path)
+        channels, sample_rate, width, data, big_endian = read_audio(path)
+        frames = len(data) // (channels * width)
+        record = {'path': relative}
+        record.update(describe(relative))
+        record.update(duration=round(frames / sample_rate, 4) if sample_rate else 0.0, channels=channels,
+                      sample_rate=sample_rate, frames=frames, size=stat.st_size, mtime_ns=stat.st_mtime_ns,
+                      v=ANALYSIS_VERSION)
+        if not frames:
+            return record
+
+        full_scale = float(1 << (8 * width - 1))
+        samples = _samples(data, width, big_endian)
+        if numpy is not None:
+            mono = samples.reshape(-1, channels).mean(axis=1) / full_scale
+            peak = float(numpy.abs(mono).max())
+            rms = float(numpy.sqrt(numpy.mean(mono * mono)))
+            loud = numpy.flatnonzero(numpy.abs(mono) >= peak * 10 ** (START_THRESHOLD_DB / 20))
+            start = int(loud[0]) if len(loud) else 0
+        else:
+            # Loudness of the interleaved channels, no pitch
+            peak = max(max(samples), -min(samples)) / full_scale
+            rms = math.sqrt(math.fsum(s * s for s in samples) / len(samples)) / full_scale
+            threshold = peak * full_scale * 10 ** (START_THRESHOLD_DB / 20)
+            start = next((i for i, s in enumerate(samples) if abs(s) >= threshold), 0) // channels
+        record.update(peak_db=_db(peak), rms_db=_db(rms), start=round(start / sample_rate, 4))
+
+        if numpy is not None and peak > 0:
+            pitch = _pitch(mono, sample_rate, start, record.get('midi'))
+            if pitch:
+                record['pitch_hz'] = round(pitch, 2)
+                if 'midi' in record:
+                    record['cents'] = round(1200 * math.log2(pitch / (440.0 * 2 ** ((record['midi'] - 69) / 12))), 1)
+        return record
+    except Exception as e:
+        return {'path': relative, 'error': str(e)}
+
+def scan(root: str, folders: Sequence[str] = ()) -> Dict[str, os.stat_result]:
+    """Audio files under the given folders of the library (all of it without folders), by relative path."""
+    found = {}
+    for folder in folders or [""]:
+        top = os.path.join(root, folder)
+        if not os.path.isdir(top):
+            log.warning(f"Sample folder {top} does not exist")
+            continue
+        for current, dirs, names in os.walk(top):
+            dirs.sort()
+            for name in sorted(names):
+                if name.lower().endswith(AUDIO_EXTENSIONS) and not name.startswith('.'):
+                    path = os.path.join(current, name)
+                    found[os.path.relpath(path, root).replace(os.sep, '/')] = os.stat(path)
+    return found
+
+def load_index(path: str) -> Dict[str, dict]:
+    """Records of an index file by path, empty if there is none yet."""
+    records = {}
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    records[record['path']] = record
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError) as e:
+        log.warning(f"Ignoring unreadable sample index {path}: {e}")
+        return {}
+    return records
+
+def write_index(path: str, records: List[dict]):
+    """Write the records sorted by instrument, articulation and note, replacing the file in one go."""
+    records = sorted(records, key=lambda r: (r.get('instrument', ""), r.get('articulation', ""),
+                                             r.get('midi', -1), r['path']))
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, "w", encoding="utf-8", newline="\n") as file:
+        for record in records:
+            file.write(json.dumps(record, separators=(',', ':')) + "\n")
+    os.replace(temp, path)
+
+def update_index(root: str, folders: Sequence[str] = (), index_path: Optional[str] = None,
+                 workers: int = 0, force: bool = False) -> dict:
+    """Bring the index of a sample library up to date and return counts of what changed.
+
+    Only files that are new, or whose size or mtime changed since they
+    were indexed, are analysed, in a pool of ``workers`` processes (0: one
+    per core). Records of files that are gone are dropped.
+    """
+    started = time.perf_counter()
+    index_path = index_path or os.path.join(root, INDEX_NAME)
+    old = {} if force else load_index(index_path)
+    files = scan(root, folders)
+
+    keep, stale = [], []
+    for relative, stat in files.items():
+        record = old.get(relative)
+        if (record is not None and record.get('size') == stat.st_size and record.get('mtime_ns') == stat.st_mtime_ns
+                and record.get('v') == ANALYSIS_VERSION):
+            keep.append(record)
+        else:
+            stale.append(relative)
+    counts = {'unchanged': len(keep), 'new': sum(1 for path in stale if path not in old),
+              'changed': sum(1 for path in stale if path in old),
+              'removed': sum(1 for path in old if path not in files), 'failed': 0}
+
+    analysed = []
+    if stale:
+        workers = min(workers or os.cpu_count() or 1, len(stale))
+        jobs = [(root, relative) for relative in stale]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(analyse_sample, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+        else:
+            results = [analyse_sample(job) for job in jobs]
+        for record in results:
+            if 'error' in record:
+                log.warning(f"Could not index {record['path']}: {record['error']}")
+                counts['failed'] += 1
+            else:
+                analysed.append(record)
+
+    if stale or counts['removed'] or not os.path.exists(index_path):
+        write_index(index_path, keep + analysed)
+    counts['seconds'] = time.perf_counter() - started
+    log.info(f"Sample index {index_path}: {counts['new']} new, {counts['changed']} changed, "
+             f"{counts['removed']} removed, {counts['unchanged']} unchanged"
+             + (f", {counts['failed']} failed" if counts['failed'] else "")
+             + f" in {counts['seconds']:.2f} s" + (f" ({workers} workers)" if stale else ""))
+    return counts
+
+def refresh_index(settings: dict):
+    """Update the index from the `system.sample_index` settings at controller startup; errors are logged."""
+    root = settings.get('root')
+    if not root or not os.path.isdir(root):
+        log.warning(f"Sample library {root!r} not found, not updating the sample index")
+        return
+    try:
+        update_index(root, settings.get('folders') or (), settings.get('index'), settings.get('workers', 0))
+    except Exception as e:
+        log.error(f"Error updating the sample index: {e}")
+
+def main():
+    # Imported here, the controller only needs refresh_index
+    from config_loader import read_config
+
+    parser = argparse.ArgumentParser(description="Index a sample library for SuperCollider (see G.A.S.'s main.scd)")
+    parser.add_argument("root", nargs="?", help="Library folder (default: system.sample_index.root in the config)")
+    parser.add_argument("--folders", nargs="*", help="Only these folders under the root")
+    parser.add_argument("--index", help=f"Index file (default: {INDEX_NAME} in the root)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="Analyse every sample again")
+    parser.add_argument("--config", default="config.yml", help="Controller config file")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    settings = {}
+    if not args.root:
+        settings = read_config(args.config)['system'].get('sample_index') or {}
+    root = args.root or settings.get('root')
+    if not root:
+        print("No library folder given and no system.sample_index.root in the config")
+        sys.exit(1)
+    if not os.path.isdir(root):
+        print(f"Sample library {root} not found")
+        sys.exit(1)
+    if numpy is None:
+        log.info("numpy is not installed: notes come from the file names, pitches are not measured")
+    update_index(root, args.folders if args.folders is not None else settings.get('folders') or (),
+                 args.index or settings.get('index'),
+                 args.workers if args.workers is not None else settings.get('workers', 0), args.force)
+
+if __name__ == "__main__":
+    main()
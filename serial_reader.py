@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+import serial
+from teensy_protocol import EVENT_POT, EVENT_FEEDBACK
+
+log = logging.getLogger(__name__)
+
+FEEDBACK_LANE = -1
+
+class InputQueue:
+    """Queue of ``(timestamp, event)`` items between the reader threads and the main loop.
+
+    Pot events are bounded per device: once ``maxsize`` of a device's pot
+    events are waiting, its oldest one is dropped for the new one, since a
+    newer reading supersedes it, and a flooding controller cannot push out
+    another's values. Engine feedback has one more such lane, so a chatty
+    engine cannot hold up the controllers. Button and matrix presses (and
+    wake-ups, where the event is None) are never dropped. ``get`` returns items from every lane
+    in arrival order.
+
+    Same interface as the ``queue.Queue`` it replaces; ``put`` never blocks
+    and never raises ``queue.Full``.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = max(1, maxsize)
+        self._pots = {}  # Device index (FEEDBACK_LANE for engine feedback) -> deque of events
+        self._presses = deque()
+        self._next = 0  # Arrival number, orders the lanes
+        self._size = 0
+        self._ready = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item, block: bool = True, timeout: float = None):
+        event = item[1]
+        with self._ready:
+            entry = (self._next, item)
+            self._next += 1
+            if event is not None and (event[0] == EVENT_POT or event[0] == EVENT_FEEDBACK):
+                if event[0] == EVENT_POT:
+                    device = event[3] if len(event) > 3 else 0
+                else:
+                    device = FEEDBACK_LANE
+                lane = self._pots.get(device)
+                if lane is None:
+                    lane = self._pots[device] = deque()
+                if len(lane) >= self.maxsize:
+                    lane.popleft()
+                    self.dropped += 1
+                    self._size -= 1
+                lane.append(entry)
+            else:
+                self._presses.append(entry)
+            self._size += 1
+            self._ready.notify()
+
+    def put_nowait(self, item):
+        self.put(item)
+
+    def get(self, block: bool = True, timeout: float = None):
+        with self._ready:
+            if not self._ready.wait_for(self.qsize, timeout if block else 0):
+                raise queue.Empty
+            first = self._presses
+            for lane in self._pots.values():
+                if lane and (not first or lane[0][0] < first[0][0]):
+                    first = lane
+            self._size -= 1
+            return first.popleft()[1]
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return not self._size
+
+class SerialReader:
+    """Reads the Teensy serial port on a background thread.
+
+    The thread blocks inside ``serial.read`` until bytes arrive, so nothing
+    runs while the controller is idle. The bytes go through the protocol
+    decoder (see teensy_protocol.py) and each decoded event is handed to the
+    main loop through a bounded queue (an InputQueue in the controller) as a
+    ``(timestamp, event)`` tuple, where the timestamp is the
+    ``time.perf_counter()`` value at which it was read.
+
+    With several controllers each has its own reader, so a slow or stuck
+    port only blocks its own thread. Readers with a nonzero ``device``
+    index append it to their events (see input_devices.py).
+
+    Without ``reconnect`` a read error ends the thread and is left in
+    ``error`` for the main loop. With it, the port is dropped and
+    ``reconnect()`` is called on this thread until the device is back; it
+    returns the reopened port, or None to give up. A ``serial_port`` of None
+    starts the reader waiting for the device.
+
+    A ``recorder`` (see input_replay.py) gets every read's raw bytes, and a
+    ``decode_times`` histogram (see latency_stats.py) the decoding time of
+    each read.
+    """
+
+    def __init__(self, serial_port: Optional[serial.Serial], event_queue: queue.Queue, decoder,
+                 device: int = 0, name: str = "teensy", reconnect: Optional[Callable] = None,
+                 recorder=None, decode_times=None):
+        self.serial = serial_port
+        self.queue = event_queue
+        self.decoder = decoder
+        self.device = device
+        self.name = name
+        self.reconnect = reconnect
+        self.recorder = recorder
+        self.decode_times = decode_times
+        self.running = False
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        """Start the reader thread."""
+        self.running = True
+        self._thread = threading.Thread(target=self._read_loop, name=f"serial-reader-{self.name}",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the reader thread and wait for it to exit."""
+        self.running = False
+        try:
+            # Wake up a read that is currently blocked on the port
+            if self.serial is not None:
+                self.serial.cancel_read()
+        except Exception:
+            pass
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def _read_loop(self):
+        while self.running:
+            if self.serial is None:
+                self.serial = self.reconnect()
+                if self.serial is None:
+                    break
+                self.decoder.reset()  # A line cut off by the disconnect is garbage
+                continue
+            try:
+                # Blocks until at least one byte arrives (or the port timeout expires),
+                # then grabs whatever else is already buffered in the same call
+                data = self.serial.read(self.serial.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                if not self.running:
+                    break
+                log.error(f"Serial read error on {self.name}: {e}")
+                if self.reconnect is None:
+                    self.error = e
+                    self.running = False
+                    break
+                self.serial = None
+                continue
+
+            if not data:
+                continue
+
+            timestamp = time.perf_counter()
+            if self.recorder is not None:
+                self.recorder.write(timestamp, data)
+            events = self.decoder.feed(data)
+            if self.decode_times is not None:
+                self.decode_times.record(time.perf_counter() - timestamp)
+            device = self.device
+            for event in events:
+                self._put((timestamp, event + (device,) if device else event))
+
+    def _put(self, item):
+        """Queue an event; the InputQueue drops stale pot values itself, so this never blocks."""
+        self.queue.put_nowait(item)
+
+class SerialProtocol(asyncio.Protocol):
+    """Teensy serial input for the asyncio controller (pyserial-asyncio transport).
+
+    The event loop calls ``data_received`` with whatever bytes arrived; they
+    go through the protocol decoder and each event is passed straight to
+    ``on_event(timestamp, event)`` on the loop thread, with no queue or
+    thread hop in between. ``closed`` is resolved when the port goes away.
+    A nonzero ``device`` index is appended to the events, a ``recorder``
+    gets the raw bytes and ``decode_times`` the decoding time, as in
+    SerialReader.
+    """
+
+    def __init__(self, decoder, on_event, device: int = 0, recorder=None, decode_times=None):
+        self.decoder = decoder
+        self.on_event = on_event
+        self.device = device
+        self.recorder = recorder
+        self.decode_times = decode_times
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        timestamp = time.perf_counter()
+        if self.recorder is not None:
+            self.recorder.write(timestamp, data)
+        events = self.decoder.feed(data)
+        if self.decode_times is not None:
+            self.decode_times.record(time.perf_counter() - timestamp)
+        device = self.device
+        for event in events:
+            self.on_event(timestamp, event + (device,) if device else event)
+
+    def connection_lost(self, exc):
+        if exc:
+            log.error(f"Serial read error: {exc}")
+        if not self.closed.done():
+            self.closed.set_result(exc)
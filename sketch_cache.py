@@ -0,0 +1,192 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+STAMP_FILE = "pace-build.json"
+SOURCE_EXTENSIONS = ('.pde', '.java')
+ASSET_FOLDERS = ('data', 'code')  # Loaded at runtime (data) or compiled in (code)
+
+def sketch_hash(sketch_path: str) -> str:
+    """Content hash of a sketch's source files plus its data/ and code/ folders.
+
+    The output/ folder and anything else in the sketch folder are ignored,
+    so running a sketch does not invalidate its cached build.
+    """
+    files = []
+    for name in os.listdir(sketch_path):
+        if os.path.isfile(os.path.join(sketch_path, name)) and (
+                name.endswith(SOURCE_EXTENSIONS) or name == "sketch.properties"):
+            files.append(name)
+    for folder in os.listdir(sketch_path):
+        # Matched case-insensitively, a sketch folder may use Data/
+        if folder.lower() not in ASSET_FOLDERS:
+            continue
+        for root, dirs, names in os.walk(os.path.join(sketch_path, folder)):
+            dirs.sort()
+            files.extend(os.path.relpath(os.path.join(root, name), sketch_path) for name in names)
+
+    digest = hashlib.sha256()
+    for relative in sorted(files):
+        path = os.path.join(sketch_path, relative)
+        digest.update(relative.replace(os.sep, "/").encode())
+        digest.update(os.path.getsize(path).to_bytes(8, "big"))
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 16), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+class SketchCache:
+    """Exported builds of Processing sketches, keyed by a content hash of the sketch.
+
+    ``build`` exports a sketch as an application (``processing-java
+    --export``) into ``<cache_dir>/<sketch>`` and stamps it with the
+    sketch's hash. ``lookup`` returns a ``java -cp`` command for that build
+    while the hash still matches, which skips the compile processing-java
+    does on every ``--run``.
+    """
+
+    def __init__(self, cache_dir: str, processing_path: str, java_path: Optional[str] = None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.processing_path = processing_path
+        self.java_path = java_path
+
+    def entry_dir(self, sketch_name: str) -> str:
+        return os.path.join(self.cache_dir, sketch_name)
+
+    def cached_hash(self, sketch_name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self.entry_dir(sketch_name), STAMP_FILE), "r") as file:
+                return json.load(file).get('hash')
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, sketch_name: str, sketch_path: str) -> bool:
+        cached = self.cached_hash(sketch_name)
+        return cached is not None and cached == sketch_hash(sketch_path)
+
+    def lookup(self, sketch_name: str, sketch_path: str) -> Optional[Tuple[List[str], str]]:
+        """Return (command, working directory) to run the cached build, or None if it is stale or missing."""
+        if not self.is_fresh(sketch_name, sketch_path):
+            return None
+        app_dir = self.entry_dir(sketch_name)
+        jar = self._find_jar(app_dir, sketch_name)
+        if jar is None:
+            log.warning(f"Cached build of {sketch_name} has no {sketch_name}.jar, ignoring it")
+            return None
+
+        lib_dir = os.path.dirname(jar)
+        # Exported sketches load data/ relative to the working directory
+        run_dir = lib_dir if os.path.isdir(os.path.join(lib_dir, "data")) else os.path.dirname(lib_dir)
+        cmd = [
+            self.find_java(app_dir),
+            "-Djna.nosys=true",
+            "-Djava.library.path=" + os.pathsep.join([run_dir, lib_dir]),
+            "-cp", os.path.join(lib_dir, "*"),
+            sketch_name
+        ]
+        return cmd, run_dir
+
+    def find_java(self, app_dir: str) -> str:
+        """Configured java, else the one embedded in the export or bundled with Processing, else PATH."""
+        if self.java_path:
+            return self.java_path
+        exe = "java.exe" if sys.platform == "win32" else "java"
+        candidates = [
+            os.path.join(app_dir, "java", "bin", exe),
+            os.path.join(os.path.dirname(self.processing_path), "java", "bin", exe),
+        ]
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+        return "java"
+
+    @staticmethod
+    def _find_jar(app_dir: str, sketch_name: str) -> Optional[str]:
+        # lib/ on Windows and Linux, <sketch>.app/Contents/Java on macOS
+        for root, dirs, names in os.walk(app_dir):
+            if f"{sketch_name}.jar" in names:
+                return os.path.join(root, f"{sketch_name}.jar")
+        return None
+
+    def build(self, sketch_name: str, sketch_path: str) -> bool:
+        """Export a sketch into the cache. The old build is only replaced once the new one succeeded."""
+        digest = sketch_hash(sketch_path)
+        target = self.entry_dir(sketch_name)
+        staging = target + ".building"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        cmd = [
+            self.processing_path,
+            "--force",
+            "--sketch=" + sketch_path,
+            "--output=" + staging,
+            "--export"
+        ]
+        log.info(f"Building {sketch_name}...")
+        log.debug(f"Command: {' '.join(cmd)}")
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        except OSError as e:
+            log.error(f"Could not run {self.processing_path}: {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0 or self._find_jar(staging, sketch_name) is None:
+            log.error(f"Building {sketch_name} failed:\n{result.stdout.strip()}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return False
+
+        with open(os.path.join(staging, STAMP_FILE), "w") as file:
+            json.dump({'sketch': sketch_name, 'hash': digest, 'built': time.time(),
+                       'build_seconds': round(elapsed, 2)}, file)
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging, target)
+        log.info(f"Built {sketch_name} in {elapsed:.1f} s")
+        return True
+
+def main():
+    # Imported here so the manager can import this module without a cycle
+    from config_loader import read_config
+    from log_setup import LOG_FORMAT, DATE_FORMAT
+    from processing_manager import ProcessingManager
+
+    parser = argparse.ArgumentParser(description="Prebuild the Processing sketches of every mode into the sketch cache")
+    parser.add_argument("sketches", nargs="*", help="Only build these sketches")
+    parser.add_argument("--config", default="config.yml", help="Controller config file")
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the cached build is up to date")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, datefmt=DATE_FORMAT)
+
+    config = read_config(args.config)
+    config['system'].setdefault('sketch_cache', {})['enabled'] = True
+    manager = ProcessingManager(config)
+
+    failed = 0
+    for mode_name, mode_config in config['modes'].items():
+        sketch_name = (mode_config.get('processing') or {}).get('sketch')
+        if not sketch_name or (args.sketches and sketch_name not in args.sketches):
+            continue
+        sketch_path = manager.find_sketch_path(sketch_name)
+        if sketch_path is None:
+            log.error(f"Could not find sketch {sketch_name} for mode {mode_name}")
+            failed += 1
+            continue
+        if not args.force and manager.cache.is_fresh(sketch_name, sketch_path):
+            log.info(f"{sketch_name} is up to date")
+            continue
+        if not manager.cache.build(sketch_name, sketch_path):
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
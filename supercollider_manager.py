@@ -1,66 +1,176 @@
+import logging
 import sys
 import os
 import time
 import subprocess
+from typing import List, Optional, Tuple
+from asset_registry import AssetRegistry
+from config_loader import SystemConfig
+from osc_packets import OSCTarget
+from readiness import engine_environment
+
+log = logging.getLogger(__name__)
 
 class SuperColliderManager:
-    def __init__(self, config):
+    def __init__(self, config, readiness=None, assets: Optional[AssetRegistry] = None):
         self.config = config
+        self.readiness = readiness
+        self.assets = assets or AssetRegistry(config)
+        system = SystemConfig.from_dict(config['system'])
+        self.startup_timeout = system.defaults.engine_timeout
+        self.startup_retries = system.defaults.engine_retries
+        self.env = engine_environment(system.ports.controller)  # Tells the scripts where to send /ready
         self.sclang_process = None
-        self.current_mode = config['system']['defaults']['initial_mode']
+        self.current_mode = system.defaults.initial_mode
+        # Set by the engine pool for its slots (see engine_pool.py)
+        self.engine = 'supercollider'  # Name the script reports in /ready
+        self.script_args = []          # Extra arguments passed to the script
+        self.pooled = False            # Other slots run their own servers, never kill them all
+        self.closed = False            # Set by cleanup(), stops a running start from relaunching
+
+        # Resident host: one sclang for the whole session, mode scripts are loaded into it over OSC
+        self.resident = system.defaults.supercollider_host
+        self.host_script = os.path.join(self.assets.root, "pace-host.scd")
+        self.host = OSCTarget("127.0.0.1", system.ports.supercollider)
         
         if sys.platform == "win32":
-            self.sclang_path = self.config['system']['paths']['supercollider_win']
+            self.sclang_path = system.paths.supercollider_win
         else:
             self.sclang_path = "sclang"
-            
-        self.start_supercollider()
         
     def set_current_mode(self, mode_name):
         """Update current mode"""
         self.current_mode = mode_name
         
+    def script_path(self) -> Optional[str]:
+        """Absolute path of the current mode's script, or None if it does not exist."""
+        sc_script = self.assets.script_path(self.current_mode)
+        if sc_script is None or not os.path.exists(sc_script):
+            script_name = self.config['modes'][self.current_mode]['supercollider']['script']
+            log.error(f"SuperCollider script {script_name} for mode {self.current_mode} not found in {self.assets.root}")
+            return None
+        return sc_script
+
+    def script_command(self) -> Optional[Tuple[List[str], str]]:
+        """Return (command, working directory) to run the current mode's script on its own sclang."""
+        sc_script = self.script_path()
+        if sc_script is None:
+            return None
+        return [self.sclang_path, sc_script] + [str(arg) for arg in self.script_args], os.path.dirname(sc_script)
+
     def start_supercollider(self) -> bool:
+        if self.resident:
+            return self.load_mode()
+
         try:
             if self.sclang_process:
                 self.sclang_process.terminate()
                 self.sclang_process.wait()
                 
-            # Get the script name from the current mode
-            sc_script_name = self.config['modes'][self.current_mode]['supercollider']['script']
-            
-            # Check if the script has a file extension, add .scd if not
-            if not sc_script_name.endswith('.scd'):
-                sc_script_name += '.scd'
-                
-            # Find the script in the modes folder structure
-            mode_dir = os.path.abspath(f"modes/{self.current_mode}")
-            sc_script = os.path.join(mode_dir, sc_script_name)
-            
-            if not os.path.exists(sc_script):
-                print(f"SuperCollider script not found at {sc_script}")
+            command = self.script_command()
+            if command is None:
                 return False
+            cmd, mode_dir = command
                 
-            print(f"Starting SuperCollider with script: {sc_script}")
-            self.sclang_process = subprocess.Popen(
-                [self.sclang_path, sc_script],
-                cwd=mode_dir
-            )
-            time.sleep(2)  # Give SC time to boot
-            return True
+            for attempt in range(1 + self.startup_retries):
+                if self.closed:
+                    return False
+                if attempt:
+                    log.warning(f"Retrying SuperCollider (attempt {attempt + 1})")
+                    self.sclang_process.terminate()
+                    self.sclang_process.wait()
+                log.info(f"Starting SuperCollider with script: {cmd[1]}")
+                ok = self.launch(cmd, mode_dir)
+                if self.closed:
+                    # cleanup() ran while sclang was starting
+                    self.sclang_process.terminate()
+                    return False
+                if ok:
+                    return True
+            return False
             
         except Exception as e:
-            print(f"Error starting SuperCollider: {e}")
+            log.error(f"Error starting SuperCollider: {e}")
             return False
             
+    def launch(self, cmd, cwd, engine: Optional[str] = None) -> bool:
+        """Start sclang and wait for the script's /ready message."""
+        engine = engine or self.engine
+        if not self.readiness:
+            # No handshake available, fall back to a fixed wait
+            self.sclang_process = subprocess.Popen(cmd, cwd=cwd, env=self.env)
+            time.sleep(2)  # Give SC time to boot
+            return self.sclang_process.poll() is None
+
+        self.readiness.expect(engine)
+        self.sclang_process = subprocess.Popen(cmd, cwd=cwd, env=self.env)
+        return self.readiness.wait(engine, self.sclang_process, self.startup_timeout)
+
+    def host_running(self) -> bool:
+        return self.sclang_process is not None and self.sclang_process.poll() is None
+
+    def load_mode(self) -> bool:
+        """Load the current mode's script into the resident host, starting the host first if needed.
+
+        The host unloads the previous mode itself (see Modes/pace-host.scd).
+        """
+        try:
+            sc_script = self.script_path()
+            if sc_script is None:
+                return False
+
+            for attempt in range(1 + self.startup_retries):
+                if self.closed:
+                    return False
+                if attempt:
+                    log.warning(f"Retrying SuperCollider mode load (attempt {attempt + 1})")
+                if not self.host_running():
+                    log.info(f"Starting SuperCollider host: {self.host_script}")
+                    if not self.launch([self.sclang_path, self.host_script],
+                                       os.path.dirname(self.host_script), 'supercollider-host'):
+                        self.stop_host()
+                        continue
+
+                log.info(f"Loading {self.current_mode} into the SuperCollider host")
+                if not self.readiness:
+                    self.host.send_message("/pace/load", [self.current_mode, sc_script])
+                    time.sleep(1)  # No handshake available, fall back to a fixed wait
+                    return self.host_running()
+                self.readiness.expect(self.engine)
+                self.host.send_message("/pace/load", [self.current_mode, sc_script])
+                if self.readiness.wait(self.engine, self.sclang_process, self.startup_timeout):
+                    return True
+                # A script that hangs or crashes sclang takes the host down with it, start over
+                self.stop_host()
+            return False
+
+        except Exception as e:
+            log.error(f"Error loading mode into SuperCollider host: {e}")
+            return False
+
+    def stop_host(self):
+        """Ask the resident host to quit, killing it if it does not exit promptly."""
+        if not self.host_running():
+            return
+        try:
+            self.host.send_message("/pace/quit", None)
+            self.sclang_process.wait(timeout=3)
+        except (OSError, subprocess.TimeoutExpired):
+            self.sclang_process.terminate()
+            self.sclang_process.wait(timeout=5)
+
     def cleanup(self):
+        self.closed = True
         try:
+            if self.resident:
+                # Lets the host free the mode and quit scsynth before sclang exits
+                self.stop_host()
             if self.sclang_process:
                 self.sclang_process.terminate()
                 self.sclang_process.wait(timeout=5)
                 
-            if sys.platform == "win32":
+            if sys.platform == "win32" and not self.pooled:
                 os.system('taskkill /F /IM sclang.exe 2>nul')
                 os.system('taskkill /F /IM scsynth.exe 2>nul')
         except Exception as e:
-            print(f"Error cleaning up SuperCollider: {e}")
\ No newline at end of file
+            log.error(f"Error cleaning up SuperCollider: {e}")
\ No newline at end of file
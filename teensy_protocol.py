@@ -0,0 +1,173 @@
+import logging
+import struct
+from typing import List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+# Event kinds shared by both wire formats. Events are (kind, index, value)
+# tuples with 0-based indices: btn0-6, mbtn_0-15 and pot1-3 become
+# (EVENT_BUTTON, 0-6, 0), (EVENT_MATRIX, 0-15, 0) and (EVENT_POT, 0-2, value).
+EVENT_BUTTON = 0
+EVENT_MATRIX = 1
+EVENT_POT = 2
+# Not on the wire: engine OSC sent to the controller port, as
+# (EVENT_FEEDBACK, address, args) (see ControllerCore.feedback_handler)
+EVENT_FEEDBACK = 3
+
+# Binary frame: sync byte, kind, index, 16-bit big-endian value, checksum.
+# The checksum is the low byte of the sum of the kind, index and value bytes.
+SYNC_BYTE = 0xA5
+FRAME = struct.Struct('>BBBHB')
+FRAME_SIZE = FRAME.size
+
+PROTOCOLS = ("text", "binary")
+
+Event = Tuple[int, int, int]
+
+def parse_text_line(line: str) -> Optional[Event]:
+    """Parse one line of the text protocol (`btn2`, `mbtn_5`, `pot1:2048`)."""
+    if line.startswith("btn"):
+        try:
+            return (EVENT_BUTTON, int(line[3:]), 0)
+        except ValueError:
+            log.warning(f"Invalid button format: {line}")
+    elif line.startswith("mbtn_"):
+        try:
+            return (EVENT_MATRIX, int(line[5:]), 0)
+        except ValueError:
+            log.warning(f"Invalid matrix button format: {line}")
+    elif line.startswith("pot"):
+        try:
+            colon_pos = line.find(":")
+            if colon_pos > 0:
+                return (EVENT_POT, int(line[3:colon_pos]) - 1, int(line[colon_pos + 1:]))
+        except ValueError:
+            log.warning(f"Invalid pot format: {line}")
+    else:
+        log.warning(f"Unknown data format: {line}")
+    return None
+
+def encode_text_event(kind: int, index: int, value: int = 0) -> bytes:
+    """Encode an event the way the Teensy prints it in text mode."""
+    if kind == EVENT_BUTTON:
+        return f"btn{index}\n".encode()
+    if kind == EVENT_MATRIX:
+        return f"mbtn_{index}\n".encode()
+    return f"pot{index + 1}:{value}\n".encode()
+
+def encode_binary_event(kind: int, index: int, value: int = 0) -> bytes:
+    """Encode an event as one binary frame (the Teensy firmware must match this)."""
+    checksum = (kind + index + (value >> 8) + (value & 0xFF)) & 0xFF
+    return FRAME.pack(SYNC_BYTE, kind, index, value, checksum)
+
+class LineFramer:
+    """Splits an arbitrarily chunked byte stream into newline-terminated frames.
+
+    One bytearray is reused as the receive buffer: a chunk may hold several
+    lines or end in the middle of one, and the partial line waits there for
+    the rest. Surrounding whitespace (including the CR of CRLF endings) and
+    empty lines are dropped. A partial line longer than ``max_line`` (line
+    noise, wrong baud rate) is discarded up to its newline, so the buffer
+    cannot grow without bound.
+    """
+
+    def __init__(self, max_line: int = 256):
+        self.max_line = max_line
+        self._buffer = bytearray()
+        self._skipping = False
+        self.overflows = 0
+
+    def reset(self):
+        """Forget a partial line, e.g. after the port was reopened."""
+        self._buffer.clear()
+        self._skipping = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            if self._skipping:
+                self._skipping = False  # End of an overlong line
+            else:
+                frame = bytes(buffer[start:newline]).strip()
+                if frame:
+                    frames.append(frame)
+            start = newline + 1
+        del buffer[:start]
+        if len(buffer) > self.max_line:
+            if not self._skipping:
+                self.overflows += 1
+                log.warning(f"Discarding a serial line longer than {self.max_line} bytes")
+            buffer.clear()
+            self._skipping = True
+        return frames
+
+class TextDecoder:
+    """Splits the text protocol into lines and parses them into events."""
+
+    def __init__(self):
+        self.framer = LineFramer()
+
+    def reset(self):
+        self.framer.reset()
+
+    def feed(self, data: bytes) -> List[Event]:
+        events = []
+        for frame in self.framer.feed(data):
+            event = parse_text_line(frame.decode(errors="replace"))
+            if event is not None:
+                events.append(event)
+        return events
+
+class BinaryDecoder:
+    """Decodes binary frames out of an arbitrarily chunked byte stream.
+
+    Frames are read in place with ``struct.unpack_from`` over a memoryview of
+    the receive buffer; consumed bytes are dropped once per ``feed`` call.
+    On a bad checksum the decoder skips one byte and hunts for the next sync
+    byte, so a corrupted frame costs at most that frame.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self.bad_frames = 0
+
+    def reset(self):
+        """Forget a partial frame, e.g. after the port was reopened."""
+        self._buffer.clear()
+
+    def feed(self, data: bytes) -> List[Event]:
+        buffer = self._buffer
+        buffer += data
+        events = []
+        pos = 0
+        end = len(buffer)
+        with memoryview(buffer) as view:
+            while end - pos >= FRAME_SIZE:
+                if view[pos] != SYNC_BYTE:
+                    pos = buffer.find(SYNC_BYTE, pos + 1)
+                    if pos < 0:
+                        pos = end
+                    continue
+                _, kind, index, value, checksum = FRAME.unpack_from(view, pos)
+                if (kind + index + (value >> 8) + (value & 0xFF)) & 0xFF != checksum:
+                    self.bad_frames += 1
+                    pos += 1
+                    continue
+                events.append((kind, index, value))
+                pos += FRAME_SIZE
+        del buffer[:pos]
+        return events
+
+def make_decoder(protocol: str):
+    """Return a decoder for the `system.defaults.protocol` setting."""
+    if protocol == "binary":
+        return BinaryDecoder()
+    if protocol != "text":
+        log.warning(f"Unknown protocol '{protocol}', using text")
+    return TextDecoder()